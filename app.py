@@ -7,23 +7,33 @@ import numpy as np
 from PIL import Image
 import io
 
+from model_reloader import HotReloadModel
+from preprocessing import RoiConfig, load_model_input
+
 
 class DefectClassifierApp:
     def __init__(self, model_path):
-        self.model = load_model(model_path)
-        self.img_height, self.img_width = self.model.input_shape[1:3]
+        # Новая версия файла модели подхватывается на лету, без перезапуска Streamlit
+        self.model_manager = HotReloadModel(model_path, loader=load_model)
+        self.model_manager.start_watching()
+        self.img_height, self.img_width = self.model_manager.model.input_shape[1:3]
+        self.roi_config = RoiConfig.load()
 
     def preprocess_image(self, uploaded_file):
-        img = Image.open(uploaded_file)
-        img = img.resize((self.img_width, self.img_height))
-        img_array = np.array(img)
+        data = uploaded_file.getvalue()
+        img = Image.open(io.BytesIO(data))
+        img_array = load_model_input(
+            io.BytesIO(data),
+            (self.img_width, self.img_height),
+            roi=self.roi_config.roi_for(getattr(uploaded_file, 'name', None)),
+            reduced_decode=self.roi_config.reduced_decode
+        )
         img_array = np.expand_dims(img_array, axis=0)
-        img_array = img_array / 255.0
         return img_array, img
 
     def predict(self, uploaded_file):
         processed_img, original_img = self.preprocess_image(uploaded_file)
-        prediction = self.model.predict(processed_img)
+        prediction, model_version = self.model_manager.predict(processed_img)
         confidence = prediction[0][0]
 
         if confidence > 0.5:
@@ -33,7 +43,7 @@ class DefectClassifierApp:
             class_name = "not_defect"
             final_confidence = 1 - confidence
 
-        return class_name, final_confidence, original_img
+        return class_name, final_confidence, original_img, model_version
 
 
 # Streamlit приложение
@@ -56,7 +66,7 @@ def main():
 
     if uploaded_file is not None:
         # Предсказание
-        class_name, confidence, img = classifier.predict(uploaded_file)
+        class_name, confidence, img, model_version = classifier.predict(uploaded_file)
 
         # Отображение результатов
         col1, col2 = st.columns(2)
@@ -76,6 +86,7 @@ def main():
 
             st.write(f"**Статус:** {class_name}")
             st.write(f"**Уверенность:** {confidence:.4f}")
+            st.write(f"**Версия модели:** {model_version}")
 
 
 if __name__ == "__main__":
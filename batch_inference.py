@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import deque
+
+# Приоритеты заданий: живые кадры всегда обрабатываются раньше бэклога
+PRIORITY_LIVE = 0
+PRIORITY_BACKLOG = 1
+
+
+class BatchInferenceQueue:
+    def __init__(self, process_batch, on_result, on_error=None, batch_size=1, batch_timeout=0.05,
+                 backlog_batch_size=None):
+        """
+        Очередь, собирающая задания в батчи для одного вызова модели
+
+        Args:
+            process_batch (callable): функция (список заданий) -> список результатов
+            on_result (callable): вызывается (задание, результат) для каждого задания
+            on_error (callable): вызывается (задание, исключение) при ошибке батча
+            batch_size (int): максимальный размер батча
+            batch_timeout (float): сколько ждать добора батча после первого задания, сек
+            backlog_batch_size (int): максимальный размер батча из бэклога; живой кадр,
+                пришедший во время такого батча, ждет не дольше одного небольшого батча
+        """
+        self.process_batch = process_batch
+        self.on_result = on_result
+        self.on_error = on_error
+        self.batch_size = max(1, batch_size)
+        self.batch_timeout = batch_timeout
+        self.backlog_batch_size = max(1, backlog_batch_size or max(1, self.batch_size // 2))
+        self.queues = {PRIORITY_LIVE: deque(), PRIORITY_BACKLOG: deque()}
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.thread = None
+
+    def start(self):
+        """Запускает рабочий поток"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopping = False
+        self.thread = threading.Thread(target=self._worker, daemon=True, name="inference-queue")
+        self.thread.start()
+
+    def stop(self, timeout=5.0):
+        """Останавливает рабочий поток; невыполненный бэклог отбрасывается"""
+        if not self.thread:
+            return
+        with self.condition:
+            self.stopping = True
+            self.queues[PRIORITY_BACKLOG].clear()
+            self.condition.notify_all()
+        self.thread.join(timeout)
+        self.thread = None
+
+    def submit(self, item, priority=PRIORITY_LIVE):
+        """Ставит задание в очередь с указанным приоритетом"""
+        with self.condition:
+            self.queues[priority].append(item)
+            self.condition.notify()
+
+    def set_batch_size(self, batch_size):
+        """Меняет максимальный размер живого батча (со следующего батча)"""
+        with self.condition:
+            self.batch_size = max(1, batch_size)
+            self.condition.notify()
+
+    def promote(self, item):
+        """
+        Переносит задание из бэклога в живую очередь
+
+        Returns:
+            bool: False, если задания в бэклоге уже нет (например, оно обрабатывается)
+        """
+        with self.condition:
+            try:
+                self.queues[PRIORITY_BACKLOG].remove(item)
+            except ValueError:
+                return False
+            self.queues[PRIORITY_LIVE].append(item)
+            self.condition.notify()
+            return True
+
+    def clear_backlog(self):
+        """Убирает из очереди все задания бэклога"""
+        with self.condition:
+            dropped = list(self.queues[PRIORITY_BACKLOG])
+            self.queues[PRIORITY_BACKLOG].clear()
+            return dropped
+
+    def pending(self, priority=None):
+        """Число заданий в очереди (всех или заданного приоритета)"""
+        with self.condition:
+            if priority is not None:
+                return len(self.queues[priority])
+            return sum(len(items) for items in self.queues.values())
+
+    def _collect_batch(self):
+        """Собирает следующий батч; вызывается под self.condition"""
+        live = self.queues[PRIORITY_LIVE]
+        backlog = self.queues[PRIORITY_BACKLOG]
+
+        if live:
+            # Живые кадры: ждем добора батча, но только из живых кадров
+            batch = [live.popleft()]
+            deadline = time.monotonic() + self.batch_timeout
+            while len(batch) < self.batch_size and not self.stopping:
+                if live:
+                    batch.append(live.popleft())
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            return batch
+
+        # Бэклог берем только при пустой живой очереди и без ожидания
+        batch = []
+        while backlog and len(batch) < self.backlog_batch_size:
+            batch.append(backlog.popleft())
+        return batch
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while not self.stopping and not any(self.queues.values()):
+                    self.condition.wait()
+                if self.stopping and not self.queues[PRIORITY_LIVE]:
+                    return
+                batch = self._collect_batch()
+
+            try:
+                results = self.process_batch(batch)
+            except Exception as e:
+                print(f"Ошибка при обработке батча из {len(batch)} заданий: {e}")
+                if self.on_error:
+                    for item in batch:
+                        self.on_error(item, e)
+                continue
+
+            for item, result in zip(batch, results):
+                try:
+                    self.on_result(item, result)
+                except Exception as e:
+                    print(f"Ошибка при передаче результата: {e}")
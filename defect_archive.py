@@ -0,0 +1,165 @@
+import errno
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+
+ARCHIVE_DIR_NAME = "defects"
+INDEX_FILE_NAME = "index.jsonl"
+
+
+class DefectArchive:
+    def __init__(self, root):
+        """
+        Архив дефектов по датам: root/ГГГГ/ММ/ДД/<время>.<расширение>
+
+        Каждое перемещение дописывается строкой JSON в root/index.jsonl, поэтому
+        последние дефекты находятся чтением хвоста индекса, без обхода дерева.
+
+        Args:
+            root (str): корневая папка архива
+        """
+        self.root = os.path.abspath(root)
+        self.index_path = os.path.join(self.root, INDEX_FILE_NAME)
+        self.lock = threading.Lock()
+
+    def day_folder(self, when):
+        return os.path.join(self.root, when.strftime("%Y"), when.strftime("%m"), when.strftime("%d"))
+
+    def store(self, source_path, when=None, **details):
+        """
+        Перемещает дефект в архив и дописывает запись в индекс
+
+        Args:
+            source_path (str): файл дефекта
+            when (datetime): время дефекта (по умолчанию - сейчас)
+            **details: дополнительные поля записи индекса (результат, версия модели и т.п.)
+
+        Returns:
+            str: новый путь файла
+        """
+        when = when or datetime.now()
+        folder = self.day_folder(when)
+        os.makedirs(folder, exist_ok=True)
+
+        target_path = self._reserve_name(folder, when, os.path.splitext(source_path)[1])
+        try:
+            os.replace(source_path, target_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                self._remove_quietly(target_path)
+                raise
+            # Архив на другом диске - копируем и удаляем исходный файл
+            shutil.copy2(source_path, target_path)
+            os.remove(source_path)
+
+        self._append_index(target_path, os.path.basename(source_path), when, details)
+        return target_path
+
+    def store_image(self, image, source_name, when=None, extension=".jpg", **details):
+        """
+        Сохраняет кадр из памяти (например, из видеопотока) прямо в архив
+
+        Args:
+            image (PIL.Image.Image): кадр
+            source_name (str): имя источника для индекса
+            when (datetime): время дефекта (по умолчанию - сейчас)
+            extension (str): расширение и формат файла
+
+        Returns:
+            str: путь сохраненного файла
+        """
+        when = when or datetime.now()
+        folder = self.day_folder(when)
+        os.makedirs(folder, exist_ok=True)
+
+        target_path = self._reserve_name(folder, when, extension)
+        temp_path = target_path + ".part"
+        try:
+            if extension.lower() in ('.jpg', '.jpeg'):
+                image.save(temp_path, format='JPEG', quality=95)
+            else:
+                image.save(temp_path, format=extension.lstrip('.').upper())
+            os.replace(temp_path, target_path)
+        except Exception:
+            self._remove_quietly(temp_path)
+            self._remove_quietly(target_path)
+            raise
+
+        self._append_index(target_path, source_name, when, details)
+        return target_path
+
+    def recent(self, limit=1000):
+        """
+        Последние дефекты по индексу (от старых к новым), только существующие файлы
+
+        Returns:
+            list: полные пути
+        """
+        paths = []
+        for line in self._tail_lines(limit):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            path = os.path.join(self.root, record['path'])
+            if os.path.isfile(path):
+                paths.append(path)
+        return paths
+
+    def _reserve_name(self, folder, when, extension):
+        """Занимает свободное имя атомарно: на архив могут писать несколько станций"""
+        base = when.strftime("%Y-%m-%d %H-%M-%S")
+        counter = 0
+        while True:
+            name = base + (f"_{counter}" if counter else "") + extension
+            target_path = os.path.join(folder, name)
+            try:
+                os.close(os.open(target_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return target_path
+            except FileExistsError:
+                counter += 1
+
+    def _append_index(self, target_path, source_name, when, details):
+        record = {
+            'path': os.path.relpath(target_path, self.root),
+            'source': source_name,
+            'archived_at': when.isoformat(timespec='seconds'),
+        }
+        record.update(details)
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self.lock:
+            # Одна запись O_APPEND на строку - строки разных потоков и станций не перемешиваются
+            fd = os.open(self.index_path, os.O_CREAT | os.O_APPEND | os.O_WRONLY, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+    def _tail_lines(self, limit, block_size=64 * 1024):
+        """Последние limit строк индекса без чтения всего файла"""
+        try:
+            with open(self.index_path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                position = f.tell()
+                data = b""
+                while position > 0 and data.count(b"\n") <= limit:
+                    step = min(block_size, position)
+                    position -= step
+                    f.seek(position)
+                    data = f.read(step) + data
+        except FileNotFoundError:
+            return []
+
+        lines = [line for line in data.decode("utf-8", errors="replace").splitlines() if line.strip()]
+        if position > 0:
+            # Первая строка блока может быть обрезанной
+            lines = lines[1:]
+        return lines[-limit:]
+
+    def _remove_quietly(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
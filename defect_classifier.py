@@ -1,3 +1,17 @@
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+
+from preprocessing import RoiConfig, load_model_input
+from runtime_config import (add_runtime_arguments, apply_environment, apply_tensorflow_config,
+                            export_environment, load_runtime_config)
+
+# Настройки среды выполнения нужны до импорта TensorFlow (параметры командной строки - тоже)
+RUNTIME_CONFIG = load_runtime_config(sys.argv[1:] if __name__ == "__main__" else None)
+apply_environment(RUNTIME_CONFIG)
+
 import tensorflow as tf
 from tensorflow.keras.models import load_model
 from tensorflow.keras.preprocessing import image
@@ -6,17 +20,25 @@ import cv2
 from PIL import Image
 import os
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif')
+OFFLINE_BATCH_SIZE = 32
+
 
 class DefectClassifier:
-    def __init__(self, model_path):
+    def __init__(self, model_path, runtime_config=None):
         """
         Инициализация классификатора дефектов
 
         Args:
             model_path (str): путь к файлу модели .h5
+            runtime_config (dict): настройки среды выполнения (по умолчанию - из профиля/файла/окружения)
         """
+        self.runtime_config = runtime_config or RUNTIME_CONFIG
+        apply_tensorflow_config(self.runtime_config)
+        self.batch_size = self.runtime_config['batch_size']
         self.model = load_model(model_path)
         self.img_height, self.img_width = self.get_input_shape()
+        self.roi_config = RoiConfig.load()
 
     def get_input_shape(self):
         """Получить размер входного изображения из модели"""
@@ -33,14 +55,17 @@ class DefectClassifier:
         Returns:
             numpy array: предобработанное изображение
         """
-        # Загрузка изображения
-        img = image.load_img(img_path, target_size=(self.img_height, self.img_width))
-        img_array = image.img_to_array(img)
+        # Загрузка области интереса с нормализацией в диапазон [0,1]
+        # (интерполяция как у image.load_img - nearest)
+        img_array = load_model_input(
+            img_path,
+            (self.img_width, self.img_height),
+            roi=self.roi_config.roi_for(img_path),
+            reduced_decode=self.roi_config.reduced_decode,
+            resample=Image.Resampling.NEAREST
+        )
         img_array = np.expand_dims(img_array, axis=0)
 
-        # Нормализация (если модель ожидает значения в диапазоне [0,1])
-        img_array = img_array / 255.0
-
         return img_array
 
     def predict(self, img_path):
@@ -51,7 +76,7 @@ class DefectClassifier:
             img_path (str): путь к изображению
 
         Returns:
-            tuple: (prediction, confidence, class_name)
+            tuple: (class_name, confidence, raw)
         """
         # Предобработка изображения
         processed_img = self.preprocess_image(img_path)
@@ -72,20 +97,181 @@ class DefectClassifier:
         return class_name, confidence, prediction[0][0]
 
 
+def list_images(folder, recursive=True):
+    """Список изображений в папке (отсортированный, чтобы шардирование было воспроизводимым)"""
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames.sort()
+        for name in filenames:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(dirpath, name))
+        if not recursive:
+            break
+    paths.sort()
+    return paths
+
+
+def load_scored_paths(out_path, retry_errors=False):
+    """
+    Пути, уже записанные в файл результатов (для продолжения после прерывания)
+
+    Недописанная последняя строка игнорируется.
+    """
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict) or 'path' not in record:
+                continue
+            if retry_errors and 'error' in record:
+                continue
+            done.add(record['path'])
+    return done
+
+
+_worker_classifier = None
+_worker_model_version = None
+
+
+def _init_worker(model_path, runtime_config, model_version):
+    """Инициализация процесса-обработчика: своя модель и свои настройки потоков"""
+    global _worker_classifier, _worker_model_version
+    _worker_classifier = DefectClassifier(model_path, runtime_config)
+    _worker_model_version = model_version
+
+
+def _score_chunk(paths):
+    """Оценивает часть файлов в процессе-обработчике"""
+    classifier = _worker_classifier
+    records = []
+    arrays = []
+    valid_paths = []
+    for path in paths:
+        try:
+            arrays.append(classifier.preprocess_image(path))
+            valid_paths.append(path)
+        except Exception as e:
+            records.append({'path': path, 'error': str(e)})
+
+    if arrays:
+        try:
+            predictions = classifier.model.predict(
+                np.concatenate(arrays), batch_size=classifier.batch_size, verbose=0
+            )
+        except Exception as e:
+            return records + [{'path': path, 'error': str(e)} for path in valid_paths]
+
+        for path, raw in zip(valid_paths, predictions[:, 0]):
+            raw = float(raw)
+            class_name = "defect" if raw > 0.5 else "not_defect"
+            records.append({
+                'path': path,
+                'class': class_name,
+                'confidence': raw if raw > 0.5 else 1 - raw,
+                'raw': raw,
+                'model_version': _worker_model_version,
+            })
+    return records
+
+
+def score_directory(folder, out_path, model_path, workers, runtime_config, chunk_size=64,
+                    recursive=True, retry_errors=False):
+    """
+    Оценивает все изображения папки в нескольких процессах и пишет результаты в JSONL
+
+    Каждый процесс загружает свою модель и получает свою долю ядер.
+    Уже оцененные файлы из out_path пропускаются.
+    """
+    from model_reloader import model_file_version
+
+    paths = list_images(folder, recursive=recursive)
+    done = load_scored_paths(out_path, retry_errors=retry_errors)
+    todo = [path for path in paths if path not in done]
+    print(f"Найдено изображений: {len(paths)}, уже оценено: {len(paths) - len(todo)}, осталось: {len(todo)}")
+    if not todo:
+        return 0
+
+    # Делим ядра между процессами, чтобы потоки TensorFlow не конкурировали
+    cpu_count = os.cpu_count() or 1
+    worker_config = dict(runtime_config)
+    worker_config['intra_op_threads'] = runtime_config['intra_op_threads'] or max(1, cpu_count // workers)
+    worker_config['inter_op_threads'] = runtime_config['inter_op_threads'] or 1
+    model_version = model_file_version(model_path)
+    # Дочерние процессы импортируют этот модуль и TensorFlow заново: через окружение
+    # они получают эти же настройки, а не перечитывают файлы поверх параметров командной строки
+    export_environment(worker_config)
+    apply_environment(worker_config)
+
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+
+    # Если прошлый запуск оборвался посреди строки, начинаем с новой строки
+    if os.path.exists(out_path) and os.path.getsize(out_path) > 0:
+        with open(out_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    else:
+        needs_newline = False
+
+    started = time.perf_counter()
+    scored = 0
+    context = multiprocessing.get_context("spawn")
+    with open(out_path, "a", encoding="utf-8") as out, context.Pool(
+            workers, initializer=_init_worker,
+            initargs=(model_path, worker_config, model_version)) as pool:
+        if needs_newline:
+            out.write("\n")
+
+        for records in pool.imap_unordered(_score_chunk, chunks):
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            scored += len(records)
+
+            elapsed = time.perf_counter() - started
+            print(f"Оценено {scored}/{len(todo)} ({scored / elapsed:.1f} изобр/с)")
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Готово: {scored} изображений за {elapsed:.1f} с "
+          f"({scored / elapsed:.1f} изобр/с, процессов: {workers})")
+    return scored
+
+
 # Использование
 def main():
-    # Путь к вашей модели
-    model_path = "C:\jdsajhdsa\defect_detection_continued.h5"  # замените на путь к вашей модели
+    parser = argparse.ArgumentParser(description="Классификация дефектов: одно изображение или вся папка")
+    parser.add_argument("input", nargs="?", default="test_image.jpg",
+                        help="путь к изображению или папке")
+    parser.add_argument("--model", default="defect_detection_continued.h5", help="путь к модели .h5")
+    parser.add_argument("--out", default="results.jsonl", help="файл результатов для папки (JSONL)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="число процессов")
+    parser.add_argument("--chunk-size", type=int, default=64, help="файлов в одном задании процесса")
+    parser.add_argument("--no-recursive", action="store_true", help="не заходить во вложенные папки")
+    parser.add_argument("--retry-errors", action="store_true", help="повторить файлы, завершившиеся ошибкой")
+    add_runtime_arguments(parser)
+    args = parser.parse_args()
+    runtime_config = load_runtime_config(sys.argv[1:])
 
-    # Инициализация классификатора
-    classifier = DefectClassifier(model_path)
+    if os.path.isdir(args.input):
+        if args.batch_size is None:
+            # Офлайн-оценке задержка не важна - берем батч побольше
+            runtime_config['batch_size'] = max(runtime_config['batch_size'], OFFLINE_BATCH_SIZE)
+        score_directory(args.input, args.out, args.model, max(1, args.workers), runtime_config,
+                        chunk_size=args.chunk_size, recursive=not args.no_recursive,
+                        retry_errors=args.retry_errors)
+        return
 
-    # Путь к тестовому изображению
-    test_image_path = "test_image.jpg"  # замените на путь к вашему изображению
+    # Инициализация классификатора
+    classifier = DefectClassifier(args.model, runtime_config)
 
     # Предсказание
     try:
-        class_name, confidence, raw_pred = classifier.predict(test_image_path)
+        class_name, confidence, raw_pred = classifier.predict(args.input)
 
         print(f"Результат анализа:")
         print(f"Класс: {class_name}")
@@ -0,0 +1,182 @@
+import os
+import tkinter as tk
+
+from PIL import ImageTk
+
+GALLERY_PADDING = 6
+GALLERY_CAPTION_HEIGHT = 16
+GALLERY_OVERSCAN = 2  # сколько миниатюр держать за краями видимой области
+
+
+class DefectGallery(tk.Frame):
+    def __init__(self, master, thumbnail_cache, on_select=None, bg='black'):
+        """
+        Прокручиваемая лента истории дефектов
+
+        Tk-изображения создаются только для видимых миниатюр, поэтому
+        лента из тысяч дефектов почти не занимает памяти.
+
+        Args:
+            master: родительский виджет
+            thumbnail_cache (ThumbnailCache): кеш миниатюр
+            on_select (callable): вызывается (путь к изображению) при щелчке по миниатюре
+        """
+        thumb_width, thumb_height = thumbnail_cache.size
+        self.slot_width = thumb_width + 2 * GALLERY_PADDING
+        self.canvas_height = thumb_height + GALLERY_CAPTION_HEIGHT + 2 * GALLERY_PADDING
+
+        super().__init__(master, bg=bg)
+        self.thumbnail_cache = thumbnail_cache
+        self.on_select = on_select
+        self.entries = []  # пути от старых к новым; новые показываются слева
+        self.visible = {}  # путь -> (позиция, PhotoImage, id элементов холста)
+        self.selected_path = None
+
+        self.canvas = tk.Canvas(self, bg=bg, height=self.canvas_height, highlightthickness=0,
+                                xscrollincrement=self.slot_width)
+        self.scrollbar = tk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.on_scrollbar)
+        self.canvas.configure(xscrollcommand=self.on_xscroll)
+        self.canvas.pack(side=tk.TOP, fill=tk.X)
+        self.scrollbar.pack(side=tk.TOP, fill=tk.X)
+
+        self.canvas.bind("<Configure>", lambda event: self.render())
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Shift-MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", lambda event: self.scroll_by(-1))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll_by(1))
+
+    @property
+    def total_height(self):
+        """Полная высота ленты вместе с полосой прокрутки"""
+        return self.canvas_height + 20
+
+    def set_entries(self, image_paths):
+        """Заменяет всю историю (пути от старых к новым)"""
+        self.clear_visible()
+        self.entries = list(image_paths)
+        self.update_scrollregion()
+        self.canvas.xview_moveto(0)
+        self.render()
+
+    def add_entry(self, image_path):
+        """Добавляет новый дефект в начало ленты"""
+        if image_path in self.entries:
+            return
+        self.entries.append(image_path)
+        self.update_scrollregion()
+        self.render()
+
+    def update_scrollregion(self):
+        self.canvas.configure(scrollregion=(0, 0, len(self.entries) * self.slot_width, self.canvas_height))
+
+    def render(self):
+        """Создает миниатюры в видимой области и удаляет ушедшие за ее пределы"""
+        if not self.canvas.winfo_exists():
+            return
+
+        left = self.canvas.canvasx(0)
+        width = max(self.canvas.winfo_width(), self.slot_width)
+        first_slot = max(0, int(left // self.slot_width) - GALLERY_OVERSCAN)
+        last_slot = min(len(self.entries) - 1, int((left + width) // self.slot_width) + GALLERY_OVERSCAN)
+
+        wanted = {}
+        for slot in range(first_slot, last_slot + 1):
+            wanted[self.entries[len(self.entries) - 1 - slot]] = slot
+
+        for path in list(self.visible):
+            if path not in wanted:
+                self.remove_visible(path)
+
+        for path, slot in wanted.items():
+            if path in self.visible:
+                old_slot, photo, items = self.visible[path]
+                if old_slot != slot:
+                    # Новый дефект сдвинул ленту - переносим элементы, не перечитывая миниатюру
+                    for item in items:
+                        self.canvas.move(item, (slot - old_slot) * self.slot_width, 0)
+                    self.visible[path] = (slot, photo, items)
+            else:
+                self.draw_entry(path, slot)
+
+    def draw_entry(self, path, slot):
+        x = slot * self.slot_width + GALLERY_PADDING
+        y = GALLERY_PADDING
+        thumb_width, thumb_height = self.thumbnail_cache.size
+        outline = 'yellow' if path == self.selected_path else 'gray30'
+
+        items = [self.canvas.create_rectangle(x - 2, y - 2, x + thumb_width + 2, y + thumb_height + 2,
+                                              outline=outline, width=2)]
+        photo = None
+        thumb = self.thumbnail_cache.load(path, on_ready=self.on_thumbnail_ready)
+        if thumb is not None:
+            photo = ImageTk.PhotoImage(thumb, master=self.canvas)
+            items.append(self.canvas.create_image(
+                x + thumb_width // 2, y + thumb_height // 2, image=photo, anchor=tk.CENTER
+            ))
+        else:
+            items.append(self.canvas.create_text(
+                x + thumb_width // 2, y + thumb_height // 2, text="...", fill='gray60'
+            ))
+
+        caption = os.path.splitext(os.path.basename(path))[0]
+        items.append(self.canvas.create_text(
+            x + thumb_width // 2, y + thumb_height + GALLERY_CAPTION_HEIGHT // 2 + 2,
+            text=caption, fill='white', font=("Arial", 8)
+        ))
+        self.visible[path] = (slot, photo, items)
+
+    def remove_visible(self, path):
+        _, _, items = self.visible.pop(path)
+        for item in items:
+            self.canvas.delete(item)
+
+    def clear_visible(self):
+        for path in list(self.visible):
+            self.remove_visible(path)
+
+    def on_thumbnail_ready(self, path):
+        """Вызывается из фонового потока кеша: перерисовываем готовую миниатюру"""
+        def redraw():
+            if path in self.visible and self.visible[path][1] is None:
+                self.remove_visible(path)
+                self.render()
+
+        try:
+            self.after(0, redraw)
+        except (RuntimeError, tk.TclError):
+            pass
+
+    def on_scrollbar(self, *args):
+        self.canvas.xview(*args)
+        self.render()
+
+    def on_xscroll(self, first, last):
+        self.scrollbar.set(first, last)
+
+    def on_wheel(self, event):
+        self.scroll_by(-1 if event.delta > 0 else 1)
+
+    def scroll_by(self, units):
+        self.canvas.xview_scroll(units, "units")
+        self.render()
+
+    def on_click(self, event):
+        slot = int(self.canvas.canvasx(event.x) // self.slot_width)
+        index = len(self.entries) - 1 - slot
+        if not 0 <= index < len(self.entries):
+            return
+
+        path = self.entries[index]
+        self.select(path)
+        if self.on_select:
+            self.on_select(path)
+
+    def select(self, path):
+        """Выделяет миниатюру рамкой"""
+        previous = self.selected_path
+        self.selected_path = path
+        for item_path in (previous, path):
+            if item_path in self.visible:
+                self.remove_visible(item_path)
+        self.render()
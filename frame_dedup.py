@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+
+def dhash(source, hash_size=8, roi=None):
+    """
+    Вычисляет разностный перцептивный хеш (dHash) изображения
+
+    Args:
+        source (str | PIL.Image.Image): путь к изображению или уже открытое изображение
+        hash_size (int): размер стороны хеша (hash_size * hash_size бит)
+        roi (list): [left, top, right, bottom] долями кадра - хешируется только эта область
+
+    Returns:
+        int: перцептивный хеш
+    """
+    width_fraction = (roi[2] - roi[0]) if roi else 1.0
+    height_fraction = (roi[3] - roi[1]) if roi else 1.0
+    if isinstance(source, Image.Image):
+        img = source
+    else:
+        img = Image.open(source)
+        # Для JPEG декодируем сразу в уменьшенном масштабе - полный кадр для хеша не нужен
+        img.draft('L', (int(hash_size * 16 / width_fraction), int(hash_size * 16 / height_fraction)))
+
+    box = None
+    if roi:
+        width, height = img.size
+        box = (roi[0] * width, roi[1] * height, roi[2] * width, roi[3] * height)
+    small = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR, box=box)
+    pixels = list(small.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (1 if pixels[offset + col] > pixels[offset + col + 1] else 0)
+    return value
+
+
+def hamming_distance(hash_a, hash_b):
+    """Количество различающихся бит двух хешей"""
+    return (hash_a ^ hash_b).bit_count()
+
+
+class PerceptualHashIndex:
+    def __init__(self, max_entries=256, max_distance=2, max_age=2.0):
+        """
+        Ограниченный индекс перцептивных хешей недавно проверенных кадров
+
+        Запись живет max_age секунд с момента вердикта модели и не продлевается
+        совпадениями: иначе на непрерывной линии первый вердикт не истекал бы
+        и доставался бы уже другим деталям.
+
+        Args:
+            max_entries (int): максимальное число хранимых кадров
+            max_distance (int): максимальное расстояние Хэмминга для признания кадра повтором
+            max_age (float): время жизни записи с момента вердикта, сек (None - без ограничения)
+        """
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def lookup(self, frame_hash):
+        """
+        Ищет уже проверенный кадр, близкий к данному
+
+        Returns:
+            вердикт похожего кадра или None
+        """
+        with self.lock:
+            self.lookups += 1
+            self._expire()
+
+            best_hash = None
+            best_distance = self.max_distance + 1
+            for known_hash in self.entries:
+                distance = hamming_distance(frame_hash, known_hash)
+                if distance < best_distance:
+                    best_hash = known_hash
+                    best_distance = distance
+                    if distance == 0:
+                        break
+
+            if best_hash is None:
+                return None
+
+            self.hits += 1
+            # Время вердикта не обновляется - запись истекает по возрасту вердикта модели
+            return self.entries[best_hash][0]
+
+    def add(self, frame_hash, verdict):
+        """Добавляет вердикт кадра в индекс, вытесняя самые старые записи"""
+        with self.lock:
+            self.entries[frame_hash] = (verdict, time.monotonic())
+            self.entries.move_to_end(frame_hash)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def count_hit(self):
+        """Учитывает кадр, вердикт которого взят у похожего кадра того же батча, мимо индекса"""
+        with self.lock:
+            self.hits += 1
+
+    def clear(self):
+        """Очищает индекс и статистику"""
+        with self.lock:
+            self.entries.clear()
+            self.lookups = 0
+            self.hits = 0
+
+    def stats(self):
+        """
+        Статистика пропуска инференса
+
+        Returns:
+            dict: lookups, hits, skip_rate, size
+        """
+        with self.lock:
+            skip_rate = self.hits / self.lookups if self.lookups else 0.0
+            return {
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'skip_rate': skip_rate,
+                'size': len(self.entries),
+            }
+
+    def _expire(self):
+        if self.max_age is None:
+            return
+        deadline = time.monotonic() - self.max_age
+        while self.entries:
+            oldest_hash = next(iter(self.entries))
+            if self.entries[oldest_hash][1] >= deadline:
+                break
+            del self.entries[oldest_hash]
@@ -0,0 +1,535 @@
+import argparse
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from preprocessing import MODEL_INPUT_SIZE, load_model_input
+
+FRAME_RING_SUFFIX = ".ring"
+RING_MAGIC = b"LDRING01"
+RING_VERSION = 1
+
+# Заголовок файла: magic, версия, размер заголовка, число слотов, высота, ширина, каналы,
+# код типа, затем (со смещением 40) номер последнего опубликованного кадра
+HEADER_FORMAT = "<8s7I4xQ"
+HEADER_SIZE = 64
+WRITE_SEQ_OFFSET = 40
+WRITE_SEQ_FORMAT = "<Q"
+
+# Заголовок слота: номер кадра в начале записи, номер кадра в конце записи, время (time.time()), id кадра
+SLOT_HEADER_FORMAT = "<QQdQ"
+SLOT_HEADER_SIZE = 32
+
+DTYPES = {0: np.uint8, 1: np.float32}
+
+RING_REOPEN_CHECK_INTERVAL = 0.5  # сек между проверками, не создан ли файл буфера заново
+
+
+def _dtype_code(dtype):
+    for code, value in DTYPES.items():
+        if np.dtype(value) == np.dtype(dtype):
+            return code
+    raise ValueError(f"Тип кадров {dtype} не поддерживается: только uint8 (сырые кадры) и float32 (вход модели)")
+
+
+class FrameRing:
+    def __init__(self, path, writable=False):
+        """
+        Кольцевой буфер кадров в файле, отображенном в память
+
+        Файл: заголовок HEADER_SIZE байт и slot_count слотов одинакового размера.
+        Производитель пишет кадр n в слот (n - 1) % slot_count по протоколу seqlock:
+        номер n в начало заголовка слота, пиксели, номер n в конец, затем n в
+        счетчик заголовка файла. Читатель проверяет оба номера до и после
+        использования кадра - так видно, что производитель успел его перезаписать.
+
+        Args:
+            path (str): путь к файлу буфера
+            writable (bool): открыть для записи (производитель)
+        """
+        self.path = path
+        self.file = open(path, "r+b" if writable else "rb")
+        stat = os.fstat(self.file.fileno())
+        self.file_id = (stat.st_dev, stat.st_ino)
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+
+        magic, version, header_size, slot_count, height, width, channels, dtype_code, _ = \
+            struct.unpack_from(HEADER_FORMAT, self.mm, 0)
+        if magic != RING_MAGIC or version != RING_VERSION:
+            raise ValueError(f"{path} не является буфером кадров версии {RING_VERSION}")
+
+        self.header_size = header_size
+        self.slot_count = slot_count
+        self.shape = (height, width, channels) if channels > 1 else (height, width)
+        self.dtype = np.dtype(DTYPES[dtype_code])
+        self.frame_bytes = height * width * channels * self.dtype.itemsize
+        self.slot_stride = slot_stride(self.frame_bytes)
+
+    @classmethod
+    def create(cls, path, slot_count, shape, dtype=np.uint8):
+        """Создает файл буфера для кадров shape (высота, ширина[, каналы])"""
+        height, width = shape[:2]
+        channels = shape[2] if len(shape) > 2 else 1
+        frame_bytes = height * width * channels * np.dtype(dtype).itemsize
+
+        temp_path = path + ".part"
+        with open(temp_path, "wb") as f:
+            f.truncate(HEADER_SIZE + slot_count * slot_stride(frame_bytes))
+            f.write(struct.pack(HEADER_FORMAT, RING_MAGIC, RING_VERSION, HEADER_SIZE, slot_count,
+                                height, width, channels, _dtype_code(dtype), 0))
+        # Читатели не должны увидеть файл без заголовка
+        os.replace(temp_path, path)
+        return cls(path, writable=True)
+
+    def close(self):
+        try:
+            self.mm.close()
+        except BufferError:
+            # Кадры-представления еще живы: отображение закроется вместе с последним из них
+            pass
+        self.file.close()
+
+    def write_seq(self):
+        """Номер последнего опубликованного кадра (0 - кадров еще не было)"""
+        return struct.unpack_from(WRITE_SEQ_FORMAT, self.mm, WRITE_SEQ_OFFSET)[0]
+
+    def _slot_offset(self, seq):
+        return self.header_size + ((seq - 1) % self.slot_count) * self.slot_stride
+
+    def write(self, frame, frame_id=0, timestamp=None):
+        """
+        Публикует кадр (только производитель)
+
+        Returns:
+            int: номер кадра
+        """
+        seq = self.write_seq() + 1
+        offset = self._slot_offset(seq)
+        # Номер в начале слота меняется первым - читатели старого кадра увидят перезапись
+        struct.pack_into(SLOT_HEADER_FORMAT, self.mm, offset, seq, 0, timestamp or time.time(), frame_id)
+        target = np.frombuffer(self.mm, self.dtype, self.frame_bytes // self.dtype.itemsize,
+                               offset + SLOT_HEADER_SIZE).reshape(self.shape)
+        target[...] = frame
+        struct.pack_into("<Q", self.mm, offset + 8, seq)
+        struct.pack_into(WRITE_SEQ_FORMAT, self.mm, WRITE_SEQ_OFFSET, seq)
+        return seq
+
+    def read(self, seq):
+        """
+        Кадр seq без копирования
+
+        Returns:
+            tuple или None: (numpy-представление слота, id кадра, время) или None,
+            если кадр еще не записан или уже перезаписан
+        """
+        offset = self._slot_offset(seq)
+        seq_begin, seq_end, timestamp, frame_id = struct.unpack_from(SLOT_HEADER_FORMAT, self.mm, offset)
+        if seq_begin != seq or seq_end != seq:
+            return None
+        view = np.frombuffer(self.mm, self.dtype, self.frame_bytes // self.dtype.itemsize,
+                             offset + SLOT_HEADER_SIZE).reshape(self.shape)
+        return view, frame_id, timestamp
+
+    def is_current(self, seq):
+        """Не перезаписан ли кадр seq с момента чтения"""
+        return struct.unpack_from("<Q", self.mm, self._slot_offset(seq))[0] == seq
+
+    def is_replaced(self):
+        """
+        Заменен ли файл по пути path другим (перезапущенный производитель создает буфер заново)
+
+        Отображение продолжает указывать на старый файл, новых кадров в нем не будет.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        except OSError:
+            return False
+        return (stat.st_dev, stat.st_ino) != self.file_id
+
+
+def slot_stride(frame_bytes):
+    """Размер слота с выравниванием по 64 байта"""
+    return (SLOT_HEADER_SIZE + frame_bytes + 63) // 64 * 64
+
+
+class RingFrame:
+    def __init__(self, consumer, seq, frame_id, timestamp, array):
+        """
+        Кадр кольцевого буфера: numpy-представление слота, без копирования
+
+        Представление действительно, пока производитель не перезапишет слот;
+        is_valid() проверяет это после использования, retain() копирует кадр.
+        """
+        self.source = consumer
+        self.ring = consumer.ring  # буфер, из которого прочитан кадр (после переподключения - прежний)
+        self.stream_name = consumer.name
+        self.index = seq
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.array = array
+        self.retained = None
+        self.name = f"{consumer.name}_{seq:08d}"
+
+    def __repr__(self):
+        return f"RingFrame({self.name})"
+
+    @property
+    def pixels(self):
+        return self.retained if self.retained is not None else self.array
+
+    @property
+    def model_input(self):
+        """Готовый вход модели (для кадров float32 нужного размера) - прямо из слота"""
+        if self.array.dtype == np.float32 and self.array.shape == self.source.model_shape:
+            return self.pixels
+        return None
+
+    @property
+    def image(self):
+        pixels = self.pixels
+        if pixels.dtype != np.uint8:
+            pixels = (np.clip(pixels, 0.0, 1.0) * 255).astype(np.uint8)
+        return Image.fromarray(pixels)
+
+    def is_valid(self):
+        return self.retained is not None or self.ring.is_current(self.index)
+
+    def retain(self):
+        """
+        Копирует кадр из слота, чтобы он пережил перезапись (например, для сохранения дефекта)
+
+        Returns:
+            bool: False, если кадр уже перезаписан
+        """
+        if self.retained is not None:
+            return True
+        copy = np.array(self.array)
+        if not self.ring.is_current(self.index):
+            return False
+        self.retained = copy
+        return True
+
+
+class RingConsumer:
+    def __init__(self, path, on_frame, max_in_flight=4, poll_interval=0.001, name=None,
+                 model_shape=(MODEL_INPUT_SIZE[1], MODEL_INPUT_SIZE[0], 3)):
+        """
+        Чтение кадров из кольцевого буфера - тот же интерфейс, что у StreamSource
+
+        Если на анализе уже max_in_flight кадров, читатель ждет и затем берет
+        самый свежий кадр; пропущенные кадры учитываются в статистике.
+        Если производитель перезапустился и создал файл буфера заново,
+        читатель переподключается к новому файлу.
+
+        Args:
+            path (str): файл буфера (ждем, пока производитель его создаст)
+            on_frame (callable): вызывается (RingFrame) из потока чтения
+            max_in_flight (int): сколько кадров может одновременно ждать вердикта
+            poll_interval (float): пауза опроса при отсутствии новых кадров, сек
+            name (str): имя источника
+            model_shape (tuple): форма входа модели (высота, ширина, каналы)
+        """
+        self.path = path
+        self.on_frame = on_frame
+        self.max_in_flight = max(1, max_in_flight)
+        self.poll_interval = poll_interval
+        self.name = name or os.path.splitext(os.path.basename(path))[0]
+        self.model_shape = tuple(model_shape)
+        self.ring = None
+
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.frames_read = 0
+        self.frames_sampled = 0
+        self.skipped_backpressure = 0
+        self.reopened = 0
+        self.started_at = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="ring-reader")
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join(5)
+            self.thread = None
+
+    def done(self, frame):
+        with self.condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.condition.notify_all()
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            'read': self.frames_read,
+            'sampled': self.frames_sampled,
+            'skipped': self.skipped_backpressure,
+            'in_flight': self.in_flight,
+            'fps': self.frames_sampled / elapsed if elapsed else 0.0,
+        }
+
+    def _open(self):
+        while not self.stop_event.is_set():
+            try:
+                return FrameRing(self.path)
+            except (FileNotFoundError, ValueError):
+                self.stop_event.wait(0.2)
+        return None
+
+    def _run(self):
+        self.ring = self._open()
+        if self.ring is None:
+            return
+        print(f"Буфер кадров {self.path}: {self.ring.slot_count} слотов, кадр {self.ring.shape} {self.ring.dtype}")
+
+        self.started_at = time.monotonic()
+        started_wall = time.time()
+        next_seq = self.ring.write_seq() + 1
+        next_reopen_check = time.monotonic() + RING_REOPEN_CHECK_INTERVAL
+        try:
+            while not self.stop_event.is_set():
+                with self.condition:
+                    while self.in_flight >= self.max_in_flight and not self.stop_event.is_set():
+                        self.condition.wait(0.5)
+
+                latest = self.ring.write_seq()
+                if latest < next_seq:
+                    if time.monotonic() >= next_reopen_check:
+                        next_reopen_check = time.monotonic() + RING_REOPEN_CHECK_INTERVAL
+                        if self.ring.is_replaced():
+                            print(f"⚠️ Буфер кадров {self.path} создан заново (перезапуск производителя), "
+                                  f"переподключение")
+                            self.ring.close()
+                            self.ring = self._open()
+                            if self.ring is None:
+                                return
+                            self.reopened += 1
+                            next_seq = self.ring.write_seq() + 1
+                            continue
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+
+                # Отстали - берем самый свежий кадр, остальные пропускаем
+                if latest > next_seq:
+                    self.skipped_backpressure += latest - next_seq
+                    self.frames_read += latest - next_seq
+                    next_seq = latest
+
+                slot = self.ring.read(next_seq)
+                self.frames_read += 1
+                if slot is not None:
+                    view, frame_id, timestamp = slot
+                    with self.condition:
+                        self.in_flight += 1
+                    self.frames_sampled += 1
+                    self.on_frame(RingFrame(self, next_seq, frame_id, timestamp - started_wall, view))
+                next_seq += 1
+        except Exception as e:
+            print(f"❌ Ошибка чтения буфера кадров {self.path}: {e}")
+        finally:
+            if self.ring is not None:
+                self.ring.close()
+
+
+def load_frames(source_dir, shape, dtype, limit=64):
+    """Кадры для имитатора производителя: изображения папки, декодированные один раз"""
+    names = sorted(name for name in os.listdir(source_dir)
+                   if name.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')))[:limit]
+    frames = []
+    for name in names:
+        path = os.path.join(source_dir, name)
+        if np.dtype(dtype) == np.float32:
+            frames.append(load_model_input(path, (shape[1], shape[0])))
+        else:
+            with Image.open(path) as img:
+                frames.append(np.asarray(img.convert('RGB').resize((shape[1], shape[0]))))
+    if not frames:
+        raise ValueError(f"В папке {source_dir} нет изображений")
+    return frames
+
+
+def produce(path, frames, fps=0.0, count=None, slot_count=64, stop_event=None):
+    """
+    Имитатор камеры: пишет кадры по кругу в буфер с частотой fps (0 - как можно быстрее)
+
+    Returns:
+        int: число записанных кадров
+    """
+    ring = FrameRing.create(path, slot_count, frames[0].shape, frames[0].dtype)
+    interval = 1.0 / fps if fps > 0 else 0.0
+    started = time.monotonic()
+    written = 0
+    try:
+        while count is None or written < count:
+            if stop_event is not None and stop_event.is_set():
+                break
+            if interval:
+                delay = started + written * interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            ring.write(frames[written % len(frames)], frame_id=written)
+            written += 1
+    finally:
+        ring.close()
+    return written
+
+
+def _consume_ring(path, count, batch_size, shape):
+    """Читает count кадров кольцевого буфера, копируя их в батч; возвращает задержки, сек"""
+    ring = None
+    while ring is None:
+        try:
+            ring = FrameRing(path)
+        except (FileNotFoundError, ValueError):
+            time.sleep(0.01)
+
+    batch = np.empty((batch_size,) + tuple(shape), dtype=ring.dtype)
+    latencies = []
+    lapped = 0
+    next_seq = 1
+    row = 0
+    while len(latencies) + lapped < count:
+        if ring.write_seq() < next_seq:
+            time.sleep(0.0002)
+            continue
+        slot = ring.read(next_seq)
+        if slot is None:
+            lapped += 1
+        else:
+            view, _, timestamp = slot
+            batch[row] = view  # единственное копирование - сразу в батч модели
+            if ring.is_current(next_seq):
+                latencies.append(time.time() - timestamp)
+                row = (row + 1) % batch_size
+            else:
+                lapped += 1
+        next_seq += 1
+    ring.close()
+    return latencies, lapped
+
+
+def _consume_folder(folder, count, batch_size, shape, known):
+    """Тот же объем работы через папку: опрос, проверка готовности, декодирование"""
+    batch = np.empty((batch_size,) + tuple(shape), dtype=np.float32)
+    latencies = []
+    row = 0
+    while len(latencies) < count:
+        new = [entry for entry in os.scandir(folder)
+               if entry.name.endswith(".jpg") and entry.name not in known]
+        if not new:
+            time.sleep(0.0005)
+            continue
+        for entry in sorted(new, key=lambda item: item.name):
+            known.add(entry.name)
+            written_at = float(entry.name.split("_")[1][:-4]) / 1e6
+            with open(entry.path, 'rb') as f:
+                f.read(1)
+            batch[row] = load_model_input(entry.path, (shape[1], shape[0]))
+            latencies.append(time.time() - written_at)
+            row = (row + 1) % batch_size
+    return latencies
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def benchmark(source_dir, count=500, batch_size=8):
+    """Сравнивает передачу кадров через кольцевой буфер и через отслеживаемую папку"""
+    shape = (MODEL_INPUT_SIZE[1], MODEL_INPUT_SIZE[0], 3)
+    work_dir = tempfile.mkdtemp(prefix="frame_ring_")
+    try:
+        # Кольцевой буфер: производитель в отдельном потоке пишет готовые входы модели
+        frames = load_frames(source_dir, shape, np.float32)
+        ring_path = os.path.join(work_dir, "bench" + FRAME_RING_SUFFIX)
+        producer = threading.Thread(target=produce, args=(ring_path, frames), kwargs={'count': count, 'slot_count': 256})
+        started = time.perf_counter()
+        producer.start()
+        ring_latencies, lapped = _consume_ring(ring_path, count, batch_size, shape)
+        ring_time = time.perf_counter() - started
+        producer.join()
+
+        # Папка: производитель пишет JPEG атомарно, потребитель находит, проверяет и декодирует
+        jpeg_sources = sorted(os.path.join(source_dir, name) for name in os.listdir(source_dir)
+                              if name.lower().endswith(('.jpg', '.jpeg')))[:64]
+        folder = os.path.join(work_dir, "folder")
+        os.makedirs(folder)
+
+        def write_files():
+            for index in range(count):
+                target = os.path.join(folder, f"{index:08d}_{int(time.time() * 1e6)}.jpg")
+                shutil.copyfile(jpeg_sources[index % len(jpeg_sources)], target + ".part")
+                os.replace(target + ".part", target)
+
+        writer = threading.Thread(target=write_files)
+        started = time.perf_counter()
+        writer.start()
+        folder_latencies = _consume_folder(folder, count, batch_size, shape, set())
+        folder_time = time.perf_counter() - started
+        writer.join()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for title, latencies, elapsed in (("Кольцевой буфер", ring_latencies, ring_time),
+                                      ("Отслеживаемая папка", folder_latencies, folder_time)):
+        print(f"{title:20s}: {len(latencies) / elapsed:8.0f} кадр/с, задержка p50 "
+              f"{_percentile(latencies, 0.5) * 1000:7.2f} мс, p99 {_percentile(latencies, 0.99) * 1000:7.2f} мс")
+    if lapped:
+        print(f"Кадров перезаписано до чтения: {lapped}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Кольцевой буфер кадров: имитатор камеры и замер")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    produce_parser = subparsers.add_parser("produce", help="писать кадры из папки в буфер")
+    produce_parser.add_argument("path", help=f"файл буфера (например, line1{FRAME_RING_SUFFIX})")
+    produce_parser.add_argument("--source", default="def", help="папка с изображениями")
+    produce_parser.add_argument("--fps", type=float, default=30.0, help="частота кадров (0 - максимальная)")
+    produce_parser.add_argument("--count", type=int, help="сколько кадров записать (по умолчанию - бесконечно)")
+    produce_parser.add_argument("--slots", type=int, default=64)
+    produce_parser.add_argument("--raw", help="сырые кадры uint8 ВЫСОТАxШИРИНА вместо готового входа модели")
+
+    bench_parser = subparsers.add_parser("bench", help="сравнить с передачей через папку")
+    bench_parser.add_argument("--source", default="def", help="папка с изображениями JPEG")
+    bench_parser.add_argument("--frames", type=int, default=500)
+    bench_parser.add_argument("--batch-size", type=int, default=8)
+
+    args = parser.parse_args()
+    if args.command == "bench":
+        benchmark(args.source, args.frames, args.batch_size)
+        return
+
+    if args.raw:
+        height, width = (int(value) for value in args.raw.lower().split("x"))
+        frames = load_frames(args.source, (height, width, 3), np.uint8)
+    else:
+        frames = load_frames(args.source, (MODEL_INPUT_SIZE[1], MODEL_INPUT_SIZE[0], 3), np.float32)
+    print(f"Запись {len(frames)} кадров по кругу в {args.path} ({args.fps:g} кадр/с), Ctrl+C - остановка")
+    try:
+        written = produce(args.path, frames, args.fps, args.count, args.slots)
+        print(f"Записано кадров: {written}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
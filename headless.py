@@ -0,0 +1,193 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from main import PhotoViewer
+
+
+class HeadlessRoot:
+    """
+    Замена tk.Tk для работы PhotoViewer без окна
+
+    Реализует только то, что использует логика проверки: очередь after-вызовов,
+    которые выполняются по очереди в потоке mainloop (аналог потока Tk).
+    """
+
+    def __init__(self, width=1920, height=1080):
+        self.width = width
+        self.height = height
+        self.tasks = []
+        self.callbacks = {}
+        self.counter = itertools.count(1)
+        self.condition = threading.Condition()
+        self.running = False
+        self.destroyed = False
+
+    def after(self, ms, func=None, *args):
+        with self.condition:
+            after_id = f"after#{next(self.counter)}"
+            self.callbacks[after_id] = (func, args)
+            heapq.heappush(self.tasks, (time.monotonic() + ms / 1000, after_id))
+            self.condition.notify()
+            return after_id
+
+    def after_cancel(self, after_id):
+        with self.condition:
+            self.callbacks.pop(after_id, None)
+
+    def mainloop(self):
+        self.running = True
+        while self.running:
+            with self.condition:
+                while self.running and (not self.tasks or self.tasks[0][0] > time.monotonic()):
+                    timeout = self.tasks[0][0] - time.monotonic() if self.tasks else None
+                    self.condition.wait(timeout)
+                if not self.running:
+                    break
+                _, after_id = heapq.heappop(self.tasks)
+                callback = self.callbacks.pop(after_id, None)
+
+            if callback is None:
+                continue
+            func, args = callback
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Ошибка в отложенном вызове: {e}")
+
+    def quit(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def destroy(self):
+        self.destroyed = True
+        self.quit()
+
+    def winfo_exists(self):
+        return not self.destroyed
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def winfo_screenwidth(self):
+        return self.width
+
+    def winfo_screenheight(self):
+        return self.height
+
+    def winfo_children(self):
+        return []
+
+    def update_idletasks(self):
+        pass
+
+    def title(self, *args):
+        pass
+
+    def state(self, *args):
+        pass
+
+    def geometry(self, *args):
+        pass
+
+    def bind(self, *args):
+        pass
+
+    def unbind(self, *args):
+        pass
+
+    def protocol(self, *args):
+        pass
+
+    def grid_rowconfigure(self, *args, **kwargs):
+        pass
+
+    def grid_columnconfigure(self, *args, **kwargs):
+        pass
+
+
+class HeadlessViewer(PhotoViewer):
+    def __init__(self, root, photos_folder, on_decision=None, shared_folder=False):
+        """
+        PhotoViewer без интерфейса: та же логика наблюдения, анализа и удаления и архивации дефектов
+
+        Args:
+            root (HeadlessRoot): планировщик отложенных вызовов
+            photos_folder (str): отслеживаемая папка
+            on_decision (callable): вызывается (путь, результат) после каждого вердикта
+            shared_folder (bool): папку одновременно проверяют несколько станций
+        """
+        self.on_decision = on_decision
+        super().__init__(root)
+        self.shared_folder_enabled = shared_folder
+        self.photos_folder = os.path.abspath(photos_folder)
+        self.load_photos()
+
+    def create_main_menu(self):
+        pass
+
+    def load_saved_folder(self):
+        pass
+
+    def create_viewing_interface(self):
+        self.is_waiting_mode = False
+
+    def show_model_error(self, message):
+        print(f"❌ {message}")
+
+    def display_photo(self, photo_path, caption=None):
+        pass
+
+    def is_viewing_active(self):
+        return self.root.winfo_exists()
+
+    def finish_analysis(self, photo_path, result, color, model_version=None):
+        super().finish_analysis(photo_path, result, color, model_version)
+        if self.on_decision:
+            self.on_decision(photo_path, result)
+
+    def finish_stream_frame(self, frame, result, color, model_version=None):
+        super().finish_stream_frame(frame, result, color, model_version)
+        if self.on_decision:
+            self.on_decision(frame.name, result)
+
+    def stop(self):
+        """Останавливает наблюдение, поток, инференс и цикл событий"""
+        self.stop_file_monitoring()
+        self.stop_work_claiming()
+        self.stop_stream()
+        self.inference_queue.stop()
+        if self.model_manager:
+            self.model_manager.stop_watching()
+        if self.inference_process:
+            self.inference_process.stop()
+        self.root.destroy()
+
+
+def run_headless(photos_folder, on_decision=None, shared_folder=False, ring_path=None):
+    """
+    Запускает проверку папки без окна в фоновом потоке
+
+    Если задан ring_path, вместо папки проверяются кадры из кольцевого буфера
+    (см. frame_ring.py); дефекты все равно архивируются в photos_folder.
+
+    Returns:
+        HeadlessViewer: запущенный экземпляр (остановка - viewer.stop())
+    """
+    root = HeadlessRoot()
+    viewer = HeadlessViewer(root, photos_folder, on_decision=on_decision, shared_folder=shared_folder)
+    if not viewer.model_ready():
+        viewer.stop()
+        raise RuntimeError("Модель не загружена: задайте backend synthetic для прогона без нейросети")
+    if ring_path:
+        root.after(0, lambda: viewer.start_ring(ring_path))
+    else:
+        root.after(0, viewer.start_viewing)
+    threading.Thread(target=root.mainloop, daemon=True).start()
+    return viewer
@@ -0,0 +1,139 @@
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+
+def fit_size(width, height, max_width, max_height):
+    """Размер изображения, вписанного в прямоугольник (без увеличения)"""
+    if width <= max_width and height <= max_height:
+        return width, height
+    ratio = min(max_width / width, max_height / height)
+    return max(1, int(width * ratio)), max(1, int(height * ratio))
+
+
+def decode_preview(photo_path, max_width, max_height):
+    """
+    Быстрое превью без пирамиды: JPEG декодируется в половинном разрешении
+
+    Превью растягивается до нужного размера быстрым фильтром - мягче обычного,
+    зато в несколько раз дешевле.
+    """
+    with Image.open(photo_path) as img:
+        target = fit_size(img.width, img.height, max_width, max_height)
+        img.draft('RGB', (max(1, target[0] // 2), max(1, target[1] // 2)))
+        image = img.convert('RGB')
+    if image.size == target:
+        return image
+    return image.resize(target, Image.Resampling.BILINEAR)
+
+
+class ImagePyramidCache:
+    def __init__(self, level_sizes, budget_mb=128):
+        """
+        LRU-кеш пирамид изображений для показа с ограничением по памяти
+
+        Вместо полноразмерного кадра (24 Мп - около 70 МБ в памяти) для каждого
+        фото хранятся несколько уменьшенных копий под разрешения экрана.
+
+        Args:
+            level_sizes (list): размеры уровней (ширина, высота), от большего к меньшему
+            budget_mb (float): бюджет памяти на все пирамиды, МБ
+        """
+        self.level_sizes = sorted(level_sizes, key=lambda size: size[0] * size[1], reverse=True)
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.entries = OrderedDict()  # путь -> (уровни, байт)
+        self.used_bytes = 0
+        self.lock = threading.Lock()
+
+    def build(self, photo_path):
+        """Декодирует фото один раз и строит уровни пирамиды"""
+        largest = self.level_sizes[0]
+        with Image.open(photo_path) as img:
+            # JPEG сразу декодируется в уменьшенном масштабе, не меньшем верхнего уровня
+            img.draft('RGB', largest)
+            base = img.convert('RGB')
+
+        levels = []
+        source = base
+        for max_width, max_height in self.level_sizes:
+            size = fit_size(source.width, source.height, max_width, max_height)
+            if size != source.size:
+                source = source.resize(size, Image.Resampling.LANCZOS)
+            if not levels or levels[-1].size != source.size:
+                levels.append(source)
+        return levels
+
+    def get(self, photo_path):
+        """
+        Пирамида фото (из кеша или построенная заново)
+
+        Returns:
+            list: уровни от большего к меньшему
+        """
+        with self.lock:
+            entry = self.entries.get(photo_path)
+            if entry is not None:
+                self.entries.move_to_end(photo_path)
+                return entry[0]
+
+        levels = self.build(photo_path)
+        size_bytes = sum(level.width * level.height * len(level.getbands()) for level in levels)
+
+        with self.lock:
+            if photo_path in self.entries:
+                self.used_bytes -= self.entries.pop(photo_path)[1]
+            self.entries[photo_path] = (levels, size_bytes)
+            self.used_bytes += size_bytes
+            # Последнее фото оставляем всегда, даже если оно одно больше бюджета
+            while self.used_bytes > self.budget_bytes and len(self.entries) > 1:
+                _, (_, evicted_bytes) = self.entries.popitem(last=False)
+                self.used_bytes -= evicted_bytes
+        return levels
+
+    def fit(self, photo_path, max_width, max_height):
+        """
+        Изображение для показа в прямоугольнике max_width x max_height
+
+        Берется наименьший уровень, не меньший нужного размера, и уменьшается до него.
+        """
+        levels = self.get(photo_path)
+        target = fit_size(levels[0].width, levels[0].height, max_width, max_height)
+
+        chosen = levels[0]
+        for level in levels[1:]:
+            if level.width < target[0] or level.height < target[1]:
+                break
+            chosen = level
+
+        if chosen.size == target:
+            return chosen
+        return chosen.resize(target, Image.Resampling.LANCZOS)
+
+    def contains(self, photo_path):
+        with self.lock:
+            return photo_path in self.entries
+
+    def rename(self, old_path, new_path):
+        """Переносит пирамиду на новый путь файла"""
+        with self.lock:
+            entry = self.entries.pop(old_path, None)
+            if entry is not None:
+                self.entries[new_path] = entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.used_bytes = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: photos, used_mb, budget_mb
+        """
+        with self.lock:
+            return {
+                'photos': len(self.entries),
+                'used_mb': self.used_bytes / (1024 * 1024),
+                'budget_mb': self.budget_bytes / (1024 * 1024),
+            }
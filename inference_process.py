@@ -0,0 +1,292 @@
+import cProfile
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from model_reloader import HotReloadModel, keras_loader
+from runtime_config import apply_environment, apply_tensorflow_config
+
+
+class InferenceProcessError(RuntimeError):
+    pass
+
+
+def _attach_shared_memory(name):
+    """Подключается к сегменту родителя, не передавая его учет дочернему процессу"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # До Python 3.13 трекер ресурсов удалил бы сегмент при выходе дочернего процесса
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _child_main(conn, shm_name, buffer_shape, model_path, runtime_config, loader=keras_loader):
+    """Тело дочернего процесса: модель, батчи из общей памяти, ответы по каналу"""
+    apply_environment(runtime_config)
+    if loader is keras_loader:
+        apply_tensorflow_config(runtime_config)
+
+    shm = _attach_shared_memory(shm_name)
+    frames = np.ndarray(buffer_shape, dtype=np.float32, buffer=shm.buf)
+    profile = None
+    profile_until = 0.0
+    profile_path = None
+    try:
+        model_manager = HotReloadModel(model_path, loader=loader)
+        model_manager.start_watching()
+        conn.send(('ready', model_manager.version))
+
+        while True:
+            if profile and time.monotonic() >= profile_until:
+                _dump_child_profile(profile, profile_path)
+                profile = None
+            if not conn.poll(0.5):
+                continue
+
+            message = conn.recv()
+            if message[0] == 'stop':
+                break
+            if message[0] == 'profile':
+                # Профиль инференса по запросу из родителя, без ответа по каналу
+                _, label, duration, output_dir = message
+                if profile is None:
+                    profile = cProfile.Profile()
+                    profile.enable()
+                    profile_until = time.monotonic() + duration
+                    profile_path = os.path.join(output_dir, f"{label}-inference.pstats")
+                continue
+
+            _, request_id, count = message
+            model, version = model_manager.current()
+            try:
+                # frames[:count] - представление общей памяти, пиксели не копируются
+                prediction = model.predict(frames[:count], batch_size=count, verbose=0)
+                conn.send(('result', request_id, np.asarray(prediction[:, 0], dtype=np.float32).tolist(), version))
+            except Exception as e:
+                conn.send(('error', request_id, str(e), version))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        if profile:
+            _dump_child_profile(profile, profile_path)
+        del frames
+        shm.close()
+
+
+def _dump_child_profile(profile, path):
+    profile.disable()
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        profile.dump_stats(path)
+        print(f"✅ Профиль процесса инференса записан: {path}")
+    except OSError as e:
+        print(f"❌ Ошибка записи профиля процесса инференса: {e}")
+
+
+class InferenceProcess:
+    def __init__(self, model_path, runtime_config, max_batch, input_shape=(224, 224, 3),
+                 start_timeout=300.0, request_timeout=120.0, loader=keras_loader):
+        """
+        Инференс в отдельном процессе под наблюдением
+
+        Предобработанные батчи передаются через multiprocessing.shared_memory,
+        по каналу идут только номера заданий и вероятности. Если дочерний
+        процесс падает, он перезапускается, а прерванный батч повторяется.
+
+        Args:
+            model_path (str): путь к модели .h5
+            runtime_config (dict): настройки среды выполнения для дочернего процесса
+            max_batch (int): максимальный размер батча (размер общего буфера)
+            input_shape (tuple): (высота, ширина, каналы) входа модели
+            start_timeout (float): сколько ждать загрузки модели, сек
+            request_timeout (float): сколько ждать ответа на батч, сек
+            loader (callable): функция загрузки модели в дочернем процессе (должна импортироваться по имени)
+        """
+        self.model_path = model_path
+        self.runtime_config = runtime_config
+        self.max_batch = max(1, max_batch)
+        self.buffer_shape = (self.max_batch,) + tuple(input_shape)
+        self.start_timeout = start_timeout
+        self.request_timeout = request_timeout
+        self.loader = loader
+        self.context = multiprocessing.get_context("spawn")
+
+        size = int(np.prod(self.buffer_shape)) * np.dtype(np.float32).itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.frames = np.ndarray(self.buffer_shape, dtype=np.float32, buffer=self.shm.buf)
+
+        self.lock = threading.Lock()  # батч целиком, вместе с перезапуском процесса
+        self.send_lock = threading.Lock()  # только запись в канал и замена канала
+        self.process = None
+        self.conn = None
+        self.version = None
+        self.request_id = 0
+        self.restarts = 0
+        self.stop_event = threading.Event()
+        self.supervisor = None
+
+    def start(self):
+        """Запускает дочерний процесс и поток наблюдения"""
+        with self.lock:
+            self._spawn()
+        self.supervisor = threading.Thread(target=self._supervise, daemon=True, name="inference-supervisor")
+        self.supervisor.start()
+
+    def stop(self):
+        """Останавливает дочерний процесс и освобождает общую память"""
+        self.stop_event.set()
+        with self.lock:
+            self._terminate()
+            self.frames = None
+            self.shm.close()
+            self.shm.unlink()
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def request_profile(self, label, duration, output_dir):
+        """
+        Просит дочерний процесс записать cProfile инференса в output_dir/<label>-inference.pstats
+
+        Вызывается из потока интерфейса, поэтому не ждет батч, который сейчас
+        обрабатывается (self.lock), а берет только блокировку записи в канал.
+        """
+        with self.send_lock:
+            if not self.is_alive() or self.conn is None:
+                return
+            try:
+                self.conn.send(('profile', label, duration, os.path.abspath(output_dir)))
+            except (OSError, BrokenPipeError) as e:
+                print(f"Не удалось запросить профиль инференса: {e}")
+
+    def predict(self, batch):
+        """
+        Предсказание для батча в дочернем процессе
+
+        Args:
+            batch (numpy array): float32, (n, высота, ширина, каналы)
+
+        Returns:
+            tuple: (вероятности numpy array (n, 1), версия модели)
+        """
+        probabilities = []
+        version = None
+        for start in range(0, len(batch), self.max_batch):
+            chunk = batch[start:start + self.max_batch]
+            chunk_probabilities, version = self._predict_chunk(chunk)
+            probabilities.extend(chunk_probabilities)
+        return np.asarray(probabilities, dtype=np.float32).reshape(-1, 1), version
+
+    def _predict_chunk(self, chunk):
+        with self.lock:
+            if self.frames is None:
+                raise InferenceProcessError("процесс инференса остановлен")
+            count = len(chunk)
+            self.frames[:count] = chunk
+
+            for attempt in range(2):
+                if not self.is_alive():
+                    self._restart()
+                self.request_id += 1
+                try:
+                    with self.send_lock:
+                        self.conn.send(('predict', self.request_id, count))
+                    reply = self._receive(self.request_id, self.request_timeout)
+                except (EOFError, OSError, BrokenPipeError, InferenceProcessError) as e:
+                    print(f"❌ Процесс инференса не ответил ({e}), перезапуск")
+                    self._restart()
+                    continue
+
+                kind, _, payload, version = reply
+                self.version = version
+                if kind == 'error':
+                    raise InferenceProcessError(payload)
+                return payload, version
+
+            raise InferenceProcessError("Процесс инференса не смог обработать батч после перезапуска")
+
+    def _receive(self, request_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise InferenceProcessError("таймаут ответа")
+            if self.conn.poll(min(remaining, 0.5)):
+                reply = self.conn.recv()
+                if reply[1] == request_id:
+                    return reply
+            elif not self.process.is_alive():
+                raise InferenceProcessError(f"процесс завершился с кодом {self.process.exitcode}")
+
+    def _spawn(self):
+        parent_conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(
+            target=_child_main,
+            args=(child_conn, self.shm.name, self.buffer_shape, self.model_path, self.runtime_config, self.loader),
+            daemon=True,
+            name="inference"
+        )
+        self.process.start()
+        child_conn.close()
+        with self.send_lock:
+            self.conn = parent_conn
+
+        if not self.conn.poll(self.start_timeout):
+            raise InferenceProcessError("процесс инференса не загрузил модель вовремя")
+        try:
+            kind, version = self.conn.recv()
+        except EOFError:
+            raise InferenceProcessError(f"процесс инференса завершился при запуске (код {self.process.exitcode})")
+        self.version = version
+        print(f"✅ Процесс инференса запущен (pid {self.process.pid}), модель {version}")
+
+    def _terminate(self):
+        if self.process is None:
+            return
+        try:
+            if self.process.is_alive():
+                with self.send_lock:
+                    self.conn.send(('stop',))
+                self.process.join(5)
+        except (OSError, BrokenPipeError):
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(5)
+        with self.send_lock:
+            self.conn.close()
+            self.conn = None
+            self.process = None
+
+    def _restart(self):
+        self.restarts += 1
+        self._terminate()
+        self._spawn()
+
+    def _supervise(self):
+        """Перезапускает упавший в простое процесс, не дожидаясь следующего батча"""
+        delay = 1.0
+        while not self.stop_event.wait(1.0):
+            if self.is_alive():
+                delay = 1.0
+                continue
+            with self.lock:
+                if self.stop_event.is_set() or self.is_alive():
+                    continue
+                try:
+                    print("⚠️ Процесс инференса завершился, перезапуск")
+                    self._restart()
+                    delay = 1.0
+                except Exception as e:
+                    print(f"❌ Не удалось перезапустить процесс инференса: {e}")
+                    # Не перезапускаем в цикле без паузы, если модель не грузится
+                    self.stop_event.wait(delay)
+                    delay = min(delay * 2, 60.0)
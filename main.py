@@ -1,13 +1,39 @@
 import tkinter as tk
-from tkinter import messagebox, filedialog
+from tkinter import messagebox, filedialog, simpledialog
 from PIL import Image, ImageTk
 import os
+import re
+import sys
 import glob
+import signal
 import time
+import argparse
 import threading
+from collections import OrderedDict, deque
 from datetime import datetime
 import numpy as np
 
+from batch_inference import PRIORITY_BACKLOG, PRIORITY_LIVE, BatchInferenceQueue
+from defect_archive import ARCHIVE_DIR_NAME, DefectArchive
+from defect_gallery import DefectGallery
+from frame_dedup import PerceptualHashIndex, dhash, hamming_distance
+from image_pyramid import ImagePyramidCache, decode_preview, fit_size
+from inference_process import InferenceProcess
+from profiling_hooks import ProfileCapture, check_control_file
+from preprocessing import MODEL_INPUT_SIZE, RoiConfig, load_model_input
+from model_reloader import HotReloadModel
+from overload_control import (DEGRADED_BATCH_FACTOR, OVERLOAD_HIGH_WATERMARK, OVERLOAD_LOW_WATERMARK,
+                              AdmissionQueue, OverloadController)
+from runtime_config import (add_runtime_arguments, apply_environment, apply_tensorflow_config,
+                            load_runtime_config)
+from synthetic_backend import from_runtime_config as synthetic_model_from_config
+from thumbnail_cache import ThumbnailCache
+from work_claim import LeaseClaimer
+
+# Настройки среды выполнения (файл/окружение/командная строка) нужны до импорта TensorFlow
+RUNTIME_CONFIG = load_runtime_config(sys.argv[1:] if __name__ == "__main__" else None)
+apply_environment(RUNTIME_CONFIG)
+
 # Проверяем наличие watchdog
 try:
     from watchdog.observers import Observer
@@ -19,6 +45,18 @@ except ImportError:
     WATCHDOG_AVAILABLE = False
     print("Watchdog не установлен, используем периодическую проверку")
 
+# Видеопоток с камеры или из файла (нужен opencv-python)
+try:
+    from stream_source import STREAM_SAMPLE_FPS, StreamSource, parse_stream_source
+
+    STREAM_AVAILABLE = True
+except ImportError:
+    STREAM_SAMPLE_FPS = 2.0
+    STREAM_AVAILABLE = False
+    print("OpenCV не установлен, видеопоток недоступен")
+
+from frame_ring import FRAME_RING_SUFFIX, RingConsumer
+
 # Загрузка модели нейронной сети
 try:
     from tensorflow.keras.models import load_model
@@ -29,11 +67,73 @@ except ImportError:
     TENSORFLOW_AVAILABLE = False
     print("TensorFlow не установлен")
 
+# Пропуск инференса для почти одинаковых кадров серии
+DEDUP_ENABLED = True
+DEDUP_HASH_SIZE = 16  # сторона dHash: 256 бит различают соседние детали в одной оснастке
+DEDUP_MAX_DISTANCE = 2  # максимальное расстояние Хэмминга между dHash кадров
+DEDUP_INDEX_SIZE = 256  # сколько последних кадров помнит индекс
+DEDUP_MAX_AGE = 2.0  # секунд с вердикта модели - не дольше одной серии кадров
+
+# Уменьшенные копии кадров для показа вместо полноразмерных изображений
+PYRAMID_BUDGET_MB = 128
+VIEW_HISTORY_SIZE = 30  # сколько последних кадров доступно стрелками влево/вправо
+
+MODEL_PATH = 'defect_detection_continued.h5'
+
+# Имена дефектов, которые прежние версии переименовывали прямо в отслеживаемой папке
+DEFECT_NAME_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}-\d{2}-\d{2}(_\d+)?\.\w+$")
+DEFECT_HISTORY_LIMIT = 1000  # сколько последних дефектов архива показывать в ленте
+PROFILE_POLL_INTERVAL = 1000  # мс между проверками файла-запроса и сигнала профилирования
+OWN_OPERATION_TTL = 10.0  # сколько секунд события о собственных перемещениях считаются эхом
+ADMISSION_PUMP_INTERVAL = 100  # мс между передачами обнаруженных файлов на анализ
+FOOTER_HEIGHT = 150
+
+# Совместная обработка одной сетевой папки несколькими станциями
+CLAIM_LEASE_TTL = 30.0  # секунд без продления, после которых аренда упавшей станции забирается
+CLAIM_SWEEP_INTERVAL = 5000  # мс между поисками незанятых и брошенных файлов
+
+
+class OwnOperationFilter:
+    def __init__(self, ttl=OWN_OPERATION_TTL):
+        """
+        Помнит файлы, которые приложение перемещает само
+
+        События наблюдателя об этих перемещениях - эхо наших же действий,
+        их не нужно снова показывать и анализировать.
+        """
+        self.ttl = ttl
+        self.sources = {}  # путь -> время, до которого событие считается эхом
+        self.outputs = {}
+        self.lock = threading.Lock()
+
+    def expect_move(self, source_path, target_path=None):
+        """Регистрирует перемещение до того, как оно выполнено"""
+        deadline = time.monotonic() + self.ttl
+        with self.lock:
+            self.sources[os.path.abspath(source_path)] = deadline
+            if target_path:
+                self.outputs[os.path.abspath(target_path)] = deadline
+
+    def is_own(self, src_path, dest_path=None):
+        """Вызвано ли событие нашим собственным перемещением"""
+        now = time.monotonic()
+        with self.lock:
+            for registry in (self.sources, self.outputs):
+                for path in [path for path, deadline in registry.items() if deadline < now]:
+                    del registry[path]
+
+            if dest_path:
+                return (os.path.abspath(src_path) in self.sources or
+                        os.path.abspath(dest_path) in self.outputs)
+            # Для созданных/измененных файлов исходное имя не проверяем:
+            # камера может записать новый кадр с тем же именем
+            return os.path.abspath(src_path) in self.outputs
+
 
 class PhotoWatcher(FileSystemEventHandler):
     def __init__(self, app, folder_path):
         self.app = app
-        self.folder_path = folder_path
+        self.folder_path = os.path.abspath(folder_path)
 
     def on_created(self, event):
         self.handle_event(event)
@@ -49,9 +149,17 @@ class PhotoWatcher(FileSystemEventHandler):
         dest_path = getattr(event, 'dest_path', None)
         file_path = dest_path if dest_path else src_path
 
-        if not event.is_directory and self.is_image_file(file_path):
-            print(f"Обнаружено изменение: {file_path}")
-            self.app.root.after(1000, lambda: self.app.add_new_photo(file_path))
+        if event.is_directory or not self.is_image_file(file_path):
+            return
+
+        # Собственные перемещения и файлы, ушедшие из папки (например, в архив), пропускаем
+        if self.app.own_operations.is_own(src_path, dest_path):
+            return
+        if os.path.dirname(os.path.abspath(file_path)) != self.folder_path:
+            return
+
+        # Из потока watchdog только кладем путь в очередь: Tk и анализ - в главном потоке
+        self.app.admit_photo(file_path)
 
     def is_image_file(self, file_path):
         image_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif')
@@ -75,28 +183,190 @@ class PhotoViewer:
         # Инициализация переменных
         self.photos_folder = ""
         self.WATCHDOG_AVAILABLE = WATCHDOG_AVAILABLE
-        self.model = None
+        self.model_manager = None
+        self.inference_process = None
+        self.synthetic_model = None
+        self.stream_source = None
         self.photos = []
         self.current_photo_path = None
         self.current_photo_data = None
         self.known_files = set()
         self.analyzed_photos = {}
+        self.result_versions = {}  # путь -> версия модели, вынесшей вердикт
         self.current_photo_reference = None
         self.is_waiting_mode = False
         self.monitoring_after_id = None
+        self.defect_archive = None
+        self.own_operations = OwnOperationFilter()
+        self.drain_backlog_enabled = True
+        self.backlog_pending = set()
+        self.backlog_total = 0
+        self.backlog_done = 0
+        self.shared_folder_enabled = False
+        self.work_claimer = None
+        self.claim_sweep_after_id = None
+        self.admission = AdmissionQueue()
+        self.admission_after_id = None
+        self.analysis_pending = set()  # фото, отправленные в модель и еще не получившие вердикт
+        self.overload = OverloadController(on_change=self.on_overload_change)
+        self.latest_stream_index = -1
+        self.stream_skipped_seen = 0
+        self.thumbnail_cache = ThumbnailCache()
+        self.roi_config = RoiConfig.load()
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        self.pyramid_cache = ImagePyramidCache(
+            [(screen_width // scale, screen_height // scale) for scale in (1, 2, 4)],
+            budget_mb=PYRAMID_BUDGET_MB
+        )
+        self.view_history = deque(maxlen=VIEW_HISTORY_SIZE)
+        self.history_position = None  # None - показывается живой поток
+        self.recent_verdicts = OrderedDict()
+        self.frame_index = PerceptualHashIndex(
+            max_entries=DEDUP_INDEX_SIZE,
+            max_distance=DEDUP_MAX_DISTANCE,
+            max_age=DEDUP_MAX_AGE
+        )
 
         # Загрузка модели
-        if TENSORFLOW_AVAILABLE:
+        self.runtime_config = RUNTIME_CONFIG
+        backend = self.runtime_config['backend']
+        if backend == 'keras' and self.runtime_config['inference_process']:
+            # Модель живет в отдельном процессе - TensorFlow не делит GIL с интерфейсом
+            try:
+                self.inference_process = InferenceProcess(
+                    MODEL_PATH,
+                    self.runtime_config,
+                    max_batch=self.runtime_config['batch_size'],
+                    input_shape=(MODEL_INPUT_SIZE[1], MODEL_INPUT_SIZE[0], 3)
+                )
+                self.inference_process.start()
+            except Exception as e:
+                print(f"❌ Ошибка запуска процесса инференса: {e}")
+                if self.inference_process:
+                    self.inference_process.stop()
+                self.inference_process = None
+        elif backend == 'keras' and TENSORFLOW_AVAILABLE:
             try:
-                self.model = load_model('defect_detection_continued.h5')
+                apply_tensorflow_config(self.runtime_config)
+                # Новая версия файла модели подхватывается на лету, без перезапуска
+                self.model_manager = HotReloadModel(
+                    MODEL_PATH,
+                    loader=load_model,
+                    on_swap=self.on_model_swap
+                )
+                self.model_manager.start_watching()
                 print("✅ Модель нейронной сети загружена")
             except Exception as e:
                 print(f"❌ Ошибка загрузки модели: {e}")
-                self.model = None
+                self.model_manager = None
+
+        if backend == 'synthetic':
+            # Детерминированная замена модели для нагрузочных прогонов: тот же конвейер без TensorFlow
+            self.synthetic_model = synthetic_model_from_config(self.runtime_config)
+            print(f"🧪 Синтетическая модель {self.synthetic_model.version}")
+        elif not self.model_available:
+            # Без модели фото не удаляются и не архивируются - проверка не запускается
+            print("❌ Нейронная сеть недоступна, проверка фото невозможна")
+
+        # Батчевый инференс: кадры, пришедшие почти одновременно, идут в модель одним вызовом
+        self.inference_queue = BatchInferenceQueue(
+            self.process_analysis_batch,
+            self.on_batch_result,
+            self.on_batch_error,
+            batch_size=self.runtime_config['batch_size'],
+            batch_timeout=self.runtime_config['batch_timeout']
+        )
+        self.inference_queue.start()
+
+        # Профиль по запросу: F9, сигнал SIGUSR1 или файл profile.request рядом со скриптом
+        self.profiler = ProfileCapture(self.root.after)
+        self.profile_requested = None
+        self.root.bind("<F9>", lambda event: self.start_profiling("hotkey"))
+        self.install_profiling_signal()
+        self.poll_profile_requests()
 
         self.create_main_menu()
         self.load_saved_folder()
 
+    @property
+    def model(self):
+        """Текущая модель (None - демо-режим)"""
+        return self.model_manager.model if self.model_manager else None
+
+    @property
+    def model_available(self):
+        """Доступна ли нейронная сеть (в этом или в отдельном процессе)"""
+        return self.model_manager is not None or self.inference_process is not None
+
+    @property
+    def model_version(self):
+        """Версия текущей модели"""
+        if self.inference_process:
+            return self.inference_process.version
+        if self.model_manager:
+            return self.model_manager.version
+        if self.synthetic_model:
+            return self.synthetic_model.version
+        return None
+
+    def model_ready(self):
+        """Есть ли чем выносить вердикты; если нет - сообщает об ошибке"""
+        if self.model_available or self.synthetic_model is not None:
+            return True
+        self.show_model_error(f"Модель {MODEL_PATH} не загружена (нужен TensorFlow и файл модели). "
+                              f"Фото не будут проверяться, удаляться и архивироваться.")
+        return False
+
+    def show_model_error(self, message):
+        print(f"❌ {message}")
+        messagebox.showerror("Ошибка", message)
+
+    def on_model_swap(self, new_version, old_version):
+        """Вызывается из потока наблюдения после замены модели"""
+        # Вердикты старой модели для похожих кадров больше не переиспользуем
+        self.frame_index.clear()
+        self.root.after(0, self.update_status_line)
+
+    def install_profiling_signal(self):
+        """Запись профиля по SIGUSR1 (kill -USR1 <pid>), где такой сигнал есть"""
+        if not hasattr(signal, 'SIGUSR1') or threading.current_thread() is not threading.main_thread():
+            return
+
+        def on_signal(signum, frame):
+            # Только флаг: обработчик может прервать код, держащий блокировки
+            self.profile_requested = "signal"
+
+        signal.signal(signal.SIGUSR1, on_signal)
+
+    def poll_profile_requests(self):
+        """Периодически проверяет сигнал и файл-запрос профилирования"""
+        if not self.root.winfo_exists():
+            return
+
+        duration = check_control_file()
+        if duration is not None:
+            self.start_profiling("file", duration or None)
+        elif self.profile_requested:
+            self.start_profiling(self.profile_requested)
+        self.profile_requested = None
+
+        self.root.after(PROFILE_POLL_INTERVAL, self.poll_profile_requests)
+
+    def start_profiling(self, reason, duration=None):
+        """Начинает запись профиля всех потоков, не прерывая проверку"""
+        if not self.profiler.start(reason, duration):
+            return
+
+        if self.inference_process:
+            self.inference_process.request_profile(
+                self.profiler.label,
+                duration or self.profiler.duration,
+                self.profiler.output_dir
+            )
+        self.update_status_line()
+        self.root.after(int((duration or self.profiler.duration) * 1000) + 100, self.update_status_line)
+
     def create_main_menu(self):
         """Создает главное меню с выбором папки"""
         for widget in self.root.winfo_children():
@@ -117,13 +387,21 @@ class PhotoViewer:
         title_label.place(relx=0.5, rely=0.2, anchor=tk.CENTER)
 
         # Информация о модели
-        model_status = "✅ Модель нейронной сети загружена" if self.model else "❌ Модель недоступна (демо-режим)"
+        if self.synthetic_model:
+            model_status = f"🧪 Синтетическая модель {self.synthetic_model.version} (не для рабочей проверки)"
+            model_color = 'darkorange'
+        elif self.model_available:
+            model_status = "✅ Модель нейронной сети загружена"
+            model_color = 'green'
+        else:
+            model_status = "❌ Модель недоступна - проверка невозможна"
+            model_color = 'red'
         model_label = tk.Label(
             main_frame,
             text=model_status,
             font=("Arial", 14),
             bg='lightgray',
-            fg='green' if self.model else 'red',
+            fg=model_color,
             justify=tk.CENTER
         )
         model_label.place(relx=0.5, rely=0.3, anchor=tk.CENTER)
@@ -141,6 +419,20 @@ class PhotoViewer:
         )
         select_folder_button.place(relx=0.5, rely=0.4, anchor=tk.CENTER)
 
+        # Кадры с камеры или из видеофайла анализируются без записи на диск
+        stream_button = tk.Button(
+            main_frame,
+            text="Видеопоток / камера",
+            command=self.open_stream_dialog,
+            font=("Arial", 20),
+            bg='darkgreen',
+            fg='white',
+            width=25,
+            height=2,
+            state=tk.NORMAL if STREAM_AVAILABLE else tk.DISABLED
+        )
+        stream_button.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
+
         # Кнопка "Начать проверку"
         self.start_button = tk.Button(
             main_frame,
@@ -155,6 +447,30 @@ class PhotoViewer:
         )
         self.start_button.place(relx=0.5, rely=0.6, anchor=tk.CENTER)
 
+        # Обработка файлов, уже лежащих в папке на момент старта (после сбоя или перезапуска)
+        self.drain_backlog_var = tk.BooleanVar(master=self.root, value=self.drain_backlog_enabled)
+        drain_backlog_check = tk.Checkbutton(
+            main_frame,
+            text="Проверить фото, уже находящиеся в папке",
+            variable=self.drain_backlog_var,
+            command=self.toggle_backlog_drain,
+            font=("Arial", 14),
+            bg='lightgray'
+        )
+        drain_backlog_check.place(relx=0.5, rely=0.7, anchor=tk.CENTER)
+
+        # Несколько станций делят файлы одной папки без повторной обработки
+        self.shared_folder_var = tk.BooleanVar(master=self.root, value=self.shared_folder_enabled)
+        shared_folder_check = tk.Checkbutton(
+            main_frame,
+            text="Папку проверяют несколько станций",
+            variable=self.shared_folder_var,
+            command=self.toggle_shared_folder,
+            font=("Arial", 14),
+            bg='lightgray'
+        )
+        shared_folder_check.place(relx=0.5, rely=0.74, anchor=tk.CENTER)
+
         # Метка для отображения информации о выбранной папке
         self.folder_info = tk.Label(
             main_frame,
@@ -181,6 +497,14 @@ class PhotoViewer:
         )
         self.clear_folder_button.place(relx=0.5, rely=0.9, anchor=tk.CENTER)
 
+    def toggle_backlog_drain(self):
+        """Включает или отключает обработку бэклога при старте проверки"""
+        self.drain_backlog_enabled = self.drain_backlog_var.get()
+
+    def toggle_shared_folder(self):
+        """Включает или отключает режим общей папки для нескольких станций"""
+        self.shared_folder_enabled = self.shared_folder_var.get()
+
     def select_folder(self):
         """Выбор папки с фотографиями"""
         folder = filedialog.askdirectory(title="Выберите папку с фотографиями")
@@ -265,50 +589,369 @@ class PhotoViewer:
         return file_path.lower().endswith(image_extensions)
 
     def is_file_ready(self, file_path):
+        """Дописан ли файл: открывается на запись и не пуст (без ожидания)"""
         try:
-            with open(file_path, 'rb'):
-                return True
-        except IOError:
+            with open(file_path, 'rb+') as f:
+                return os.fstat(f.fileno()).st_size > 0 and bool(f.read(1))
+        except OSError:
             return False
 
-    def wait_for_file_ready(self, file_path, max_attempts=15, delay=0.5):
-        for attempt in range(max_attempts):
-            try:
-                if os.path.isfile(file_path):
-                    with open(file_path, 'rb+') as f:
-                        file_size = os.path.getsize(file_path)
-                        if file_size > 0:
-                            f.read(100)
-                            f.seek(0)
-                            print(f"Файл готов: {os.path.basename(file_path)} (размер: {file_size} байт)")
-                            return True
-            except (IOError, PermissionError, OSError) as e:
-                print(f"Попытка {attempt + 1}/{max_attempts}: Файл заблокирован, повтор через {delay} сек")
-
-            if attempt < max_attempts - 1:
-                time.sleep(delay)
-
-        print(f"Файл не стал доступен после {max_attempts} попыток: {file_path}")
-        return False
-
     def start_viewing(self):
         """Начинает проверку фотографий"""
         if not self.photos_folder:
             messagebox.showerror("Ошибка", "Сначала выберите папку с фотографиями")
             return
+        if not self.model_ready():
+            return
 
         self.stop_file_monitoring()
+        self.configure_overload()
         self.known_files = set(self.photos)
         self.analyzed_photos = {}
+        self.result_versions = {}
         self.current_photo_path = None
         self.current_photo_data = None
         self.current_photo_reference = None
         self.is_waiting_mode = False
+        self.frame_index.clear()
+
+        # Уже переименованные дефекты - это история, а не бэклог
+        self.defect_archive = DefectArchive(os.path.join(self.photos_folder, ARCHIVE_DIR_NAME))
+        defect_history = [path for path in self.photos if self.is_defect_output(path)]
+        defect_history += self.defect_archive.recent(DEFECT_HISTORY_LIMIT)
+        backlog = [path for path in self.photos if not self.is_defect_output(path)]
 
         self.create_viewing_interface()
+        self.set_defect_history(defect_history)
         self.start_file_monitoring()
         self.show_waiting_message()
 
+        if self.shared_folder_enabled:
+            # Бэклог не захватывается целиком: станции разбирают его небольшими порциями
+            self.start_work_claiming()
+        elif self.drain_backlog_enabled:
+            self.start_backlog_drain(backlog)
+
+    def open_stream_dialog(self):
+        """Спрашивает источник видеопотока и начинает проверку"""
+        text = simpledialog.askstring(
+            "Видеопоток",
+            f"Номер камеры, путь к видеофайлу, адрес потока\nили файл буфера кадров (*{FRAME_RING_SUFFIX}):",
+            parent=self.root
+        )
+        if not text:
+            return
+        if text.strip().endswith(FRAME_RING_SUFFIX):
+            self.start_ring(text.strip())
+        else:
+            self.start_stream(text)
+
+    def start_stream(self, source, sample_fps=STREAM_SAMPLE_FPS):
+        """
+        Начинает проверку кадров видеопотока
+
+        Кадры идут в батчевый инференс прямо из памяти; на диск (в архив)
+        записываются только кадры с дефектом.
+
+        Args:
+            source (int | str): номер камеры, путь к видеофайлу или URL
+            sample_fps (float): сколько кадров в секунду отправлять на анализ
+        """
+        if not STREAM_AVAILABLE:
+            messagebox.showerror("Ошибка", "Для видеопотока нужен пакет opencv-python")
+            return
+
+        # В работе держим не больше двух батчей - лишние кадры пропускаются, а не копятся
+        self.start_frame_source(StreamSource(
+            parse_stream_source(source),
+            self.on_stream_frame,
+            sample_fps=sample_fps,
+            max_in_flight=2 * self.runtime_config['batch_size']
+        ))
+
+    def start_ring(self, path):
+        """
+        Начинает проверку кадров из кольцевого буфера в общей памяти (см. frame_ring.py)
+
+        Кадры не копируются и не декодируются: готовый вход модели берется
+        прямо из слота буфера при сборке батча.
+
+        Args:
+            path (str): файл буфера, в который пишет производитель кадров
+        """
+        self.start_frame_source(RingConsumer(
+            path,
+            self.on_stream_frame,
+            max_in_flight=2 * self.runtime_config['batch_size']
+        ))
+
+    def start_frame_source(self, frame_source):
+        """Переключает просмотр на кадры из памяти (видеопоток или буфер кадров) и запускает источник"""
+        if not self.model_ready():
+            return
+        self.stop_file_monitoring()
+        self.stop_work_claiming()
+        self.stop_stream()
+        self.analyzed_photos = {}
+        self.result_versions = {}
+        self.current_photo_path = None
+        self.current_photo_data = None
+        self.current_photo_reference = None
+        self.view_history.clear()
+        self.frame_index.clear()
+
+        self.defect_archive = DefectArchive(os.path.join(self.photos_folder or os.getcwd(), ARCHIVE_DIR_NAME))
+        self.create_viewing_interface()
+        self.set_defect_history(self.defect_archive.recent(DEFECT_HISTORY_LIMIT))
+        self.show_waiting_message()
+
+        self.stream_source = frame_source
+        try:
+            self.stream_source.start()
+        except IOError as e:
+            print(f"❌ {e}")
+            self.stream_source = None
+            messagebox.showerror("Ошибка", str(e))
+            return
+        print(f"Начата проверка кадров {self.stream_source.name}")
+        self.latest_stream_index = -1
+        self.stream_skipped_seen = 0
+        # Перегрузка - все места для кадров заняты и кадры пропускаются
+        self.configure_overload(frame_source.max_in_flight + 1, frame_source.max_in_flight // 2)
+        self.start_admission_pump()
+        self.update_status_line()
+
+    def stop_stream(self):
+        """Останавливает чтение видеопотока"""
+        if self.stream_source:
+            self.stream_source.stop()
+            self.stream_source = None
+            self.stop_admission_pump()
+
+    def on_stream_frame(self, frame):
+        """Вызывается из потока чтения для каждого отобранного кадра"""
+        self.latest_stream_index = frame.index
+        self.inference_queue.submit(frame, priority=PRIORITY_LIVE)
+        self.root.after(0, lambda: self.show_stream_frame(frame))
+
+    def show_stream_frame(self, frame):
+        """Показывает кадр потока (только если он новее показанного)"""
+        current = self.current_photo_path
+        if current is not None and not isinstance(current, str) and current.index >= frame.index:
+            return
+        if self.overload.degraded and frame.index < self.latest_stream_index:
+            # При перегрузке показываем только самый свежий кадр
+            return
+        if not hasattr(self, 'image_label') or not self.image_label.winfo_exists():
+            return
+
+        self.current_photo_path = frame
+        self.render_stream_frame(frame)
+        self.info_label.config(text=f"Поток: {frame.stream_name}\nКадр {frame.index} ({frame.timestamp:.1f} с)")
+        self.analysis_result.config(text="Выполняется анализ...", fg='yellow')
+
+    def render_stream_frame(self, frame):
+        """Уменьшает кадр потока под доступное место и выводит его"""
+        max_width = max(1, self.root.winfo_width() - 20)
+        max_height = max(1, self.root.winfo_height() - self.controls_height() - 20)
+        size = fit_size(frame.image.width, frame.image.height, max_width, max_height)
+        image = frame.image if size == frame.image.size else frame.image.resize(size, Image.Resampling.BILINEAR)
+        self.current_photo_data = image
+        self.set_label_image(image)
+
+    def finish_stream_frame(self, frame, result, color, model_version=None):
+        """Вердикт по кадру потока: дефект сохраняется в архив, хороший кадр просто забывается"""
+        frame.source.done(frame)
+        if frame is self.current_photo_path:
+            self.show_analysis_result(result, color)
+        self.update_status_line()
+
+        if result != "дефект":
+            return
+        if not frame.is_valid():
+            print(f"⚠️ Кадр с дефектом {frame.name} перезаписан в буфере до сохранения")
+            return
+
+        def archive_thread():
+            try:
+                new_path = self.defect_archive.store_image(
+                    frame.image,
+                    frame.name,
+                    result=result,
+                    model_version=model_version,
+                    stream_time=round(frame.timestamp, 3)
+                )
+            except Exception as e:
+                print(f"❌ Ошибка сохранения кадра с дефектом {frame.name}: {e}")
+                return
+            print(f"Кадр с дефектом сохранен: {frame.name} -> "
+                  f"{os.path.relpath(new_path, self.defect_archive.root)}")
+            self.root.after(0, lambda: self.on_stream_defect_saved(new_path, result, color))
+
+        threading.Thread(target=archive_thread, daemon=True, name="defect-archive").start()
+
+    def on_stream_defect_saved(self, new_path, result, color):
+        """Добавляет сохраненный кадр с дефектом в историю (в главном потоке)"""
+        self.analyzed_photos[new_path] = (result, color)
+        self.thumbnail_cache.request(new_path)
+        self.add_defect_to_history(new_path)
+
+    def fail_stream_frame(self, frame):
+        """Ошибка анализа кадра потока"""
+        frame.source.done(frame)
+        if frame is self.current_photo_path:
+            self.show_analysis_error()
+
+    def item_name(self, item):
+        """Имя задания анализа: файла или кадра видеопотока"""
+        return os.path.basename(item) if isinstance(item, str) else item.name
+
+    def item_roi(self, item):
+        """Область интереса для файла (по пути) или кадра потока (по имени)"""
+        return self.roi_config.roi_for(item if isinstance(item, str) else item.name)
+
+    def item_source(self, item):
+        """Путь к файлу или кадр в памяти для декодирования"""
+        return item if isinstance(item, str) else item.image
+
+    def is_defect_output(self, file_path):
+        """Является ли файл дефектом, переименованным в папке прежней версией"""
+        return bool(DEFECT_NAME_PATTERN.match(os.path.basename(file_path)))
+
+    def start_backlog_drain(self, photo_paths):
+        """
+        Ставит уже лежащие в папке фото в фоновую обработку
+
+        Бэклог идет через ту же батчевую очередь с низким приоритетом:
+        новые кадры всегда показываются и анализируются первыми.
+        """
+        self.inference_queue.clear_backlog()
+        self.backlog_pending = set(photo_paths)
+        self.backlog_total = len(photo_paths)
+        self.backlog_done = 0
+
+        if not photo_paths:
+            return
+
+        print(f"Бэклог: {len(photo_paths)} фото поставлено в фоновую обработку")
+        for photo_path in photo_paths:
+            self.inference_queue.submit(photo_path, priority=PRIORITY_BACKLOG)
+        self.update_status_line()
+
+    def mark_backlog_done(self, photo_path):
+        """Учитывает обработанное фото бэклога"""
+        if photo_path not in self.backlog_pending:
+            return False
+
+        self.backlog_pending.discard(photo_path)
+        self.backlog_done += 1
+        if not self.backlog_pending:
+            print(f"Бэклог обработан: {self.backlog_done} фото")
+        return True
+
+    def start_work_claiming(self):
+        """Запускает распределение файлов общей папки между станциями"""
+        self.stop_work_claiming()
+        self.inference_queue.clear_backlog()
+        self.backlog_pending = set()
+        self.backlog_total = 0
+        self.backlog_done = 0
+
+        self.work_claimer = LeaseClaimer(self.photos_folder, lease_ttl=CLAIM_LEASE_TTL)
+        self.work_claimer.start()
+        print(f"Режим общей папки: станция {self.work_claimer.node_id}")
+        self.claim_sweep()
+
+    def stop_work_claiming(self):
+        """Останавливает поиск файлов и отпускает все аренды станции"""
+        if self.claim_sweep_after_id:
+            self.root.after_cancel(self.claim_sweep_after_id)
+            self.claim_sweep_after_id = None
+        if self.work_claimer:
+            self.work_claimer.stop()
+            self.work_claimer = None
+
+    def claim_photo(self, claimer, photo_path):
+        """
+        Берет фото в работу этой станцией
+
+        Обращается к общей папке - вызывать в потоке аренд (claimer.submit).
+
+        Returns:
+            bool: можно ли показывать и анализировать фото
+        """
+        # Переименованные дефекты других станций уже проверены
+        if self.is_defect_output(photo_path):
+            return photo_path in self.analyzed_photos
+
+        if not claimer.try_claim(photo_path):
+            print(f"Фото обрабатывает другая станция: {os.path.basename(photo_path)}")
+            return False
+
+        # Файл могли удалить или переименовать до того, как предыдущая станция отпустила аренду
+        if not os.path.isfile(photo_path):
+            claimer.release(photo_path)
+            return False
+        return True
+
+    def release_photo(self, photo_path):
+        """Отпускает аренду фото после удаления, перемещения в архив или ошибки"""
+        if self.work_claimer is not None:
+            self.work_claimer.submit(self.work_claimer.release, photo_path)
+
+    def claim_sweep(self):
+        """
+        Периодически забирает незанятые файлы общей папки в фоновую обработку
+
+        Сюда попадают и файлы станций, которые упали, не продлив аренду.
+        """
+        self.claim_sweep_after_id = None
+        if self.work_claimer is None or not self.root.winfo_exists():
+            return
+
+        batch_size = self.runtime_config['batch_size']
+        if self.inference_queue.pending(PRIORITY_BACKLOG) < batch_size:
+            # Чтение папки и аренды - в потоке аренд; сюда возвращается только список взятых файлов
+            known = set(self.analyzed_photos) | self.backlog_pending | self.analysis_pending
+            self.work_claimer.submit(self.sweep_shared_folder, self.work_claimer, known, batch_size)
+
+        self.claim_sweep_after_id = self.root.after(CLAIM_SWEEP_INTERVAL, self.claim_sweep)
+
+    def sweep_shared_folder(self, claimer, known, batch_size):
+        """Ищет и берет в работу незанятые файлы общей папки (в потоке аренд)"""
+        candidates = []
+        try:
+            for name in sorted(os.listdir(self.photos_folder)):
+                file_path = os.path.join(self.photos_folder, name)
+                if self.is_image_file(file_path) and not self.is_defect_output(file_path) and file_path not in known:
+                    candidates.append(file_path)
+        except OSError as e:
+            print(f"Ошибка чтения папки {self.photos_folder}: {e}")
+
+        # Без обработки бэклога забираем только брошенные другими станциями файлы
+        unclaimed = claimer.find_unclaimed(
+            candidates,
+            limit=batch_size * 2,
+            expired_only=not self.drain_backlog_enabled
+        )
+        claimed = [path for path in unclaimed if self.claim_photo(claimer, path)]
+        claimer.sweep_orphan_leases()
+        if claimed:
+            self.root.after(0, lambda: self.queue_claimed_photos(claimer, claimed))
+
+    def queue_claimed_photos(self, claimer, claimed):
+        """Ставит взятые в работу файлы общей папки в фоновую обработку"""
+        if claimer is not self.work_claimer:
+            # Режим общей папки уже выключен, аренды отпущены
+            return
+        for photo_path in claimed:
+            if photo_path in self.backlog_pending or photo_path in self.analysis_pending:
+                continue
+            self.backlog_pending.add(photo_path)
+            self.backlog_total += 1
+            self.inference_queue.submit(photo_path, priority=PRIORITY_BACKLOG)
+        self.update_status_line()
+
     def create_viewing_interface(self):
         """Создает интерфейс для проверки фотографий с фиксированным футтером"""
         for widget in self.root.winfo_children():
@@ -318,7 +961,8 @@ class PhotoViewer:
 
         # Настройка grid для корневого окна :cite[1]:cite[3]
         self.root.grid_rowconfigure(0, weight=1)  # image_frame расширяется
-        self.root.grid_rowconfigure(1, weight=0)  # info_frame фиксированной высоты
+        self.root.grid_rowconfigure(1, weight=0)  # лента истории дефектов
+        self.root.grid_rowconfigure(2, weight=0)  # info_frame фиксированной высоты
         self.root.grid_columnconfigure(0, weight=1)  # обе колонки расширяются
 
         # Фрейм для изображения - занимает все доступное пространство
@@ -329,14 +973,19 @@ class PhotoViewer:
         self.image_label = tk.Label(self.image_frame, bg='black')
         self.image_label.pack(expand=True, fill=tk.BOTH)
 
+        # Лента истории дефектов над футтером
+        self.gallery = DefectGallery(self.root, self.thumbnail_cache, on_select=self.show_history_photo)
+        self.gallery.grid(row=1, column=0, sticky="ew")
+
         # Фрейм для информации (футтер) с фиксированной высотой 150 пикселей
-        self.info_frame = tk.Frame(self.root, bg='darkgray', height=150)
-        self.info_frame.grid(row=1, column=0, sticky="ew")
+        self.info_frame = tk.Frame(self.root, bg='darkgray', height=FOOTER_HEIGHT)
+        self.info_frame.grid(row=2, column=0, sticky="ew")
         self.info_frame.grid_propagate(False)  # Запрещаем изменение размера фрейма
 
         # Настройка весов для содержимого info_frame
         self.info_frame.grid_rowconfigure(0, weight=1)
         self.info_frame.grid_rowconfigure(1, weight=1)
+        self.info_frame.grid_rowconfigure(2, weight=0)
         self.info_frame.grid_columnconfigure(0, weight=1)
 
         # Метка с информацией о фото
@@ -361,6 +1010,17 @@ class PhotoViewer:
         )
         self.analysis_result.grid(row=1, column=0, pady=5, sticky="nsew")
 
+        # Строка состояния конвейера (статистика пропуска повторов и т.п.)
+        self.status_label = tk.Label(
+            self.info_frame,
+            text="",
+            font=("Arial", 11),
+            bg='darkgray',
+            fg='black',
+            justify=tk.CENTER
+        )
+        self.status_label.grid(row=2, column=0, pady=2, sticky="nsew")
+
         # Кнопка "Главное меню" в правом нижнем углу
         self.menu_button = tk.Button(
             self.root,
@@ -377,6 +1037,8 @@ class PhotoViewer:
         self.menu_button.place(relx=1.0, rely=1.0, anchor='se', x=-20, y=-20)
 
         self.root.bind("<Configure>", self.on_window_resize)
+        self.root.bind("<Left>", self.show_previous_photo)
+        self.root.bind("<Right>", self.show_next_photo)
 
     def show_waiting_message(self):
         """Показывает сообщение об ожидании объектов анализа"""
@@ -392,6 +1054,7 @@ class PhotoViewer:
 
     def start_file_monitoring(self):
         """Запускает отслеживание изменений в папке"""
+        self.start_admission_pump()
         if self.WATCHDOG_AVAILABLE:
             try:
                 self.event_handler = PhotoWatcher(self, self.photos_folder)
@@ -423,9 +1086,8 @@ class PhotoViewer:
                     current_files.add(file_path)
 
         new_files = current_files - self.known_files
-        for file_path in new_files:
-            print(f"Обнаружено новое изображение: {file_path}")
-            self.add_new_photo(file_path)
+        for file_path in sorted(new_files):
+            self.admit_photo(file_path)
 
         self.known_files = current_files
 
@@ -437,6 +1099,8 @@ class PhotoViewer:
         if self.monitoring_after_id:
             self.root.after_cancel(self.monitoring_after_id)
             self.monitoring_after_id = None
+        self.stop_admission_pump()
+        self.admission.clear()
 
         if self.WATCHDOG_AVAILABLE and hasattr(self, 'observer'):
             try:
@@ -446,13 +1110,134 @@ class PhotoViewer:
             except Exception as e:
                 print(f"Ошибка при остановке watchdog: {e}")
 
-    def add_new_photo(self, photo_path):
-        """Добавляет новое фото и показывает его"""
+    def admit_photo(self, file_path):
+        """
+        Ставит обнаруженный файл в очередь на анализ (можно вызывать из любого потока)
+
+        Повторные события для ожидающего файла отбрасываются; при переполнении
+        очереди файл остается в папке и подбирается после спада нагрузки.
+        """
+        file_path = os.path.abspath(file_path)
+        if self.admission.offer(file_path):
+            print(f"Обнаружено новое изображение: {file_path}")
+
+    def start_admission_pump(self):
+        """Запускает периодическую передачу обнаруженных файлов на анализ"""
+        if self.admission_after_id is None:
+            self.admission_after_id = self.root.after(ADMISSION_PUMP_INTERVAL, self.pump_admission)
+
+    def stop_admission_pump(self):
+        if self.admission_after_id:
+            self.root.after_cancel(self.admission_after_id)
+            self.admission_after_id = None
+
+    def pump_admission(self):
+        """
+        Передает обнаруженные файлы в очередь инференса, не переполняя ее
+
+        В очереди инференса держим не больше двух батчей; остальное ждет в
+        ограниченной очереди допуска. Здесь же пересчитывается режим перегрузки.
+        """
+        self.admission_after_id = None
+        if not self.root.winfo_exists():
+            return
+
+        live_pending = self.inference_queue.pending(PRIORITY_LIVE)
+        if self.stream_source:
+            # Кадров в работе не больше max_in_flight, поэтому перегрузку видно по пропущенным кадрам
+            stream = self.stream_source.stats()
+            self.overload.update(stream['in_flight'] + stream['skipped'] - self.stream_skipped_seen)
+            self.stream_skipped_seen = stream['skipped']
+        else:
+            self.overload.update(len(self.admission) + live_pending)
+
+        capacity = 2 * self.inference_queue.batch_size - live_pending
+        ready = self.admission.take_ready(max(0, capacity))
+        for position, (photo_path, attempts) in enumerate(ready):
+            # При перегрузке превью строится только для последнего кадра
+            latest = position == len(ready) - 1 and not len(self.admission)
+            self.add_new_photo(photo_path, attempts, preview=latest or not self.overload.degraded)
+
+        if not self.overload.degraded and not len(self.admission) and self.admission.take_overflow():
+            self.rescan_folder()
+
+        if ready or self.overload.degraded:
+            self.update_status_line()
+        self.admission_after_id = self.root.after(ADMISSION_PUMP_INTERVAL, self.pump_admission)
+
+    def rescan_folder(self):
+        """Подбирает файлы, не попавшие в переполненную очередь допуска"""
+        try:
+            names = sorted(os.listdir(self.photos_folder))
+        except OSError as e:
+            print(f"Ошибка чтения папки {self.photos_folder}: {e}")
+            return
+        missed = 0
+        for name in names:
+            file_path = os.path.join(self.photos_folder, name)
+            if (self.is_image_file(file_path) and not self.is_defect_output(file_path) and
+                    file_path not in self.analyzed_photos and file_path not in self.analysis_pending and
+                    file_path not in self.backlog_pending):
+                missed += self.admission.offer(file_path)
+        print(f"Перегрузка прошла: в очередь возвращено {missed} пропущенных файлов")
+
+    def configure_overload(self, high_watermark=OVERLOAD_HIGH_WATERMARK, low_watermark=OVERLOAD_LOW_WATERMARK):
+        """Пороги перегрузки для нового режима проверки; облегченный режим прежнего выключается"""
+        if self.overload.degraded:
+            self.on_overload_change(False)
+        self.overload = OverloadController(high_watermark, low_watermark, on_change=self.on_overload_change)
+
+    def on_overload_change(self, degraded):
+        """Включает или выключает облегченный режим при перегрузке"""
+        batch_size = self.runtime_config['batch_size']
+        if degraded:
+            batch_size *= DEGRADED_BATCH_FACTOR
+            print(f"⚠️ Перегрузка: в очереди {self.overload.load} заданий, облегченный режим "
+                  f"(превью только последнего кадра, уменьшенное декодирование, батч {batch_size})")
+        else:
+            print("✅ Нагрузка спала, обычный режим")
+        self.inference_queue.set_batch_size(batch_size)
+        self.update_status_line()
+
+    def add_new_photo(self, photo_path, attempts=0, preview=True):
+        """
+        Добавляет новое фото, показывает его и ставит на анализ
+
+        Args:
+            photo_path (str): путь к фото
+            attempts (int): сколько раз файл уже оказывался недописанным
+            preview (bool): показывать фото (при перегрузке - только последнее)
+        """
         if not photo_path or not isinstance(photo_path, str):
             return
 
         photo_path = os.path.abspath(photo_path)
-        if not self.wait_for_file_ready(photo_path):
+        if not os.path.exists(photo_path):
+            # Файл уже удален или перемещен (в том числе нами) - ждать его незачем
+            return
+        if photo_path in self.analysis_pending:
+            # Повторное событие для фото, которое уже анализируется
+            return
+        if not self.is_file_ready(photo_path):
+            # Файл еще пишется - проверим позже, не блокируя интерфейс
+            if not self.admission.defer(photo_path, attempts):
+                print(f"Файл не стал доступен после {attempts + 1} попыток: {photo_path}")
+            return
+
+        if self.work_claimer is not None:
+            # Аренда берется в потоке аренд: общая папка может отвечать медленно
+            self.work_claimer.submit(self.claim_new_photo, self.work_claimer, photo_path, preview)
+            return
+        self.accept_new_photo(photo_path, preview)
+
+    def claim_new_photo(self, claimer, photo_path, preview):
+        """Берет новое фото общей папки в работу (в потоке аренд)"""
+        if self.claim_photo(claimer, photo_path):
+            self.root.after(0, lambda: self.accept_new_photo(photo_path, preview, claimer))
+
+    def accept_new_photo(self, photo_path, preview=True, claimer=None):
+        """Показывает новое фото и ставит его на анализ (фото уже принадлежит станции)"""
+        if claimer is not None and claimer is not self.work_claimer:
             return
 
         if photo_path not in self.photos:
@@ -460,96 +1245,329 @@ class PhotoViewer:
             self.photos.sort()
             print(f"Добавлено новое фото: {os.path.basename(photo_path)}")
 
-        self.show_photo(photo_path)
+        if preview:
+            self.show_photo(photo_path)
+        elif self.is_viewing_active():
+            self.perform_analysis(photo_path, show_progress=False)
 
     def show_photo(self, photo_path):
-        """Показывает указанное фото"""
+        """Показывает указанное фото и запускает его анализ"""
         if not self.root.winfo_exists():
             return
 
         self.current_photo_path = photo_path
+        self.history_position = None
+        if not self.view_history or self.view_history[-1] != photo_path:
+            self.view_history.append(photo_path)
 
         try:
-            image = Image.open(photo_path)
-            self.current_photo_data = image
-
-            screen_width = self.root.winfo_width()
-            screen_height = self.root.winfo_height()
+            self.display_photo(photo_path)
+        except Exception as e:
+            print(f"Ошибка при загрузке изображения {photo_path}: {str(e)}")
+            return
 
-            # Учитываем фиксированную высоту футтера (150 пикселей)
-            control_height = 150
-            max_width = screen_width - 20
-            max_height = screen_height - control_height - 20
+        if not self.is_viewing_active():
+            return
 
-            img_width, img_height = image.size
+        if photo_path in self.analyzed_photos:
+            result, color = self.analyzed_photos[photo_path]
+            self.show_analysis_result(result, color)
+        else:
+            self.perform_analysis(photo_path)
 
-            # Масштабируем при необходимости
-            if img_width > max_width or img_height > max_height:
-                ratio = min(max_width / img_width, max_height / img_height)
-                new_width = int(img_width * ratio)
-                new_height = int(img_height * ratio)
-                image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    def display_photo(self, photo_path, caption=None):
+        """Выводит фото в окно, масштабируя под доступное место"""
+        self.render_photo(photo_path)
 
+        if hasattr(self, 'image_label') and self.image_label.winfo_exists():
+            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            filename = os.path.basename(photo_path)
+            text = caption or f"Фото: {filename}\nВремя загрузки: {current_time}"
+            self.info_label.config(text=text)
+
+    def render_photo(self, photo_path):
+        """Берет кадр нужного размера из пирамиды и выводит его в image_label"""
+        screen_width = self.root.winfo_width()
+        screen_height = self.root.winfo_height()
+
+        # Учитываем фиксированную высоту футтера и ленты истории
+        control_height = self.controls_height()
+        max_width = max(1, screen_width - 20)
+        max_height = max(1, screen_height - control_height - 20)
+
+        if self.overload.degraded and not self.pyramid_cache.contains(photo_path):
+            # При перегрузке пирамида не строится: кадр декодируется в половинном разрешении
+            image = decode_preview(photo_path, max_width, max_height)
+        else:
+            image = self.pyramid_cache.fit(photo_path, max_width, max_height)
+        self.current_photo_data = image
+        self.set_label_image(image)
+
+    def set_label_image(self, image):
+        """Выводит изображение, по возможности переиспользуя Tk-изображение того же размера"""
+        photo = self.current_photo_reference
+        if photo is not None and (photo.width(), photo.height()) == image.size:
+            photo.paste(image)
+        else:
             photo = ImageTk.PhotoImage(image)
             self.current_photo_reference = photo
 
-            if hasattr(self, 'image_label') and self.image_label.winfo_exists():
-                self.image_label.configure(image=photo)
-                self.image_label.image = photo
+        if hasattr(self, 'image_label') and self.image_label.winfo_exists():
+            self.image_label.configure(image=photo)
+            self.image_label.image = photo
+
+    def show_previous_photo(self, event=None):
+        """Показывает предыдущий кадр из недавней истории (стрелка влево)"""
+        if len(self.view_history) < 2:
+            return
+        if self.history_position is None:
+            position = len(self.view_history) - 2
+        else:
+            position = max(0, self.history_position - 1)
+        self.show_history_position(position)
 
-                current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                filename = os.path.basename(photo_path)
-                self.info_label.config(text=f"Фото: {filename}\nВремя загрузки: {current_time}")
+    def show_next_photo(self, event=None):
+        """Показывает следующий кадр из недавней истории (стрелка вправо)"""
+        if self.history_position is None:
+            return
+        self.show_history_position(self.history_position + 1)
 
-                if photo_path in self.analyzed_photos:
-                    result, color = self.analyzed_photos[photo_path]
-                    self.show_analysis_result(result, color)
-                else:
-                    self.perform_analysis(photo_path)
+    def show_history_position(self, position):
+        """Показывает кадр недавней истории; последний кадр возвращает к живому потоку"""
+        if position >= len(self.view_history) - 1:
+            position = None
+            photo_path = self.view_history[-1]
+        else:
+            photo_path = self.view_history[position]
+
+        if not self.pyramid_cache.contains(photo_path) and not os.path.isfile(photo_path):
+            print(f"Кадр больше недоступен: {os.path.basename(photo_path)}")
+            return
+
+        self.history_position = position
+        self.current_photo_path = photo_path
+        if position is None:
+            caption = f"Фото: {os.path.basename(photo_path)}"
+        else:
+            caption = (f"Фото: {os.path.basename(photo_path)}\n"
+                       f"История: {position + 1} из {len(self.view_history)} (→ - вперед)")
+        try:
+            self.display_photo(photo_path, caption=caption)
+        except Exception as e:
+            print(f"Ошибка при загрузке изображения {photo_path}: {str(e)}")
+            return
+
+        verdict = self.recent_verdicts.get(photo_path)
+        if verdict:
+            self.show_analysis_result(*verdict)
+        elif hasattr(self, 'analysis_result') and self.analysis_result.winfo_exists():
+            self.analysis_result.config(text="", bg='darkgray')
+
+    def controls_height(self):
+        """Высота, занятая футтером и лентой истории"""
+        if hasattr(self, 'gallery') and self.gallery.winfo_exists():
+            return FOOTER_HEIGHT + self.gallery.total_height
+        return FOOTER_HEIGHT
+
+    def set_defect_history(self, photo_paths):
+        """Заполняет ленту истории дефектов (пути от старых к новым)"""
+        if hasattr(self, 'gallery') and self.gallery.winfo_exists():
+            self.gallery.set_entries(sorted(photo_paths, key=os.path.basename))
+
+    def add_defect_to_history(self, photo_path):
+        """Добавляет дефект в ленту истории (из главного потока)"""
+        if hasattr(self, 'gallery') and self.gallery.winfo_exists():
+            self.gallery.add_entry(photo_path)
+
+    def show_history_photo(self, photo_path):
+        """Показывает дефект из истории без повторного анализа"""
+        if not os.path.isfile(photo_path):
+            return
 
+        self.current_photo_path = photo_path
+        try:
+            self.display_photo(photo_path)
         except Exception as e:
             print(f"Ошибка при загрузке изображения {photo_path}: {str(e)}")
+            return
+
+        result, color = self.analyzed_photos.get(photo_path, ("дефект", 'red'))
+        self.show_analysis_result(result, color)
 
-    def perform_analysis(self, photo_path):
-        """Выполняет анализ фото в отдельном потоке"""
-        if not hasattr(self, 'analysis_result') or not self.analysis_result.winfo_exists():
+    def is_viewing_active(self):
+        """Открыт ли интерфейс проверки"""
+        return hasattr(self, 'analysis_result') and self.analysis_result.winfo_exists()
+
+    def perform_analysis(self, photo_path, show_progress=True):
+        """Ставит фото в очередь батчевого анализа"""
+        if not self.is_viewing_active():
             return
 
         if not os.path.exists(photo_path):
             return
 
-        self.analysis_result.config(text="Выполняется анализ...", fg='yellow')
-        self.root.update_idletasks()
+        if show_progress and hasattr(self, 'analysis_result'):
+            self.analysis_result.config(text="Выполняется анализ...", fg='yellow')
+            self.root.update_idletasks()
+
+        if photo_path in self.backlog_pending:
+            # Фото из бэклога появилось как новое - поднимаем приоритет вместо повторного анализа
+            self.inference_queue.promote(photo_path)
+            return
+        if photo_path in self.analysis_pending:
+            return
+        self.analysis_pending.add(photo_path)
+        self.inference_queue.submit(photo_path, priority=PRIORITY_LIVE)
+
+    def on_batch_result(self, photo_path, verdict):
+        """Передает результат из потока инференса в главный поток"""
+        result, color, model_version = verdict
+        if result == "ошибка":
+            # Без вердикта (например, упал процесс инференса) файл не удаляется и не архивируется
+            self.on_batch_error(photo_path, None)
+            return
+        if not isinstance(photo_path, str):
+            if result == "дефект":
+                # Кадр из буфера кадров копируется сразу, пока производитель его не перезаписал
+                photo_path.retain()
+            self.root.after(0, lambda: self.finish_stream_frame(photo_path, result, color, model_version))
+            return
+        self.root.after(0, lambda: self.finish_analysis(photo_path, result, color, model_version))
 
-        def analyze_in_thread():
+    def on_batch_error(self, photo_path, error):
+        """Сообщает об ошибке анализа в главном потоке"""
+        if not isinstance(photo_path, str):
+            self.root.after(0, lambda: self.fail_stream_frame(photo_path))
+            return
+        self.root.after(0, lambda: self.fail_analysis(photo_path))
+
+    def fail_analysis(self, photo_path):
+        """Обрабатывает ошибку анализа в главном потоке"""
+        self.analysis_pending.discard(photo_path)
+        self.mark_backlog_done(photo_path)
+        self.release_photo(photo_path)
+        self.update_status_line()
+        if photo_path == self.current_photo_path:
+            self.show_analysis_error()
+
+    def process_analysis_batch(self, photo_paths):
+        """
+        Анализирует батч фото, переиспользуя вердикты почти одинаковых кадров серии
+
+        Returns:
+            list: (result, color, model_version) для каждого фото
+        """
+        if not DEDUP_ENABLED:
+            return self.analyze_defects_batch(photo_paths)
+
+        verdicts = [None] * len(photo_paths)
+        hashes = [None] * len(photo_paths)
+        leaders = {}  # индекс кадра -> индекс похожего кадра этого же батча
+        to_analyze = []
+
+        for index, photo_path in enumerate(photo_paths):
             try:
-                result, color = self.analyze_defects(photo_path)
-                self.root.after(0, lambda: self.finish_analysis(photo_path, result, color))
+                hashes[index] = dhash(
+                    self.item_source(photo_path),
+                    DEDUP_HASH_SIZE,
+                    roi=self.item_roi(photo_path)
+                )
             except Exception as e:
-                print(f"Ошибка при анализе фото: {str(e)}")
-                self.root.after(0, self.show_analysis_error)
-
-        thread = threading.Thread(target=analyze_in_thread, daemon=True)
-        thread.start()
+                print(f"Ошибка вычисления хеша {photo_path}: {e}")
+                to_analyze.append(index)
+                continue
+
+            cached = self.frame_index.lookup(hashes[index])
+            if cached is not None:
+                verdicts[index] = cached
+                print(f"♻️ Повтор кадра {self.item_name(photo_path)}: {cached[0]} (инференс пропущен)")
+                continue
+
+            # Повторы внутри одного батча тоже не отправляем в модель
+            for other in to_analyze:
+                if (hashes[other] is not None and
+                        hamming_distance(hashes[index], hashes[other]) <= DEDUP_MAX_DISTANCE):
+                    leaders[index] = other
+                    break
+            else:
+                to_analyze.append(index)
+
+        if to_analyze:
+            results = self.analyze_defects_batch([photo_paths[i] for i in to_analyze])
+            for index, verdict in zip(to_analyze, results):
+                verdicts[index] = verdict
+                if hashes[index] is not None and verdict[0] != "ошибка":
+                    self.frame_index.add(hashes[index], verdict)
+
+        for index, leader in leaders.items():
+            verdicts[index] = verdicts[leader]
+            self.frame_index.count_hit()
+            print(f"♻️ Повтор кадра {self.item_name(photo_paths[index])}: "
+                  f"{verdicts[index][0]} (инференс пропущен)")
+
+        return verdicts
+
+    def update_status_line(self):
+        """Обновляет строку состояния в футтере"""
+        if not hasattr(self, 'status_label') or not self.status_label.winfo_exists():
+            return
 
-    def finish_analysis(self, photo_path, result, color):
+        stats = self.frame_index.stats()
+        parts = [f"Повторов пропущено: {stats['hits']} из {stats['lookups']} ({stats['skip_rate']:.0%})"]
+        if self.backlog_total:
+            parts.append(f"Бэклог: {self.backlog_done}/{self.backlog_total}")
+        parts.append(f"Модель: {self.model_version}")
+        if self.stream_source:
+            stream = self.stream_source.stats()
+            parts.append(f"Поток: {stream['fps']:.1f} кадр/с, пропущено {stream['skipped']}")
+        if self.work_claimer:
+            parts.append(f"Станция {self.work_claimer.node_id}: в работе {self.work_claimer.held_count()}")
+        overload = self.overload.stats()
+        admission = self.admission.stats()
+        if overload['degraded']:
+            parts.append(f"⚠️ Перегрузка: очередь {overload['load']}, батч {self.inference_queue.batch_size}, "
+                         f"превью только последнего кадра")
+        elif admission['pending']:
+            parts.append(f"Очередь: {admission['pending']}")
+        if admission['rejected']:
+            parts.append(f"Отложено при перегрузке: {admission['rejected']}")
+        pyramid = self.pyramid_cache.stats()
+        parts.append(f"Кеш кадров: {pyramid['photos']} фото, {pyramid['used_mb']:.0f}/{pyramid['budget_mb']:.0f} МБ")
+        if self.profiler.active:
+            parts.append("⏺️ Запись профиля")
+        self.status_label.config(text="   |   ".join(parts))
+
+    def finish_analysis(self, photo_path, result, color, model_version=None):
         """Завершает анализ в главном потоке"""
         try:
             if not self.root.winfo_exists():
                 return
 
+            self.analysis_pending.discard(photo_path)
             self.analyzed_photos[photo_path] = (result, color)
-            self.show_analysis_result(result, color)
+            self.result_versions[photo_path] = model_version
+            self.remember_verdict(photo_path, (result, color))
+            self.mark_backlog_done(photo_path)
+            if photo_path == self.current_photo_path:
+                self.show_analysis_result(result, color)
+            self.update_status_line()
 
             if result == "дефект":
                 self.handle_defect_photo(photo_path, result, color)
-            else:
+            elif result == "не дефект":
                 self.handle_good_photo(photo_path, result, color)
 
         except Exception as e:
             print(f"Ошибка при завершении анализа: {e}")
             self.show_analysis_error()
 
+    def remember_verdict(self, photo_path, verdict):
+        """Запоминает вердикт для просмотра недавней истории"""
+        self.recent_verdicts[photo_path] = verdict
+        self.recent_verdicts.move_to_end(photo_path)
+        while len(self.recent_verdicts) > VIEW_HISTORY_SIZE * 2:
+            self.recent_verdicts.popitem(last=False)
+
     def handle_defect_photo(self, photo_path, result, color):
         """Обрабатывает фото с дефектом"""
         try:
@@ -558,14 +1576,21 @@ class PhotoViewer:
                     self.current_photo_path == photo_path):
                 self.show_analysis_result(result, color)
 
-            def rename_thread():
-                success = self.rename_defect_file(photo_path)
-                if success:
-                    print(f"Файл с дефектом переименован: {os.path.basename(photo_path)}")
+            details = {'result': result, 'model_version': self.result_versions.get(photo_path)}
+            if self.work_claimer:
+                details['node'] = self.work_claimer.node_id
+
+            def archive_thread():
+                # В фоне только перемещение файла; состояние просмотра меняется в главном потоке
+                new_path = self.archive_defect_file(photo_path, details)
+                if new_path:
+                    print(f"Файл с дефектом перемещен в архив: {os.path.basename(photo_path)}")
+                    self.root.after(0, lambda: self.on_defect_archived(photo_path, new_path))
                 else:
-                    print(f"Ошибка при переименовании файла с дефектом: {photo_path}")
+                    print(f"Ошибка при перемещении файла с дефектом в архив: {photo_path}")
+                self.release_photo(photo_path)
 
-            thread = threading.Thread(target=rename_thread, daemon=True)
+            thread = threading.Thread(target=archive_thread, daemon=True, name="defect-archive")
             thread.start()
 
         except Exception as e:
@@ -577,6 +1602,7 @@ class PhotoViewer:
             self.show_analysis_result(result, color)
 
         success = self.delete_good_file(photo_path)
+        self.release_photo(photo_path)
 
         if success:
             print(f"Хороший файл удален: {os.path.basename(photo_path)}")
@@ -586,52 +1612,67 @@ class PhotoViewer:
         else:
             print(f"Ошибка при удалении хорошего файла: {photo_path}")
 
-    def rename_defect_file(self, file_path):
-        """Переименовывает файл с дефектом в текущей папке"""
+    def archive_defect_file(self, file_path, details):
+        """
+        Перемещает файл с дефектом в архив по датам, не засоряя отслеживаемую папку
+
+        Вызывается в фоновом потоке и трогает только файлы; состояние просмотра
+        обновляет on_defect_archived в главном потоке.
+
+        Returns:
+            str или None: путь в архиве, None - переместить не удалось
+        """
         max_attempts = 5
         delay_between_attempts = 1
 
         for attempt in range(max_attempts):
             try:
                 if not os.path.isfile(file_path):
-                    return False
-
-                file_ext = os.path.splitext(file_path)[1]
-                now = datetime.now()
-                new_name = now.strftime("%Y-%m-%d %H-%M-%S") + file_ext
-                new_path = os.path.join(os.path.dirname(file_path), new_name)
-
-                counter = 1
-                while os.path.exists(new_path):
-                    new_name = now.strftime("%Y-%m-%d %H-%M-%S") + f"_{counter}" + file_ext
-                    new_path = os.path.join(os.path.dirname(file_path), new_name)
-                    counter += 1
-
-                os.rename(file_path, new_path)
-                print(f"Файл переименован: {os.path.basename(file_path)} -> {new_name}")
-
-                if file_path in self.photos:
-                    self.photos.remove(file_path)
-                    self.photos.append(new_path)
-                    self.photos.sort()
-
-                if file_path in self.analyzed_photos:
-                    self.analyzed_photos[new_path] = self.analyzed_photos.pop(file_path)
-
-                if file_path == self.current_photo_path:
-                    self.current_photo_path = new_path
+                    return None
 
-                return True
+                # Событие наблюдателя об этом перемещении - эхо, а не новое фото
+                self.own_operations.expect_move(file_path)
+                new_path = self.defect_archive.store(file_path, **details)
+                print(f"Файл перемещен в архив: {os.path.basename(file_path)} -> "
+                      f"{os.path.relpath(new_path, self.defect_archive.root)}")
+                return new_path
 
             except PermissionError as e:
                 if attempt < max_attempts - 1:
                     time.sleep(delay_between_attempts)
                 else:
-                    return False
+                    print(f"Файл {file_path} заблокирован: {e}")
+                    return None
             except Exception as e:
-                return False
+                print(f"Ошибка перемещения {file_path} в архив: {e}")
+                return None
 
-        return False
+        return None
+
+    def on_defect_archived(self, file_path, new_path):
+        """Переносит состояние просмотра на новый путь файла в архиве (в главном потоке)"""
+        if file_path in self.photos:
+            self.photos.remove(file_path)
+
+        if file_path in self.analyzed_photos:
+            self.analyzed_photos[new_path] = self.analyzed_photos.pop(file_path)
+        if file_path in self.result_versions:
+            self.result_versions[new_path] = self.result_versions.pop(file_path)
+
+        if file_path == self.current_photo_path:
+            self.current_photo_path = new_path
+
+        # Уменьшенные копии и история просмотра следуют за файлом
+        self.pyramid_cache.rename(file_path, new_path)
+        if file_path in self.recent_verdicts:
+            self.recent_verdicts[new_path] = self.recent_verdicts.pop(file_path)
+        for index, path in enumerate(self.view_history):
+            if path == file_path:
+                self.view_history[index] = new_path
+
+        # Миниатюра для ленты истории создается в фоне
+        self.thumbnail_cache.request(new_path)
+        self.add_defect_to_history(new_path)
 
     def delete_good_file(self, file_path):
         """Удаляет хороший файл"""
@@ -651,6 +1692,7 @@ class PhotoViewer:
 
                 if file_path in self.analyzed_photos:
                     del self.analyzed_photos[file_path]
+                self.result_versions.pop(file_path, None)
 
                 return True
 
@@ -666,23 +1708,58 @@ class PhotoViewer:
 
     def analyze_defects(self, photo_path):
         """Анализирует фото на наличие дефектов с помощью нейронной сети"""
-        if self.model is None:
-            return self.analyze_defects_demo(photo_path)
+        result, color, _ = self.analyze_defects_batch([photo_path])[0]
+        return result, color
+
+    def load_model_input(self, photo_path):
+        """Загружает область интереса фото (или кадра потока) и приводит ее к входу модели"""
+        if not isinstance(photo_path, str) and photo_path.model_input is not None:
+            return photo_path.model_input
+        # Вход модели не зависит от перегрузки: по нему удаляются и архивируются файлы
+        return load_model_input(
+            self.item_source(photo_path),
+            MODEL_INPUT_SIZE,
+            roi=self.item_roi(photo_path),
+            reduced_decode=self.roi_config.reduced_decode
+        )
 
-        try:
-            if not os.path.exists(photo_path):
-                return "ошибка", 'red'
+    def analyze_defects_batch(self, photo_paths):
+        """
+        Анализирует несколько фото одним вызовом нейронной сети
+
+        Returns:
+            list: (result, color, model_version) для каждого фото
+        """
+        verdicts = [("ошибка", 'red', None)] * len(photo_paths)
+        arrays = []
+        indices = []
+        for index, photo_path in enumerate(photo_paths):
+            try:
+                if isinstance(photo_path, str) and not os.path.exists(photo_path):
+                    continue
+                arrays.append(self.load_model_input(photo_path))
+                indices.append(index)
+            except Exception as e:
+                print(f"❌ Ошибка анализа {photo_path}: {e}")
 
-            img = Image.open(photo_path)
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
+        if not arrays:
+            return verdicts
 
-            img = img.resize((224, 224))
-            img_array = np.array(img) / 255.0
-            img_array = np.expand_dims(img_array, axis=0)
+        try:
+            batch = np.stack(arrays)
+            # Слоты буфера кадров могли перезаписать во время копирования в батч
+            stale = {row for row, index in enumerate(indices)
+                     if not isinstance(photo_paths[index], str) and not photo_paths[index].is_valid()}
+            prediction, model_version = self.run_model(batch)
+        except Exception as e:
+            print(f"❌ Ошибка анализа батча из {len(arrays)} фото: {e}")
+            return verdicts
 
-            prediction = self.model.predict(img_array, verbose=0)
-            defect_prob = float(prediction[0][0])
+        for row, index in enumerate(indices):
+            if row in stale:
+                print(f"⚠️ Кадр {self.item_name(photo_paths[index])} перезаписан производителем, вердикт не выносится")
+                continue
+            defect_prob = float(prediction[row][0])
 
             if defect_prob >= 0.5:
                 result = "не дефект"
@@ -691,33 +1768,35 @@ class PhotoViewer:
                 result = "дефект"
                 color = 'red'
 
-            print(f"🔍 Анализ {os.path.basename(photo_path)}: {result} (вероятность: {defect_prob:.3f})")
-            return result, color
+            print(f"🔍 Анализ {self.item_name(photo_paths[index])}: {result} "
+                  f"(вероятность: {defect_prob:.3f}, модель {model_version})")
+            verdicts[index] = (result, color, model_version)
 
-        except Exception as e:
-            print(f"❌ Ошибка анализа {photo_path}: {e}")
-            return "ошибка", 'red'
+        return verdicts
 
-    def analyze_defects_demo(self, photo_path):
-        """Демо-режим анализа фото на дефекты"""
-        try:
-            filename = os.path.basename(photo_path)
-            file_hash = hash(filename) % 2
+    def run_model(self, batch):
+        """
+        Прогоняет батч через модель (в этом или в отдельном процессе)
 
-            if file_hash == 0:
-                result = "не дефект"
-                color = 'green'
-            else:
-                result = "дефект"
-                color = 'red'
+        Returns:
+            tuple: (предсказание, версия модели)
+        """
+        if self.inference_process is not None:
+            previous_version = self.inference_process.version
+            prediction, model_version = self.inference_process.predict(batch)
+            # Замену модели в дочернем процессе видно по версии в ответе
+            if previous_version and model_version != previous_version:
+                self.on_model_swap(model_version, previous_version)
+            return prediction, model_version
 
-            time.sleep(1)
-            print(f"🔍 Демо-анализ {filename}: {result}")
-            return result, color
+        if self.synthetic_model is not None:
+            return self.synthetic_model.predict(batch), self.synthetic_model.version
+        if self.model_manager is None:
+            raise RuntimeError("модель не загружена")
 
-        except Exception as e:
-            print(f"❌ Ошибка демо-анализа {photo_path}: {e}")
-            return "ошибка", 'red'
+        # Весь батч считается одной версией модели, даже если во время него модель заменят
+        model, model_version = self.model_manager.current()
+        return model.predict(batch, batch_size=len(batch), verbose=0), model_version
 
     def show_analysis_result(self, result, color):
         """Показывает результат анализа"""
@@ -736,35 +1815,21 @@ class PhotoViewer:
             self.root.after(100, self._redisplay_current_photo)
 
     def _redisplay_current_photo(self):
-        """Перерисовывает текущее фото"""
+        """Перерисовывает текущее фото из пирамиды под новый размер окна"""
         if not hasattr(self, 'current_photo_data') or not self.current_photo_data:
             return
 
-        try:
-            image = self.current_photo_data
-            screen_width = self.root.winfo_width()
-            screen_height = self.root.winfo_height()
-
-            # Учитываем фиксированную высоту футтера (150 пикселей)
-            control_height = 150
-            max_width = screen_width - 20
-            max_height = screen_height - control_height - 20
-
-            img_width, img_height = image.size
-
-            if img_width > max_width or img_height > max_height:
-                ratio = min(max_width / img_width, max_height / img_height)
-                new_width = int(img_width * ratio)
-                new_height = int(img_height * ratio)
-                image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-            photo = ImageTk.PhotoImage(image)
-            self.current_photo_reference = photo
-
-            if hasattr(self, 'image_label') and self.image_label.winfo_exists():
-                self.image_label.configure(image=photo)
-                self.image_label.image = photo
+        photo_path = self.current_photo_path
+        if not photo_path:
+            return
+        if not isinstance(photo_path, str):
+            self.render_stream_frame(photo_path)
+            return
+        if not self.pyramid_cache.contains(photo_path) and not os.path.isfile(photo_path):
+            return
 
+        try:
+            self.render_photo(photo_path)
         except Exception as e:
             print(f"Ошибка при перерисовке изображения: {str(e)}")
 
@@ -774,7 +1839,17 @@ class PhotoViewer:
 
         try:
             self.stop_file_monitoring()
+            self.stop_work_claiming()
+            self.stop_stream()
+            self.inference_queue.clear_backlog()
+            self.backlog_pending = set()
+            self.backlog_total = 0
             self.root.unbind("<Configure>")
+            self.root.unbind("<Left>")
+            self.root.unbind("<Right>")
+            self.view_history.clear()
+            self.history_position = None
+            self.pyramid_cache.clear()
 
             self.current_photo_path = None
             self.current_photo_data = None
@@ -812,12 +1887,33 @@ class PhotoViewer:
 
 
 def main():
+    # Сами настройки уже прочитаны в RUNTIME_CONFIG, здесь только справка и проверка параметров
+    parser = argparse.ArgumentParser(description="Проверка на дефекты")
+    parser.add_argument("--stream", help="сразу начать проверку видеопотока: номер камеры, видеофайл или URL")
+    parser.add_argument("--stream-fps", type=float, default=STREAM_SAMPLE_FPS,
+                        help="сколько кадров потока в секунду отправлять на анализ")
+    parser.add_argument("--ring", help=f"сразу начать проверку кадров из буфера (файл *{FRAME_RING_SUFFIX})")
+    add_runtime_arguments(parser)
+    args = parser.parse_args()
+
     root = tk.Tk()
     app = PhotoViewer(root)
     root.bind("<Escape>", app.toggle_fullscreen)
+    if args.stream is not None:
+        root.after(0, lambda: app.start_stream(args.stream, args.stream_fps))
+    elif args.ring:
+        root.after(0, lambda: app.start_ring(args.ring))
 
     def on_closing():
         app.stop_file_monitoring()
+        app.stop_work_claiming()
+        app.stop_stream()
+        app.inference_queue.stop()
+        app.thumbnail_cache.shutdown()
+        if app.model_manager:
+            app.model_manager.stop_watching()
+        if app.inference_process:
+            app.inference_process.stop()
         root.destroy()
 
     root.protocol("WM_DELETE_WINDOW", on_closing)
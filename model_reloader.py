@@ -0,0 +1,154 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+def keras_loader(model_path):
+    """Загрузчик модели по умолчанию"""
+    from tensorflow.keras.models import load_model
+
+    return load_model(model_path)
+
+
+def model_file_version(model_path):
+    """
+    Версия файла модели: время изменения и начало SHA-1 содержимого
+
+    Returns:
+        str: например '20251005-141233-3f9a1c2b'
+    """
+    digest = hashlib.sha1()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    mtime = datetime.fromtimestamp(os.path.getmtime(model_path))
+    return f"{mtime:%Y%m%d-%H%M%S}-{digest.hexdigest()[:8]}"
+
+
+class HotReloadModel:
+    def __init__(self, model_path, loader=keras_loader, poll_interval=2.0, on_swap=None):
+        """
+        Модель с горячей заменой при обновлении файла
+
+        Новая версия загружается и прогревается в фоне, после чего ссылка
+        на модель подменяется атомарно. Задания, уже взявшие модель через
+        current(), дорабатывают на старой версии.
+
+        Args:
+            model_path (str): путь к файлу модели .h5
+            loader (callable): функция загрузки (путь) -> модель
+            poll_interval (float): период проверки файла, сек
+            on_swap (callable): вызывается (новая версия, старая версия) после замены
+        """
+        self.model_path = model_path
+        self.loader = loader
+        self.poll_interval = poll_interval
+        self.on_swap = on_swap
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.signature = self._file_signature()
+        self.version = model_file_version(model_path)
+        self.model = self.loader(model_path)
+        self.failed_signature = None
+        print(f"✅ Модель загружена, версия {self.version}")
+
+    def current(self):
+        """
+        Снимок текущей модели
+
+        Returns:
+            tuple: (модель, версия) - используйте одну пару на весь батч
+        """
+        with self.lock:
+            return self.model, self.version
+
+    def predict(self, batch, **kwargs):
+        """
+        Предсказание текущей моделью
+
+        Returns:
+            tuple: (предсказание, версия модели)
+        """
+        model, version = self.current()
+        return model.predict(batch, **kwargs), version
+
+    def start_watching(self):
+        """Запускает фоновое отслеживание файла модели"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._watch, daemon=True, name="model-reloader")
+        self.thread.start()
+
+    def stop_watching(self):
+        """Останавливает отслеживание файла модели"""
+        self.stop_event.set()
+
+    def reload(self):
+        """
+        Загружает, прогревает и подменяет модель
+
+        Returns:
+            bool: True, если модель заменена
+        """
+        signature = self._file_signature()
+        try:
+            version = model_file_version(self.model_path)
+            started = time.perf_counter()
+            model = self.loader(self.model_path)
+            self._warm_up(model)
+        except Exception as e:
+            # Файл мог быть скопирован не до конца - повторим, когда он снова изменится
+            self.failed_signature = signature
+            print(f"❌ Ошибка загрузки новой версии модели: {e}")
+            return False
+
+        with self.lock:
+            old_version = self.version
+            self.model = model
+            self.version = version
+            self.signature = signature
+        self.failed_signature = None
+
+        print(f"🔄 Модель заменена: {old_version} -> {version} "
+              f"(загрузка и прогрев {time.perf_counter() - started:.1f} с)")
+        if self.on_swap:
+            try:
+                self.on_swap(version, old_version)
+            except Exception as e:
+                print(f"Ошибка обработки замены модели: {e}")
+        return True
+
+    def _warm_up(self, model):
+        """Первый вызов строит граф - делаем его до того, как модель увидят рабочие потоки"""
+        input_shape = [dim or 1 for dim in model.input_shape[1:]]
+        model.predict(np.zeros([1] + input_shape, dtype=np.float32), verbose=0)
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.model_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _watch(self):
+        pending = None
+        while not self.stop_event.wait(self.poll_interval):
+            signature = self._file_signature()
+            if signature is None or signature == self.signature or signature == self.failed_signature:
+                pending = None
+                continue
+
+            # Ждем, пока файл перестанет меняться (копирование завершено)
+            if signature != pending:
+                pending = signature
+                continue
+
+            pending = None
+            self.reload()
@@ -0,0 +1,183 @@
+import threading
+import time
+from collections import OrderedDict
+
+ADMISSION_CAPACITY = 256  # сколько обнаруженных файлов может ждать анализа
+ADMISSION_SETTLE_DELAY = 1.0  # секунд между обнаружением файла и первой проверкой, дописан ли он
+ADMISSION_RETRY_DELAY = 0.5  # секунд до повторной проверки недописанного файла
+ADMISSION_MAX_ATTEMPTS = 15
+
+OVERLOAD_HIGH_WATERMARK = 32  # заданий в очередях, после которых включается облегченный режим
+OVERLOAD_LOW_WATERMARK = 8  # заданий, ниже которых облегченный режим выключается
+OVERLOAD_MIN_DWELL = 3.0  # секунд, которые режим держится после переключения
+DEGRADED_BATCH_FACTOR = 2  # во сколько раз увеличивается батч в облегченном режиме
+
+
+class AdmissionQueue:
+    def __init__(self, capacity=ADMISSION_CAPACITY, settle_delay=ADMISSION_SETTLE_DELAY):
+        """
+        Ограниченная очередь обнаруженных файлов перед анализом, без повторов
+
+        Событие watchdog только кладет путь сюда (из любого потока); повторные
+        события для файла, который уже ждет (created + modified при записи),
+        не создают новых заданий. Когда очередь полна, путь отбрасывается -
+        файл остается в папке и подбирается повторным просмотром после перегрузки.
+
+        Args:
+            capacity (int): максимальное число ожидающих файлов
+            settle_delay (float): через сколько секунд после обнаружения файл можно брать
+        """
+        self.capacity = max(1, capacity)
+        self.settle_delay = settle_delay
+        self.entries = OrderedDict()  # путь -> (время готовности, попытки)
+        self.lock = threading.Lock()
+        self.admitted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.overflowed = False  # были отброшенные пути, папку нужно просмотреть заново
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def __contains__(self, item):
+        with self.lock:
+            return item in self.entries
+
+    def offer(self, item):
+        """
+        Returns:
+            bool: True, если путь принят в очередь
+        """
+        with self.lock:
+            if item in self.entries:
+                self.duplicates += 1
+                return False
+            if len(self.entries) >= self.capacity:
+                self.rejected += 1
+                self.overflowed = True
+                return False
+            self.entries[item] = (time.monotonic() + self.settle_delay, 0)
+            self.admitted += 1
+            return True
+
+    def defer(self, item, attempts, delay=ADMISSION_RETRY_DELAY):
+        """
+        Возвращает в очередь файл, который еще дописывается (место в очереди у него уже было)
+
+        Returns:
+            bool: False, если попытки исчерпаны
+        """
+        if attempts + 1 >= ADMISSION_MAX_ATTEMPTS:
+            return False
+        with self.lock:
+            self.entries[item] = (time.monotonic() + delay, attempts + 1)
+            return True
+
+    def take_ready(self, limit):
+        """
+        Забирает до limit файлов, время ожидания которых вышло, в порядке обнаружения
+
+        Returns:
+            list: [(путь, попытки), ...]
+        """
+        ready = []
+        now = time.monotonic()
+        with self.lock:
+            for item, (ready_at, attempts) in list(self.entries.items()):
+                if len(ready) >= limit:
+                    break
+                if ready_at <= now:
+                    del self.entries[item]
+                    ready.append((item, attempts))
+        return ready
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.overflowed = False
+
+    def take_overflow(self):
+        """Сбрасывает признак переполнения; True - папку пора просмотреть заново"""
+        with self.lock:
+            overflowed = self.overflowed
+            self.overflowed = False
+            return overflowed
+
+    def stats(self):
+        with self.lock:
+            return {
+                'pending': len(self.entries),
+                'admitted': self.admitted,
+                'duplicates': self.duplicates,
+                'rejected': self.rejected,
+            }
+
+
+class OverloadController:
+    def __init__(self, high_watermark=OVERLOAD_HIGH_WATERMARK, low_watermark=OVERLOAD_LOW_WATERMARK,
+                 min_dwell=OVERLOAD_MIN_DWELL, on_change=None):
+        """
+        Переключение облегченного режима по длине очередей с гистерезисом
+
+        Режим включается, когда заданий не меньше high_watermark, и выключается,
+        когда их не больше low_watermark; между переключениями проходит не меньше
+        min_dwell секунд, чтобы режим не мигал на границе.
+
+        Args:
+            high_watermark (int): порог включения
+            low_watermark (int): порог выключения
+            min_dwell (float): минимальное время в режиме, сек
+            on_change (callable): вызывается (degraded) при переключении
+        """
+        if low_watermark >= high_watermark:
+            raise ValueError(f"Порог выключения {low_watermark} должен быть меньше порога включения {high_watermark}")
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.min_dwell = min_dwell
+        self.on_change = on_change
+        self.degraded = False
+        self.changed_at = time.monotonic() - min_dwell
+        self.load = 0
+        self.peak_load = 0
+        self.episodes = 0
+        self.degraded_seconds = 0.0
+
+    def update(self, load):
+        """
+        Учитывает текущую нагрузку (число ожидающих заданий)
+
+        Returns:
+            bool: включен ли облегченный режим
+        """
+        now = time.monotonic()
+        self.load = load
+        self.peak_load = max(self.peak_load, load)
+        if now - self.changed_at < self.min_dwell:
+            return self.degraded
+
+        if not self.degraded and load >= self.high_watermark:
+            self.degraded = True
+            self.episodes += 1
+        elif self.degraded and load <= self.low_watermark:
+            self.degraded = False
+            self.degraded_seconds += now - self.changed_at
+        else:
+            return self.degraded
+
+        self.changed_at = now
+        if self.on_change:
+            self.on_change(self.degraded)
+        return self.degraded
+
+    def stats(self):
+        degraded_seconds = self.degraded_seconds
+        if self.degraded:
+            degraded_seconds += time.monotonic() - self.changed_at
+        return {
+            'degraded': self.degraded,
+            'load': self.load,
+            'peak_load': self.peak_load,
+            'episodes': self.episodes,
+            'degraded_seconds': degraded_seconds,
+        }
@@ -0,0 +1,179 @@
+import argparse
+import fnmatch
+import json
+import math
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+ROI_CONFIG_FILE = "roi_config.json"
+MODEL_INPUT_SIZE = (224, 224)  # ширина, высота
+
+
+class RoiConfig:
+    def __init__(self, cameras=None, default_roi=None, reduced_decode=False):
+        """
+        Области интереса (ROI) кадров по камерам
+
+        ROI задается долями кадра [left, top, right, bottom] от 0 до 1, поэтому
+        не зависит от разрешения и от масштаба уменьшенного декодирования.
+
+        Args:
+            cameras (list): [{'name': ..., 'pattern': 'DSC_*', 'roi': [l, t, r, b]}, ...]
+            default_roi (list): ROI для файлов, не подошедших ни под одну камеру (None - весь кадр)
+            reduced_decode (bool): декодировать JPEG сразу в уменьшенном масштабе
+                (выключено по умолчанию: меняет входы модели, включается в roi_config.json)
+        """
+        self.cameras = cameras or []
+        self.default_roi = default_roi
+        self.reduced_decode = reduced_decode
+
+    @classmethod
+    def load(cls, path=ROI_CONFIG_FILE):
+        """Читает настройки ROI из JSON-файла (если файла нет - весь кадр)"""
+        if not path or not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            config = cls(
+                cameras=data.get('cameras', []),
+                default_roi=data.get('default_roi'),
+                reduced_decode=data.get('reduced_decode', False)
+            )
+            for camera in config.cameras:
+                validate_roi(camera['roi'])
+            if config.default_roi:
+                validate_roi(config.default_roi)
+            print(f"ROI загружены: камер {len(config.cameras)}")
+            return config
+        except Exception as e:
+            print(f"Ошибка чтения настроек ROI {path}: {e}")
+            return cls()
+
+    def roi_for(self, source_name):
+        """
+        ROI для файла: первая камера, шаблон которой подходит к имени или пути
+
+        Returns:
+            list или None (весь кадр)
+        """
+        if source_name:
+            name = os.path.basename(source_name)
+            for camera in self.cameras:
+                pattern = camera.get('pattern', '*')
+                if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(source_name, pattern):
+                    return camera['roi']
+        return self.default_roi
+
+
+def validate_roi(roi):
+    left, top, right, bottom = roi
+    if not (0 <= left < right <= 1 and 0 <= top < bottom <= 1):
+        raise ValueError(f"Некорректная ROI {roi}: нужны доли 0 <= left < right <= 1, 0 <= top < bottom <= 1")
+
+
+def open_for_model(source, size=MODEL_INPUT_SIZE, roi=None, reduced_decode=False):
+    """
+    Открывает изображение, по возможности декодируя JPEG в уменьшенном масштабе
+
+    Масштаб выбирается так, чтобы после вырезания ROI оставалось не меньше size пикселей.
+
+    Returns:
+        PIL.Image.Image: декодированное изображение (еще не обрезанное)
+    """
+    if isinstance(source, Image.Image):
+        # Кадр уже в памяти (например, из видеопотока)
+        return source
+    img = Image.open(source)
+    if reduced_decode:
+        width_fraction = (roi[2] - roi[0]) if roi else 1.0
+        height_fraction = (roi[3] - roi[1]) if roi else 1.0
+        img.draft('RGB', (math.ceil(size[0] / width_fraction), math.ceil(size[1] / height_fraction)))
+    return img
+
+
+def load_model_input(source, size=MODEL_INPUT_SIZE, roi=None, reduced_decode=False,
+                     resample=Image.Resampling.BICUBIC):
+    """
+    Общая предобработка для модели: ROI, уменьшение, нормализация в [0, 1]
+
+    Args:
+        source (str | file | PIL.Image.Image): путь к изображению, файловый объект или кадр в памяти
+        size (tuple): размер входа модели (ширина, высота)
+        roi (list): [left, top, right, bottom] долями кадра (None - весь кадр)
+        reduced_decode (bool): декодировать JPEG в уменьшенном масштабе
+        resample: фильтр масштабирования
+
+    Returns:
+        numpy array: float32, (высота, ширина, 3)
+    """
+    img = open_for_model(source, size, roi, reduced_decode)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    box = None
+    if roi:
+        width, height = img.size
+        box = (roi[0] * width, roi[1] * height, roi[2] * width, roi[3] * height)
+
+    # Обрезка и масштабирование за один проход
+    img = img.resize(size, resample, box=box)
+    return np.asarray(img, dtype=np.float32) / 255.0
+
+
+def benchmark(image_paths, roi, size=MODEL_INPUT_SIZE, repeat=3):
+    """Сравнивает полное декодирование кадра с ROI и уменьшенным декодированием"""
+    def full_frame(path):
+        img = Image.open(path)
+        img = img.convert('RGB').resize(size)
+        return np.asarray(img, dtype=np.float32) / 255.0
+
+    variants = [
+        ("весь кадр, полное декодирование", full_frame),
+        ("ROI, полное декодирование", lambda path: load_model_input(path, size, roi, reduced_decode=False)),
+        ("ROI, уменьшенное декодирование", lambda path: load_model_input(path, size, roi, reduced_decode=True)),
+    ]
+
+    baseline = None
+    for title, func in variants:
+        timings = []
+        for _ in range(repeat):
+            for path in image_paths:
+                started = time.perf_counter()
+                func(path)
+                timings.append(time.perf_counter() - started)
+        mean_ms = sum(timings) / len(timings) * 1000
+        baseline = baseline or mean_ms
+        print(f"{title:35s}: {mean_ms:7.1f} мс/кадр (x{baseline / mean_ms:.1f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер времени декодирования с ROI")
+    parser.add_argument("folder", nargs="?", default="def", help="папка с изображениями")
+    parser.add_argument("--roi", help="ROI долями кадра: left,top,right,bottom (по умолчанию - из roi_config.json)")
+    parser.add_argument("--config", default=ROI_CONFIG_FILE)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    image_paths = sorted(
+        os.path.join(args.folder, name) for name in os.listdir(args.folder)
+        if name.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'))
+    )
+    if not image_paths:
+        parser.error(f"В папке {args.folder} нет изображений")
+
+    if args.roi:
+        roi = [float(value) for value in args.roi.split(",")]
+        validate_roi(roi)
+    else:
+        roi = RoiConfig.load(args.config).roi_for(image_paths[0]) or [0.25, 0.25, 0.75, 0.75]
+
+    print(f"Изображений: {len(image_paths)}, ROI: {roi}")
+    benchmark(image_paths, roi, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
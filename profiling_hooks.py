@@ -0,0 +1,256 @@
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+# Запрос и профили - рядом со скриптом, независимо от текущей папки процесса
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILES_DIR = os.path.join(SCRIPT_DIR, "profiles")
+PROFILE_CONTROL_FILE = os.path.join(SCRIPT_DIR, "profile.request")  # появление файла запускает запись профиля
+PROFILE_DURATION = 10.0  # секунд
+SAMPLE_INTERVAL = 0.005  # секунд между снимками стеков всех потоков
+TRACEMALLOC_FRAMES = 25
+
+
+class SamplingProfiler:
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        """
+        Профилировщик по выборкам: периодически снимает стеки всех потоков
+
+        В отличие от cProfile видит любые потоки (инференс, миниатюры, наблюдение
+        за папкой) и почти не замедляет их.
+        """
+        self.interval = interval
+        self.stacks = Counter()  # (имя потока, стек) -> число выборок
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="profiler-sampler")
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.reverse()
+                self.stacks[(names.get(ident, str(ident)), tuple(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Стеки в формате collapsed (flamegraph.pl, speedscope)"""
+        lines = []
+        for (thread_name, stack), count in self.stacks.most_common():
+            lines.append(";".join((thread_name,) + stack) + f" {count}")
+        return "\n".join(lines) + "\n"
+
+    def report(self, top=25):
+        """Текстовый отчет: доля времени по потокам и самые частые функции на вершине стека"""
+        per_thread = Counter()
+        leaf = Counter()
+        for (thread_name, stack), count in self.stacks.items():
+            per_thread[thread_name] += count
+            if stack:
+                leaf[(thread_name, stack[-1])] += count
+
+        out = io.StringIO()
+        out.write(f"Выборок: {self.samples}, интервал {self.interval * 1000:.1f} мс\n\n")
+        out.write("Выборок по потокам:\n")
+        for thread_name, count in per_thread.most_common():
+            out.write(f"  {count:7d}  {thread_name}\n")
+        out.write(f"\nСамые частые функции (топ {top}):\n")
+        for (thread_name, function), count in leaf.most_common(top):
+            out.write(f"  {count:7d}  [{thread_name}] {function}\n")
+        return out.getvalue()
+
+
+class ProfileCapture:
+    def __init__(self, schedule, output_dir=PROFILES_DIR, duration=PROFILE_DURATION):
+        """
+        Запись профиля работающей программы без остановки проверки
+
+        За время записи собираются: cProfile потока интерфейса, выборки стеков
+        всех потоков и снимки tracemalloc в начале и в конце. Снимки памяти
+        и файлы делаются в фоновых потоках, файлы пишутся в output_dir
+        с отметкой времени в имени.
+
+        Args:
+            schedule (callable): root.after - запуск функций в потоке интерфейса
+            output_dir (str): папка для профилей
+            duration (float): длительность записи по умолчанию, сек
+        """
+        self.schedule = schedule
+        self.output_dir = output_dir
+        self.duration = duration
+        self.active = False
+        self.profile = None
+        self.sampler = None
+        self.memory_start = None
+        self.memory_thread = None
+        self.started_tracemalloc = False
+        self.label = None
+
+    def start(self, reason="manual", duration=None):
+        """
+        Начинает запись (вызывать из потока интерфейса)
+
+        Returns:
+            bool: False, если запись уже идет
+        """
+        if self.active:
+            print("Профиль уже записывается")
+            return False
+
+        self.active = True
+        duration = duration or self.duration
+        self.label = f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{reason}"
+
+        # Снимок памяти может занимать секунды - делается не в потоке интерфейса
+        self.memory_start = None
+        self.memory_thread = threading.Thread(target=self._snapshot_start, daemon=True, name="profiler-memory")
+        self.memory_thread.start()
+
+        self.sampler = SamplingProfiler()
+        self.sampler.start()
+
+        self.profile = cProfile.Profile()
+        try:
+            self.profile.enable()
+        except ValueError as e:
+            # Уже работает другой профилировщик - остаются выборки и память
+            print(f"cProfile недоступен: {e}")
+            self.profile = None
+
+        print(f"⏺️ Запись профиля {self.label} на {duration:.0f} сек")
+        self.schedule(int(duration * 1000), self._finish)
+        return True
+
+    def _snapshot_start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.started_tracemalloc = True
+        self.memory_start = tracemalloc.take_snapshot()
+
+    def _snapshot_end(self, memory_thread):
+        """Снимок памяти на конец записи (в потоке записи файлов)"""
+        memory_thread.join()
+        memory_start = self.memory_start
+        memory_end = tracemalloc.take_snapshot()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+        self.memory_start = None
+        return memory_start, memory_end
+
+    def _finish(self):
+        """Останавливает запись в потоке интерфейса; снимок памяти и файлы - в фоновом потоке"""
+        if self.profile:
+            self.profile.disable()
+        self.sampler.stop()
+
+        threading.Thread(
+            target=self._write,
+            args=(self.label, self.profile, self.sampler, self.memory_thread),
+            daemon=True,
+            name="profiler-writer"
+        ).start()
+        self.profile = None
+        self.sampler = None
+        self.memory_thread = None
+
+    def _write(self, label, profile, sampler, memory_thread):
+        try:
+            memory_start, memory_end = self._snapshot_end(memory_thread)
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, label)
+
+            if profile:
+                profile.dump_stats(base + ".pstats")
+
+            with open(base + "-samples.txt", "w", encoding="utf-8") as f:
+                f.write(sampler.report())
+            with open(base + "-collapsed.txt", "w", encoding="utf-8") as f:
+                f.write(sampler.collapsed())
+
+            memory_end.dump(base + ".tracemalloc")
+            with open(base + "-memory.txt", "w", encoding="utf-8") as f:
+                f.write("Рост памяти за время записи:\n")
+                for stat in memory_end.compare_to(memory_start, 'lineno')[:30]:
+                    f.write(f"  {stat}\n")
+                f.write("\nКрупнейшие выделения на конец записи:\n")
+                for stat in memory_end.statistics('lineno')[:30]:
+                    f.write(f"  {stat}\n")
+
+            print(f"✅ Профиль записан: {base}.*")
+        except Exception as e:
+            print(f"❌ Ошибка записи профиля {label}: {e}")
+        finally:
+            self.active = False
+
+
+def check_control_file(path=PROFILE_CONTROL_FILE):
+    """
+    Проверяет файл-запрос профиля и удаляет его
+
+    Returns:
+        float или None: запрошенная длительность (0 - по умолчанию), None - запроса нет
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read().strip()
+        os.remove(path)
+    except OSError:
+        return None
+    try:
+        return float(text) if text else 0.0
+    except ValueError:
+        return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Профилирование работающей проверки")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    request_parser = subparsers.add_parser("request", help="запросить запись профиля через файл-запрос")
+    request_parser.add_argument("--duration", type=float, default=0.0, help="длительность, сек")
+    request_parser.add_argument("--control-file", default=PROFILE_CONTROL_FILE)
+
+    show_parser = subparsers.add_parser("show", help="вывести самые затратные функции из .pstats")
+    show_parser.add_argument("path")
+    show_parser.add_argument("--sort", default="cumulative")
+    show_parser.add_argument("--top", type=int, default=30)
+
+    args = parser.parse_args()
+    if args.command == "request":
+        with open(args.control_file, "w", encoding="utf-8") as f:
+            f.write(str(args.duration) if args.duration else "")
+        print(f"Запрос записан в {args.control_file}; профиль появится в папке {PROFILES_DIR}")
+    else:
+        pstats.Stats(args.path).sort_stats(args.sort).print_stats(args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import argparse
+import itertools
+import os
+import shutil
+import threading
+import time
+import uuid
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif')
+
+
+def list_source_images(source_dir):
+    """Список изображений исходного набора"""
+    return sorted(
+        os.path.join(source_dir, name) for name in os.listdir(source_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(os.path.join(source_dir, name))
+    )
+
+
+def write_atomic(source_path, target_path):
+    """Копирует во временный файл без расширения изображения и атомарно переименовывает"""
+    temp_path = target_path + ".part"
+    shutil.copyfile(source_path, temp_path)
+    os.replace(temp_path, target_path)
+
+
+def write_chunked(source_path, target_path, chunk_size, chunk_delay):
+    """Пишет файл медленно, частями - как камера по сети"""
+    with open(source_path, "rb") as src, open(target_path, "wb") as dst:
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            dst.write(chunk)
+            dst.flush()
+            time.sleep(chunk_delay)
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class ReplayLoadGenerator:
+    def __init__(self, source_images, target_folder, rate=2.0, count=None, pattern="steady",
+                 burst_size=5, burst_interval=5.0, write_mode="atomic",
+                 chunk_size=64 * 1024, chunk_delay=0.05):
+        """
+        Генератор нагрузки: подкладывает изображения в отслеживаемую папку
+
+        Args:
+            source_images (list): пути к исходным изображениям (используются по кругу)
+            target_folder (str): отслеживаемая папка
+            rate (float): файлов в секунду в режиме steady
+            count (int): сколько файлов записать (по умолчанию - весь исходный набор)
+            pattern (str): steady - равномерно, burst - сериями
+            burst_size (int): файлов в серии
+            burst_interval (float): пауза между началами серий, сек
+            write_mode (str): atomic - запись с переименованием, chunked - медленная запись частями
+            chunk_size (int): размер части для chunked, байт
+            chunk_delay (float): пауза между частями для chunked, сек
+        """
+        self.source_images = source_images
+        self.target_folder = os.path.abspath(target_folder)
+        self.rate = rate
+        self.count = count or len(source_images)
+        self.pattern = pattern
+        self.burst_size = burst_size
+        self.burst_interval = burst_interval
+        self.write_mode = write_mode
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.run_id = uuid.uuid4().hex[:6]
+        self.lock = threading.Lock()
+        self.dropped = {}  # путь -> время окончания записи
+
+    def schedule(self):
+        """Моменты начала записи каждого файла относительно старта, сек"""
+        if self.pattern == "burst":
+            return [(i // self.burst_size) * self.burst_interval for i in range(self.count)]
+        return [i / self.rate for i in range(self.count)]
+
+    def write_one(self, index, source_path):
+        ext = os.path.splitext(source_path)[1]
+        target_path = os.path.join(self.target_folder, f"replay_{self.run_id}_{index:06d}{ext}")
+
+        if self.write_mode == "chunked":
+            write_chunked(source_path, target_path, self.chunk_size, self.chunk_delay)
+        else:
+            write_atomic(source_path, target_path)
+
+        with self.lock:
+            self.dropped[target_path] = time.monotonic()
+
+    def run(self):
+        """Записывает файлы по расписанию; медленные записи идут параллельно"""
+        os.makedirs(self.target_folder, exist_ok=True)
+        started = time.monotonic()
+        writers = []
+        sources = itertools.cycle(self.source_images)
+
+        for index, offset in enumerate(self.schedule()):
+            delay = started + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            source_path = next(sources)
+            if self.write_mode == "chunked":
+                writer = threading.Thread(target=self.write_one, args=(index, source_path), daemon=True)
+                writer.start()
+                writers.append(writer)
+            else:
+                self.write_one(index, source_path)
+
+        for writer in writers:
+            writer.join()
+        return time.monotonic() - started
+
+
+class DecisionTracker:
+    def __init__(self, generator):
+        """Собирает моменты вердиктов по записанным генератором файлам"""
+        self.generator = generator
+        self.lock = threading.Lock()
+        self.decisions = {}  # путь -> список (время, результат)
+
+    def record(self, photo_path, result):
+        with self.lock:
+            self.decisions.setdefault(os.path.abspath(photo_path), []).append((time.monotonic(), result))
+
+    def poll_folder(self, stop_event, interval=0.02):
+        """
+        Внешний режим: вердикт фиксируется, когда файл пропадает под своим именем
+
+        PhotoViewer удаляет хорошие файлы и перемещает дефектные в архив, поэтому
+        исчезновение исходного имени и есть момент принятия решения.
+        """
+        while not stop_event.is_set():
+            with self.generator.lock:
+                dropped = list(self.generator.dropped)
+            for path in dropped:
+                if path not in self.decisions and not os.path.exists(path):
+                    self.record(path, "removed")
+            time.sleep(interval)
+
+    def all_decided(self):
+        with self.generator.lock:
+            dropped = list(self.generator.dropped)
+        with self.lock:
+            return (len(dropped) == self.generator.count and
+                    all(path in self.decisions for path in dropped))
+
+    def report(self, duration, headless):
+        with self.generator.lock:
+            dropped = dict(self.generator.dropped)
+        with self.lock:
+            decisions = {path: list(items) for path, items in self.decisions.items()}
+
+        latencies = []
+        missed = []
+        duplicated = []
+        outcome_counts = {}
+        for path, dropped_at in dropped.items():
+            items = decisions.get(path)
+            if not items:
+                missed.append(path)
+                continue
+            if len(items) > 1:
+                duplicated.append(path)
+            decided_at, result = items[0]
+            latencies.append(max(0.0, decided_at - dropped_at))
+            outcome_counts[result] = outcome_counts.get(result, 0) + 1
+
+        decided_times = [items[0][0] for items in decisions.values() if items]
+        span = (max(decided_times) - min(dropped.values())) if decided_times and dropped else 0.0
+
+        print("\n===== Результаты прогона =====")
+        print(f"Записано файлов: {len(dropped)} за {duration:.1f} с "
+              f"({len(dropped) / duration if duration else 0:.2f} файл/с)")
+        print(f"Вердиктов: {len(latencies)}; устойчивая пропускная способность: "
+              f"{len(latencies) / span if span else 0:.2f} файл/с")
+        for result, count in sorted(outcome_counts.items()):
+            print(f"  {result}: {count}")
+        print("Задержка от записи до вердикта, мс: "
+              f"p50={percentile(latencies, 0.5) * 1000:.0f} "
+              f"p90={percentile(latencies, 0.9) * 1000:.0f} "
+              f"p99={percentile(latencies, 0.99) * 1000:.0f} "
+              f"max={max(latencies, default=float('nan')) * 1000:.0f}")
+        print(f"Пропущено файлов: {len(missed)}")
+        for path in missed[:10]:
+            print(f"  {os.path.basename(path)}")
+        if headless:
+            print(f"Повторно обработано файлов: {len(duplicated)}")
+            for path in duplicated[:10]:
+                print(f"  {os.path.basename(path)}: {len(decisions[path])} раз")
+        else:
+            print("Повторная обработка во внешнем режиме не отслеживается (используйте --headless)")
+
+        return {
+            'written': len(dropped),
+            'decided': len(latencies),
+            'missed': len(missed),
+            'duplicated': len(duplicated),
+            'latencies': latencies,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный прогон: запись изображений в отслеживаемую папку и замер вердиктов"
+    )
+    parser.add_argument("target", help="отслеживаемая папка (та же, что выбрана в PhotoViewer)")
+    parser.add_argument("--source", default="def", help="папка с исходными изображениями")
+    parser.add_argument("--count", type=int, help="сколько файлов записать (по умолчанию - весь набор)")
+    parser.add_argument("--rate", type=float, default=2.0, help="файлов в секунду (steady)")
+    parser.add_argument("--pattern", choices=("steady", "burst"), default="steady")
+    parser.add_argument("--burst-size", type=int, default=5)
+    parser.add_argument("--burst-interval", type=float, default=5.0)
+    parser.add_argument("--write", choices=("atomic", "chunked"), default="atomic",
+                        help="atomic - запись с переименованием, chunked - медленная запись частями")
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024)
+    parser.add_argument("--chunk-delay", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="сколько ждать вердиктов после окончания записи, сек")
+    parser.add_argument("--headless", action="store_true",
+                        help="запустить логику PhotoViewer в этом же процессе без окна")
+    args = parser.parse_args()
+
+    source_images = list_source_images(args.source)
+    if not source_images:
+        parser.error(f"В папке {args.source} нет изображений")
+
+    generator = ReplayLoadGenerator(
+        source_images, args.target, rate=args.rate, count=args.count, pattern=args.pattern,
+        burst_size=args.burst_size, burst_interval=args.burst_interval, write_mode=args.write,
+        chunk_size=args.chunk_size, chunk_delay=args.chunk_delay
+    )
+    tracker = DecisionTracker(generator)
+    stop_event = threading.Event()
+
+    viewer = None
+    if args.headless:
+        from headless import run_headless
+
+        os.makedirs(generator.target_folder, exist_ok=True)
+        viewer = run_headless(generator.target_folder, on_decision=tracker.record)
+        # Даем наблюдателю запуститься до первой записи
+        time.sleep(1.0)
+    else:
+        threading.Thread(target=tracker.poll_folder, args=(stop_event,), daemon=True).start()
+
+    print(f"Прогон {generator.run_id}: {generator.count} файлов -> {generator.target_folder} "
+          f"({args.pattern}, {args.write})")
+    duration = generator.run()
+
+    deadline = time.monotonic() + args.timeout
+    while time.monotonic() < deadline and not tracker.all_decided():
+        time.sleep(0.1)
+    # Короткая пауза, чтобы успеть увидеть повторные вердикты
+    time.sleep(2.0)
+
+    stop_event.set()
+    if viewer:
+        viewer.stop()
+
+    tracker.report(duration, headless=args.headless)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# Файл с ручными настройками и файл с профилем, найденным автотюнером
+RUNTIME_CONFIG_FILE = "runtime_config.json"
+RUNTIME_PROFILE_FILE = "runtime_profile.json"
+ENV_PREFIX = "LD_"
+
+DEFAULT_RUNTIME_CONFIG = {
+    'intra_op_threads': 0,  # 0 - значение по умолчанию TensorFlow
+    'inter_op_threads': 0,
+    'onednn': None,  # None - не менять, True/False - TF_ENABLE_ONEDNN_OPTS
+    'xla_jit': False,
+    'mixed_precision': False,
+    'batch_size': 1,
+    'batch_timeout': 0.05,  # сек ожидания добора батча
+    'inference_process': False,  # инференс в отдельном процессе (PhotoViewer)
+    'backend': 'keras',  # keras - нейросеть; synthetic - синтетическая модель только для нагрузочных прогонов
+    'synthetic_defect_rate': 0.1,
+    'synthetic_latency_ms': 20.0,  # постоянная часть задержки вызова синтетической модели
+    'synthetic_per_item_ms': 5.0,  # добавка за каждый кадр батча
+    'synthetic_jitter': 0.2,  # сигма логнормального разброса задержки
+    'synthetic_seed': 0,
+}
+
+BACKENDS = ('keras', 'synthetic')
+
+_tensorflow_configured = False
+
+
+def _parse_bool(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes', 'on', 'да'):
+        return True
+    if text in ('0', 'false', 'no', 'off', 'нет'):
+        return False
+    if text in ('', 'none', 'default', 'auto'):
+        return None
+    raise ValueError(f"Не удалось разобрать логическое значение: {value}")
+
+
+def _coerce(key, value):
+    """Приводит значение настройки к типу значения по умолчанию"""
+    if key in ('onednn', 'xla_jit', 'mixed_precision', 'inference_process'):
+        return _parse_bool(value)
+    if key == 'backend':
+        backend = str(value).strip().lower()
+        if backend not in BACKENDS:
+            raise ValueError(f"ожидается одно из {', '.join(BACKENDS)}")
+        return backend
+    if key == 'synthetic_defect_rate':
+        rate = float(value)
+        if not 0 <= rate <= 1:
+            raise ValueError("доля дефектов должна быть от 0 до 1")
+        return rate
+    if key in ('synthetic_latency_ms', 'synthetic_per_item_ms', 'synthetic_jitter'):
+        number = float(value)
+        if number < 0:
+            raise ValueError("значение не может быть отрицательным")
+        return number
+    if key == 'batch_timeout':
+        return float(value)
+    return int(value)
+
+
+def _read_json(path):
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data.get('settings', data)
+    except Exception as e:
+        print(f"Ошибка чтения настроек {path}: {e}")
+        return {}
+
+
+def add_runtime_arguments(parser):
+    """Добавляет параметры среды выполнения в argparse-парсер"""
+    group = parser.add_argument_group("Среда выполнения TensorFlow")
+    group.add_argument("--runtime-config", default=RUNTIME_CONFIG_FILE,
+                       help="JSON-файл с настройками среды выполнения")
+    group.add_argument("--runtime-profile", default=RUNTIME_PROFILE_FILE,
+                       help="JSON-файл с профилем автотюнера")
+    group.add_argument("--intra-op-threads", type=int, help="потоков внутри операции (0 - по умолчанию)")
+    group.add_argument("--inter-op-threads", type=int, help="потоков между операциями (0 - по умолчанию)")
+    group.add_argument("--onednn", help="включить oneDNN (on/off/default)")
+    group.add_argument("--xla-jit", help="включить XLA JIT (on/off)")
+    group.add_argument("--mixed-precision", help="включить mixed_float16 (on/off)")
+    group.add_argument("--batch-size", type=int, help="размер батча инференса")
+    group.add_argument("--batch-timeout", type=float, help="ожидание добора батча, сек")
+    group.add_argument("--inference-process", help="инференс в отдельном процессе (on/off)")
+    group.add_argument("--backend", help="модель: keras или synthetic (без нейросети, только для нагрузочных прогонов)")
+    group.add_argument("--synthetic-defect-rate", type=float, help="доля дефектов синтетической модели")
+    group.add_argument("--synthetic-latency-ms", type=float, help="задержка вызова синтетической модели, мс")
+    group.add_argument("--synthetic-per-item-ms", type=float, help="добавка к задержке за кадр батча, мс")
+    group.add_argument("--synthetic-jitter", type=float, help="разброс задержки (сигма логнормального)")
+    group.add_argument("--synthetic-seed", type=int, help="зерно вердиктов и задержек синтетической модели")
+    return parser
+
+
+def load_runtime_config(argv=None, config_path=None, profile_path=None):
+    """
+    Собирает настройки среды выполнения
+
+    Приоритет (по возрастанию): значения по умолчанию, профиль автотюнера,
+    файл настроек, переменные окружения LD_*, параметры командной строки.
+
+    Args:
+        argv (list): параметры командной строки (None - не разбирать)
+        config_path (str): путь к файлу настроек
+        profile_path (str): путь к профилю автотюнера
+
+    Returns:
+        dict: настройки
+    """
+    args = None
+    if argv is not None:
+        parser = add_runtime_arguments(argparse.ArgumentParser(add_help=False))
+        args, _ = parser.parse_known_args(argv)
+        if config_path is None:
+            config_path = args.runtime_config
+        if profile_path is None:
+            profile_path = args.runtime_profile
+
+    # Пустая строка вместо пути отключает соответствующий файл
+    config = dict(DEFAULT_RUNTIME_CONFIG)
+    sources = [
+        _read_json(RUNTIME_PROFILE_FILE if profile_path is None else profile_path),
+        _read_json(RUNTIME_CONFIG_FILE if config_path is None else config_path),
+        {key: os.environ[ENV_PREFIX + key.upper()]
+         for key in DEFAULT_RUNTIME_CONFIG if ENV_PREFIX + key.upper() in os.environ},
+    ]
+    if args is not None:
+        sources.append({key: getattr(args, key) for key in DEFAULT_RUNTIME_CONFIG
+                        if getattr(args, key, None) is not None})
+
+    for source in sources:
+        for key, value in source.items():
+            if key not in DEFAULT_RUNTIME_CONFIG:
+                continue
+            try:
+                config[key] = _coerce(key, value)
+            except (TypeError, ValueError) as e:
+                print(f"Некорректное значение {key}={value!r}: {e}")
+
+    config['batch_size'] = max(1, config['batch_size'])
+    return config
+
+
+def export_environment(config):
+    """
+    Передает готовые настройки дочерним процессам через переменные LD_*
+
+    Дочерний процесс (spawn) собирает настройки заново при импорте, а переменные
+    окружения важнее файлов, поэтому он получает те же значения, что и родитель.
+    """
+    for key in DEFAULT_RUNTIME_CONFIG:
+        value = config.get(key)
+        if value is None:
+            value = 'default'
+        elif isinstance(value, bool):
+            value = '1' if value else '0'
+        os.environ[ENV_PREFIX + key.upper()] = str(value)
+
+
+def apply_environment(config):
+    """
+    Применяет настройки, которые TensorFlow читает из окружения
+
+    Должна вызываться до импорта tensorflow.
+    """
+    if config.get('onednn') is not None:
+        os.environ['TF_ENABLE_ONEDNN_OPTS'] = '1' if config['onednn'] else '0'
+
+
+def apply_tensorflow_config(config):
+    """
+    Применяет потоки, XLA и mixed precision к TensorFlow
+
+    Должна вызываться до загрузки модели и первой операции TensorFlow.
+    """
+    global _tensorflow_configured
+    if _tensorflow_configured:
+        return
+    _tensorflow_configured = True
+
+    import tensorflow as tf
+
+    try:
+        if config.get('intra_op_threads'):
+            tf.config.threading.set_intra_op_parallelism_threads(config['intra_op_threads'])
+        if config.get('inter_op_threads'):
+            tf.config.threading.set_inter_op_parallelism_threads(config['inter_op_threads'])
+    except RuntimeError as e:
+        print(f"Потоки TensorFlow уже инициализированы, настройка пропущена: {e}")
+
+    tf.config.optimizer.set_jit(bool(config.get('xla_jit')))
+
+    if config.get('mixed_precision'):
+        tf.keras.mixed_precision.set_global_policy('mixed_float16')
+
+    print(f"⚙️ Среда выполнения: {describe_runtime_config(config)}")
+
+
+def describe_runtime_config(config):
+    """Краткое текстовое описание настроек"""
+    return (f"intra={config['intra_op_threads'] or 'auto'}, "
+            f"inter={config['inter_op_threads'] or 'auto'}, "
+            f"oneDNN={'default' if config['onednn'] is None else config['onednn']}, "
+            f"XLA={config['xla_jit']}, mixed={config['mixed_precision']}, "
+            f"batch={config['batch_size']}")
+
+
+def load_benchmark_images(image_dir, height, width, limit=32):
+    """Загружает и нормализует изображения для замера (или случайные данные)"""
+    import numpy as np
+    from PIL import Image
+
+    images = []
+    if image_dir and os.path.isdir(image_dir):
+        for name in sorted(os.listdir(image_dir)):
+            path = os.path.join(image_dir, name)
+            if not name.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
+                continue
+            try:
+                img = Image.open(path)
+                img = img.convert('RGB').resize((width, height))
+                images.append(np.asarray(img, dtype=np.float32) / 255.0)
+            except Exception as e:
+                print(f"Пропуск {path}: {e}", file=sys.stderr)
+            if len(images) >= limit:
+                break
+
+    if not images:
+        rng = np.random.default_rng(0)
+        images = [rng.random((height, width, 3), dtype=np.float32) for _ in range(8)]
+    return np.stack(images)
+
+
+def run_benchmark(model_path, image_dir, batch_sizes, runs, config):
+    """
+    Замеряет скорость модели при текущих настройках
+
+    Returns:
+        list: результаты по каждому размеру батча
+    """
+    apply_environment(config)
+    apply_tensorflow_config(config)
+
+    import numpy as np
+    from tensorflow.keras.models import load_model
+
+    model = load_model(model_path)
+    height, width = model.input_shape[1], model.input_shape[2]
+    images = load_benchmark_images(image_dir, height, width)
+
+    results = []
+    for batch_size in batch_sizes:
+        reps = int(np.ceil(batch_size / len(images)))
+        batch = np.concatenate([images] * reps)[:batch_size]
+
+        # Прогрев: трассировка графа и компиляция XLA не должны попадать в замер
+        model.predict(batch, batch_size=batch_size, verbose=0)
+        model.predict(batch, batch_size=batch_size, verbose=0)
+
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            model.predict(batch, batch_size=batch_size, verbose=0)
+            timings.append(time.perf_counter() - started)
+
+        timings.sort()
+        median = timings[len(timings) // 2]
+        results.append({
+            'batch_size': batch_size,
+            'latency_ms': median * 1000,
+            'images_per_sec': batch_size / median,
+        })
+    return results
+
+
+def autotune(model_path, image_dir, grid, batch_sizes, runs, max_latency_ms, output_path):
+    """
+    Перебирает сетку настроек и сохраняет самый быстрый профиль
+
+    Каждая точка сетки замеряется в отдельном процессе, потому что потоки
+    TensorFlow нельзя перенастроить после инициализации.
+    """
+    keys = list(grid)
+    combinations = list(itertools.product(*(grid[key] for key in keys)))
+    print(f"Автотюнинг: {len(combinations)} вариантов настроек x {len(batch_sizes)} размеров батча")
+
+    best = None
+    for index, values in enumerate(combinations, 1):
+        settings = dict(DEFAULT_RUNTIME_CONFIG)
+        settings.update(dict(zip(keys, values)))
+
+        command = [
+            sys.executable, os.path.abspath(__file__), "bench",
+            "--model", model_path,
+            "--batch-sizes", ",".join(str(b) for b in batch_sizes),
+            "--runs", str(runs),
+            "--intra-op-threads", str(settings['intra_op_threads']),
+            "--inter-op-threads", str(settings['inter_op_threads']),
+            "--onednn", "default" if settings['onednn'] is None else str(settings['onednn']),
+            "--xla-jit", str(settings['xla_jit']),
+            "--mixed-precision", str(settings['mixed_precision']),
+            # Замер не должен зависеть от уже сохраненных профилей и файла настроек
+            "--runtime-config", "", "--runtime-profile", "",
+        ]
+        if image_dir:
+            command += ["--images", image_dir]
+
+        env = {key: value for key, value in os.environ.items() if not key.startswith(ENV_PREFIX)}
+
+        print(f"[{index}/{len(combinations)}] {describe_runtime_config(settings)}")
+        try:
+            completed = subprocess.run(command, capture_output=True, text=True, check=True, env=env)
+            measurements = json.loads(completed.stdout.strip().splitlines()[-1])
+        except (subprocess.CalledProcessError, ValueError, IndexError) as e:
+            print(f"  ❌ Замер не удался: {e}")
+            continue
+
+        for item in measurements:
+            print(f"  batch={item['batch_size']:>3}: {item['images_per_sec']:8.1f} изобр/с, "
+                  f"{item['latency_ms']:8.1f} мс")
+            if max_latency_ms and item['latency_ms'] > max_latency_ms:
+                continue
+            if best is None or item['images_per_sec'] > best['images_per_sec']:
+                best = dict(item, settings=dict(settings, batch_size=item['batch_size']))
+
+    if best is None:
+        print("❌ Не найдено ни одного подходящего профиля")
+        return None
+
+    profile = {
+        'settings': best['settings'],
+        'images_per_sec': best['images_per_sec'],
+        'latency_ms': best['latency_ms'],
+        'model': os.path.abspath(model_path),
+        'host': platform.node(),
+        'cpu_count': os.cpu_count(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ Лучший профиль: {describe_runtime_config(profile['settings'])} "
+          f"({best['images_per_sec']:.1f} изобр/с) сохранен в {output_path}")
+    return profile
+
+
+def _int_list(text):
+    return [int(item) for item in text.split(",") if item.strip()]
+
+
+def _bool_list(text):
+    return [_parse_bool(item) for item in text.split(",") if item.strip()]
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    default_threads = sorted({0, 1, max(1, cpu_count // 2), cpu_count})
+
+    parser = argparse.ArgumentParser(description="Настройка среды выполнения инференса")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    show = commands.add_parser("show", help="показать итоговые настройки")
+    add_runtime_arguments(show)
+
+    bench = commands.add_parser("bench", help="замер при заданных настройках (JSON в stdout)")
+    add_runtime_arguments(bench)
+    bench.add_argument("--model", default="defect_detection_continued.h5")
+    bench.add_argument("--images", default="def")
+    bench.add_argument("--batch-sizes", default="1,4,8,16")
+    bench.add_argument("--runs", type=int, default=5)
+
+    tune = commands.add_parser("autotune", help="подобрать самый быстрый профиль для этой машины")
+    tune.add_argument("--model", default="defect_detection_continued.h5")
+    tune.add_argument("--images", default="def")
+    tune.add_argument("--intra", default=",".join(str(t) for t in default_threads))
+    tune.add_argument("--inter", default="0,1,2")
+    tune.add_argument("--onednn", default="default")
+    tune.add_argument("--xla", default="off,on")
+    tune.add_argument("--mixed", default="off")
+    tune.add_argument("--batch-sizes", default="1,4,8,16")
+    tune.add_argument("--runs", type=int, default=5)
+    tune.add_argument("--max-latency-ms", type=float, default=None,
+                      help="не выбирать профили с задержкой батча больше этой")
+    tune.add_argument("--output", default=RUNTIME_PROFILE_FILE)
+
+    args = parser.parse_args()
+
+    if args.command == "show":
+        config = load_runtime_config(sys.argv[2:])
+        print(json.dumps(config, ensure_ascii=False, indent=2))
+    elif args.command == "bench":
+        config = load_runtime_config(sys.argv[2:])
+        # Весь диагностический вывод TensorFlow уходит в stderr, результат - последней строкой stdout
+        results = run_benchmark(args.model, args.images, _int_list(args.batch_sizes), args.runs, config)
+        print(json.dumps(results))
+    elif args.command == "autotune":
+        grid = {
+            'intra_op_threads': _int_list(args.intra),
+            'inter_op_threads': _int_list(args.inter),
+            'onednn': _bool_list(args.onednn),
+            'xla_jit': _bool_list(args.xla),
+            'mixed_precision': _bool_list(args.mixed),
+        }
+        autotune(args.model, args.images, grid, _int_list(args.batch_sizes), args.runs,
+                 args.max_latency_ms, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,21 @@ import numpy as np
 from PIL import Image
 import os
 
-# Загрузка модели (делается один раз при импорте)
-model = load_model('defect_detection_continued.h5')
+from model_reloader import HotReloadModel
+from preprocessing import RoiConfig, load_model_input
+
+# Загрузка модели (делается один раз при импорте); новая версия файла подхватывается на лету
+model_manager = HotReloadModel('defect_detection_continued.h5', loader=load_model)
+model_manager.start_watching()
 print("✅ Модель загружена")
+roi_config = RoiConfig.load()
+
+
+def __getattr__(name):
+    # Совместимость: script_retern_result_prot.model - всегда текущая версия модели
+    if name == "model":
+        return model_manager.model
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def analyze_photo(image_path):
@@ -19,23 +31,36 @@ def analyze_photo(image_path):
     Returns:
         str: 'defect' или 'not_defect'
     """
+    return analyze_photo_detailed(image_path)['result']
+
+
+def analyze_photo_detailed(image_path):
+    """
+    Анализирует фото и сообщает, какая версия модели вынесла вердикт
+
+    Args:
+        image_path (str): путь к фотографии
+
+    Returns:
+        dict: result ('defect', 'not_defect' или 'error'), probability, model_version
+    """
     try:
         # Проверяем существование файла
         if not os.path.exists(image_path):
             print(f"❌ Файл {image_path} не найден")
-            return "error"
-
-        # Загрузка и обработка изображения
-        img = Image.open(image_path)
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
+            return {'result': "error", 'probability': None, 'model_version': None}
 
-        img = img.resize((224, 224))
-        img_array = np.array(img) / 255.0
+        # Загрузка области интереса и обработка изображения
+        img_array = load_model_input(
+            image_path,
+            (224, 224),
+            roi=roi_config.roi_for(image_path),
+            reduced_decode=roi_config.reduced_decode
+        )
         img_array = np.expand_dims(img_array, axis=0)
 
         # Предсказание
-        prediction = model.predict(img_array, verbose=0)
+        prediction, model_version = model_manager.predict(img_array, verbose=0)
         defect_prob = float(prediction[0][0])
 
         # Определяем результат
@@ -44,12 +69,12 @@ def analyze_photo(image_path):
         else:
             result = "not_defect"
 
-        print(f"🔍 {image_path}: {result} ({defect_prob:.3f})")
-        return result
+        print(f"🔍 {image_path}: {result} ({defect_prob:.3f}, модель {model_version})")
+        return {'result': result, 'probability': defect_prob, 'model_version': model_version}
 
     except Exception as e:
         print(f"❌ Ошибка с {image_path}: {e}")
-        return "error"
+        return {'result': "error", 'probability': None, 'model_version': None}
 
 
 # ПРИМЕР использования функции:
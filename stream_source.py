@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+
+import cv2
+from PIL import Image
+
+STREAM_SAMPLE_FPS = 2.0  # сколько кадров в секунду отправлять на анализ
+
+
+class StreamFrame:
+    def __init__(self, stream_name, index, timestamp, image, source=None):
+        """
+        Кадр видеопотока в памяти - задание для батчевого инференса вместо пути к файлу
+
+        Args:
+            stream_name (str): имя потока (для ROI и подписей)
+            index (int): номер кадра в потоке
+            timestamp (float): время кадра, сек от начала потока
+            image (PIL.Image.Image): кадр RGB
+            source (StreamSource): поток, которому сообщить о вердикте
+        """
+        self.stream_name = stream_name
+        self.index = index
+        self.timestamp = timestamp
+        self.image = image
+        self.source = source
+        self.name = f"{stream_name}_{index:08d}"
+
+    def __repr__(self):
+        return f"StreamFrame({self.name})"
+
+    @property
+    def model_input(self):
+        """Кадр потока всегда декодируется и приводится к входу модели заново"""
+        return None
+
+    def is_valid(self):
+        return True
+
+    def retain(self):
+        """Кадр уже целиком в памяти - копировать нечего"""
+        return True
+
+
+def parse_stream_source(text):
+    """Номер устройства захвата - число, иначе путь к видеофайлу или URL потока"""
+    text = str(text).strip()
+    return int(text) if text.isdigit() else text
+
+
+class StreamSource:
+    def __init__(self, source, on_frame, sample_fps=STREAM_SAMPLE_FPS, max_in_flight=4,
+                 realtime=True, name=None):
+        """
+        Чтение кадров с камеры или из видеофайла без записи на диск
+
+        Все кадры забираются через grab() (без декодирования), а декодируются
+        только отобранные с частотой sample_fps. Если на анализе уже
+        max_in_flight кадров, очередной отобранный кадр пропускается - живой
+        поток не копит отставание.
+
+        Args:
+            source (int | str): номер устройства, путь к видеофайлу или URL
+            on_frame (callable): вызывается (StreamFrame) из потока чтения
+            sample_fps (float): частота отбора кадров на анализ
+            max_in_flight (int): сколько кадров может одновременно ждать вердикта
+            realtime (bool): воспроизводить видеофайл в темпе записи, как камеру (по умолчанию);
+                False - читать файл с максимальной скоростью, ожидая места вместо пропуска кадров
+            name (str): имя потока (по умолчанию - из source)
+        """
+        self.source = source
+        self.on_frame = on_frame
+        self.sample_interval = 1.0 / sample_fps if sample_fps > 0 else 0.0
+        self.max_in_flight = max(1, max_in_flight)
+        self.is_device = isinstance(source, int)
+        self.realtime = realtime
+        self.name = name or (f"cam{source}" if self.is_device else
+                             os.path.splitext(os.path.basename(str(source).rstrip("/\\")))[0])
+
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.finished = False
+
+        self.frames_read = 0
+        self.frames_sampled = 0
+        self.skipped_backpressure = 0
+        self.started_at = None
+
+    def start(self):
+        """Открывает источник и запускает поток чтения"""
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            raise IOError(f"Не удалось открыть видеопоток: {self.source}")
+        self.stop_event.clear()
+        self.finished = False
+        self.thread = threading.Thread(target=self._run, args=(capture,), daemon=True, name="stream-reader")
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join(5)
+            self.thread = None
+
+    def done(self, frame):
+        """Кадр получил вердикт - освобождает место для следующего"""
+        with self.condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.condition.notify_all()
+
+    def stats(self):
+        """
+        Returns:
+            dict: read, sampled, skipped, in_flight, fps (отобранных кадров в секунду)
+        """
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            'read': self.frames_read,
+            'sampled': self.frames_sampled,
+            'skipped': self.skipped_backpressure,
+            'in_flight': self.in_flight,
+            'fps': self.frames_sampled / elapsed if elapsed else 0.0,
+        }
+
+    def _run(self, capture):
+        file_fps = 0.0 if self.is_device else capture.get(cv2.CAP_PROP_FPS) or 0.0
+        self.started_at = time.monotonic()
+        next_sample = 0.0
+        try:
+            while not self.stop_event.is_set():
+                if not capture.grab():
+                    print(f"Видеопоток {self.name} закончился")
+                    break
+                index = self.frames_read
+                self.frames_read += 1
+
+                if self.is_device:
+                    timestamp = time.monotonic() - self.started_at
+                elif file_fps:
+                    timestamp = index / file_fps
+                else:
+                    timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+                if not self.is_device and self.realtime:
+                    # Видеофайл изображает камеру: не обгоняем время записи
+                    delay = self.started_at + timestamp - time.monotonic()
+                    if delay > 0:
+                        self.stop_event.wait(delay)
+
+                if timestamp < next_sample:
+                    continue
+
+                with self.condition:
+                    if self.in_flight >= self.max_in_flight:
+                        if self.is_device or self.realtime:
+                            self.skipped_backpressure += 1
+                            continue
+                        # Файл без привязки ко времени: ждем, а не теряем кадры
+                        while self.in_flight >= self.max_in_flight and not self.stop_event.is_set():
+                            self.condition.wait(0.5)
+                    self.in_flight += 1
+
+                # Декодируем только отобранный кадр
+                ok, bgr = capture.retrieve()
+                if not ok:
+                    self.done(None)
+                    continue
+                next_sample = timestamp + self.sample_interval
+                self.frames_sampled += 1
+                image = Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+                self.on_frame(StreamFrame(self.name, index, timestamp, image, source=self))
+        except Exception as e:
+            print(f"❌ Ошибка чтения видеопотока {self.name}: {e}")
+        finally:
+            capture.release()
+            self.finished = True
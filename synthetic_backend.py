@@ -0,0 +1,122 @@
+import argparse
+import hashlib
+import math
+import random
+import threading
+import time
+
+import numpy as np
+
+
+class SyntheticModel:
+    def __init__(self, defect_rate=0.1, latency_ms=20.0, per_item_ms=5.0, jitter=0.2, seed=0,
+                 sleep=time.sleep):
+        """
+        Детерминированная замена нейросети для нагрузочных прогонов без модели
+
+        Вердикт зависит только от содержимого кадра и seed, поэтому одинаков
+        от запуска к запуску и в любом процессе. Задержка батча - логнормальная
+        с медианой latency_ms + per_item_ms * размер батча; последовательность
+        задержек тоже задается seed.
+
+        Args:
+            defect_rate (float): доля кадров с дефектом, 0..1
+            latency_ms (float): постоянная часть задержки одного вызова, мс
+            per_item_ms (float): добавка к задержке за каждый кадр батча, мс
+            jitter (float): сигма логнормального разброса (0 - без разброса)
+            seed (int): зерно вердиктов и задержек
+            sleep (callable): функция ожидания (для тестов - без реального сна)
+        """
+        if not 0 <= defect_rate <= 1:
+            raise ValueError(f"Доля дефектов должна быть от 0 до 1: {defect_rate}")
+        self.defect_rate = defect_rate
+        self.latency_ms = latency_ms
+        self.per_item_ms = per_item_ms
+        self.jitter = jitter
+        self.seed = seed
+        self.sleep = sleep
+        self.key = str(seed).encode("utf-8")
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    @property
+    def version(self):
+        return f"synthetic-{self.seed}-{self.defect_rate:g}"
+
+    def latency(self, batch_size):
+        """Задержка очередного вызова для батча batch_size, сек"""
+        median = self.latency_ms + self.per_item_ms * batch_size
+        with self.lock:
+            factor = self.random.lognormvariate(0.0, self.jitter) if self.jitter > 0 else 1.0
+        return max(0.0, median * factor) / 1000
+
+    def score(self, data):
+        """
+        Вероятность "не дефект" для содержимого кадра
+
+        Равномерное число из хеша содержимого: ниже defect_rate - дефект (вероятность < 0.5).
+        """
+        digest = hashlib.blake2b(data, digest_size=8, key=self.key).digest()
+        uniform = int.from_bytes(digest, "big") / 2 ** 64
+        if uniform < self.defect_rate:
+            return 0.5 * uniform / self.defect_rate
+        return 0.5 + 0.5 * (uniform - self.defect_rate) / (1 - self.defect_rate)
+
+    def predict(self, batch, batch_size=None, verbose=0):
+        """
+        То же, что model.predict у Keras-модели
+
+        Args:
+            batch (numpy array): (n, высота, ширина, каналы)
+
+        Returns:
+            numpy array: float32, (n, 1) - вероятность "не дефект"
+        """
+        batch = np.ascontiguousarray(batch)
+        probabilities = np.array([[self.score(item.tobytes())] for item in batch], dtype=np.float32)
+        self.sleep(self.latency(len(batch)))
+        return probabilities.reshape(-1, 1)
+
+
+def from_runtime_config(config):
+    """SyntheticModel с параметрами из настроек среды выполнения"""
+    return SyntheticModel(
+        defect_rate=config['synthetic_defect_rate'],
+        latency_ms=config['synthetic_latency_ms'],
+        per_item_ms=config['synthetic_per_item_ms'],
+        jitter=config['synthetic_jitter'],
+        seed=config['synthetic_seed']
+    )
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка параметров синтетической модели")
+    parser.add_argument("--defect-rate", type=float, default=0.1)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--per-item-ms", type=float, default=5.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-sizes", default="1,4,8,16")
+    parser.add_argument("--calls", type=int, default=1000)
+    args = parser.parse_args()
+
+    model = SyntheticModel(args.defect_rate, args.latency_ms, args.per_item_ms, args.jitter, args.seed,
+                           sleep=lambda seconds: None)
+    print(f"Модель {model.version}")
+    for batch_size in [int(value) for value in args.batch_sizes.split(",")]:
+        latencies = [model.latency(batch_size) * 1000 for _ in range(args.calls)]
+        print(f"батч {batch_size:3d}: p50 {percentile(latencies, 0.5):7.1f} мс, "
+              f"p99 {percentile(latencies, 0.99):7.1f} мс, "
+              f"{batch_size * 1000 / (sum(latencies) / len(latencies)):7.1f} кадр/с")
+
+    scores = [model.score(index.to_bytes(8, "big")) for index in range(args.calls * 10)]
+    print(f"Доля дефектов на {len(scores)} кадрах: {sum(score < 0.5 for score in scores) / len(scores):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from frame_ring import FrameRing, RingConsumer
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_consumer_follows_restarted_producer(tmp_path):
+    path = str(tmp_path / "line1.ring")
+    shape = (4, 4, 3)
+    ring = FrameRing.create(path, 8, shape)
+
+    received = []
+    lock = threading.Lock()
+
+    def on_frame(frame):
+        with lock:
+            received.append((frame.frame_id, frame.is_valid()))
+        frame.source.done(frame)
+
+    consumer = RingConsumer(path, on_frame, poll_interval=0.005)
+    consumer.start()
+    try:
+        assert wait_for(lambda: consumer.started_at is not None)
+        ring.write(np.zeros(shape, dtype=np.uint8), frame_id=1)
+        assert wait_for(lambda: len(received) == 1)
+
+        # Производитель перезапустился: новый файл на том же пути, номера кадров сначала
+        ring.close()
+        ring = FrameRing.create(path, 8, shape)
+        assert wait_for(lambda: consumer.reopened == 1)
+        ring.write(np.ones(shape, dtype=np.uint8), frame_id=2)
+        assert wait_for(lambda: len(received) == 2)
+    finally:
+        consumer.stop()
+        ring.close()
+
+    assert received == [(1, True), (2, True)]
@@ -0,0 +1,74 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("watchdog")
+
+
+class CrashingModel:
+    def predict(self, batch, batch_size=None, verbose=0):
+        # Процесс инференса погибает посреди батча
+        os.kill(os.getpid(), getattr(signal, "SIGKILL", signal.SIGTERM))
+
+
+def crashing_loader(model_path):
+    return CrashingModel()
+
+
+@pytest.fixture
+def headless(monkeypatch):
+    # Настройки читаются при импорте main: модель в процессе не запускаем, ее подставляет тест
+    monkeypatch.setenv("LD_BACKEND", "synthetic")
+    monkeypatch.setenv("LD_INFERENCE_PROCESS", "0")
+    import headless
+
+    return headless
+
+
+def test_photos_survive_inference_crash(tmp_path, headless):
+    from inference_process import InferenceProcess
+
+    folder = tmp_path / "photos"
+    folder.mkdir()
+    random = np.random.default_rng(0)
+    photo_paths = []
+    for index in range(3):
+        path = folder / f"photo_{index}.jpg"
+        Image.fromarray(random.integers(0, 255, (240, 320, 3), dtype=np.uint8)).save(path)
+        photo_paths.append(str(path))
+    model_path = tmp_path / "model.h5"
+    model_path.write_bytes(b"model")
+
+    root = headless.HeadlessRoot()
+    viewer = headless.HeadlessViewer(root, str(folder))
+    viewer.synthetic_model = None
+    viewer.inference_process = InferenceProcess(
+        str(model_path),
+        viewer.runtime_config,
+        max_batch=viewer.runtime_config['batch_size'],
+        start_timeout=60.0,
+        request_timeout=30.0,
+        loader=crashing_loader
+    )
+    viewer.inference_process.start()
+
+    root.after(0, viewer.start_viewing)
+    threading.Thread(target=root.mainloop, daemon=True).start()
+    try:
+        deadline = time.monotonic() + 120
+        while viewer.backlog_done < len(photo_paths) and time.monotonic() < deadline:
+            time.sleep(0.2)
+        assert viewer.backlog_done == len(photo_paths)
+        assert viewer.inference_process.restarts >= 1
+    finally:
+        viewer.stop()
+
+    # Фото без вердикта остаются в папке для повторной проверки
+    for path in photo_paths:
+        assert os.path.exists(path)
+    assert not viewer.analyzed_photos
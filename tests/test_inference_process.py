@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from inference_process import InferenceProcess, InferenceProcessError
+
+PREDICT_SECONDS = 2.0
+
+
+class SlowModel:
+    def predict(self, batch, batch_size=None, verbose=0):
+        time.sleep(PREDICT_SECONDS)
+        return np.full((len(batch), 1), 0.9, dtype=np.float32)
+
+
+def slow_loader(model_path):
+    return SlowModel()
+
+
+@pytest.fixture
+def process(tmp_path):
+    model_path = tmp_path / "model.h5"
+    model_path.write_bytes(b"model")
+    process = InferenceProcess(
+        str(model_path),
+        {},
+        max_batch=2,
+        input_shape=(8, 8, 3),
+        start_timeout=60.0,
+        request_timeout=30.0,
+        loader=slow_loader
+    )
+    process.start()
+    yield process
+    if process.frames is not None:
+        process.stop()
+
+
+def test_profile_request_does_not_wait_for_batch(tmp_path, process):
+    batch = np.zeros((2, 8, 8, 3), dtype=np.float32)
+    worker = threading.Thread(target=process.predict, args=(batch,))
+    worker.start()
+    deadline = time.monotonic() + 5
+    while not process.lock.locked() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert process.lock.locked()
+
+    # Запрос из потока интерфейса не ждет батч, который сейчас в модели
+    started = time.monotonic()
+    process.request_profile("profile-test", 0.5, str(tmp_path / "profiles"))
+    assert time.monotonic() - started < PREDICT_SECONDS / 2
+
+    worker.join()
+
+
+def test_predict_after_stop_raises(process):
+    process.stop()
+    with pytest.raises(InferenceProcessError):
+        process.predict(np.zeros((1, 8, 8, 3), dtype=np.float32))
@@ -0,0 +1,94 @@
+import json
+import os
+import time
+
+from work_claim import LeaseClaimer
+
+
+def make_photo(folder, name="photo.jpg"):
+    path = folder / name
+    path.write_bytes(b"\xff\xd8photo\xff\xd9")
+    return str(path)
+
+
+def lease_owner(claimer, file_path):
+    with open(claimer.lease_path(file_path), "r", encoding="utf-8") as f:
+        return json.load(f)['node']
+
+
+def age_lease(claimer, file_path, seconds):
+    stamp = time.time() - seconds
+    os.utime(claimer.lease_path(file_path), (stamp, stamp))
+
+
+def leftover_tombstones(claimer):
+    return [name for name in os.listdir(claimer.lease_dir) if ".stale-" in name]
+
+
+def test_fresh_lease_is_not_taken(tmp_path):
+    photo = make_photo(tmp_path)
+    node_a = LeaseClaimer(str(tmp_path), node_id="a", lease_ttl=5.0)
+    node_b = LeaseClaimer(str(tmp_path), node_id="b", lease_ttl=5.0)
+
+    assert node_a.try_claim(photo)
+    assert not node_b.try_claim(photo)
+    assert lease_owner(node_a, photo) == "a"
+
+
+def test_stale_lease_is_taken_over(tmp_path):
+    photo = make_photo(tmp_path)
+    node_a = LeaseClaimer(str(tmp_path), node_id="a", lease_ttl=5.0)
+    node_b = LeaseClaimer(str(tmp_path), node_id="b", lease_ttl=5.0)
+
+    assert node_a.try_claim(photo)
+    age_lease(node_a, photo, 60)
+
+    assert node_b.try_claim(photo)
+    assert node_b.takeovers == 1
+    assert lease_owner(node_b, photo) == "b"
+    assert not leftover_tombstones(node_b)
+
+
+def test_lease_renewed_before_takeover_is_restored(tmp_path):
+    photo = make_photo(tmp_path)
+    node_a = LeaseClaimer(str(tmp_path), node_id="a", lease_ttl=5.0)
+    node_b = LeaseClaimer(str(tmp_path), node_id="b", lease_ttl=5.0)
+
+    assert node_a.try_claim(photo)
+    age_lease(node_a, photo, 60)
+    lease_path = node_b.lease_path(photo)
+    observed = os.stat(lease_path)
+
+    # Станция a продлила аренду между проверкой срока и переименованием
+    node_a._renew_leases()
+
+    assert not node_b._take_over(lease_path, observed)
+    assert lease_owner(node_a, photo) == "a"
+    assert node_a.is_held(photo)
+    assert not leftover_tombstones(node_b)
+
+
+def test_lease_claimed_during_restore_is_dropped_by_old_owner(tmp_path):
+    photo = make_photo(tmp_path)
+    node_a = LeaseClaimer(str(tmp_path), node_id="a", lease_ttl=5.0)
+    node_b = LeaseClaimer(str(tmp_path), node_id="b", lease_ttl=5.0)
+    node_c = LeaseClaimer(str(tmp_path), node_id="c", lease_ttl=5.0)
+
+    assert node_a.try_claim(photo)
+    lease_path = node_b.lease_path(photo)
+    tombstone = lease_path + ".stale-b-test"
+    os.rename(lease_path, tombstone)
+
+    # Пока b возвращает аренду на место, ее занимает станция c
+    assert node_c.try_claim(photo)
+    node_b._restore_lease(tombstone, lease_path)
+
+    assert lease_owner(node_c, photo) == "c"
+    assert not leftover_tombstones(node_b)
+
+    # Станция a видит чужую аренду при продлении и больше ее не держит
+    node_a._renew_leases()
+    assert not node_a.is_held(photo)
+    assert node_a.lost == 1
+    node_a.release(photo)
+    assert lease_owner(node_c, photo) == "c"
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+# Кеш лежит рядом со скриптом, а не в текущей папке процесса
+THUMBNAIL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thumbnail_cache")
+THUMBNAIL_SIZE = (160, 107)
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir=THUMBNAIL_CACHE_DIR, size=THUMBNAIL_SIZE):
+        """
+        Дисковый кеш миниатюр, которые создаются в фоновом потоке
+
+        Args:
+            cache_dir (str): папка кеша (вне отслеживаемой папки, чтобы не вызывать событий)
+            size (tuple): максимальный размер миниатюры (ширина, высота)
+        """
+        self.cache_dir = cache_dir
+        self.size = size
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnails")
+        self.lock = threading.Lock()
+        self.in_progress = {}  # путь -> список обратных вызовов
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def thumbnail_path(self, image_path):
+        """Путь к миниатюре в кеше"""
+        key = hashlib.sha1(os.path.abspath(image_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + ".jpg")
+
+    def request(self, image_path, on_ready=None):
+        """
+        Ставит создание миниатюры в фоновую очередь
+
+        Args:
+            image_path (str): путь к исходному изображению
+            on_ready (callable): вызывается (image_path) из фонового потока, когда миниатюра готова
+        """
+        with self.lock:
+            if image_path in self.in_progress:
+                if on_ready:
+                    self.in_progress[image_path].append(on_ready)
+                return
+            self.in_progress[image_path] = [on_ready] if on_ready else []
+        self.executor.submit(self._generate, image_path)
+
+    def load(self, image_path, on_ready=None):
+        """
+        Загружает миниатюру из кеша
+
+        Returns:
+            PIL.Image.Image или None, если миниатюры еще нет (тогда она ставится в очередь)
+        """
+        thumb_path = self.thumbnail_path(image_path)
+        try:
+            with Image.open(thumb_path) as thumb:
+                thumb.load()
+                return thumb
+        except (FileNotFoundError, OSError):
+            self.request(image_path, on_ready)
+            return None
+
+    def shutdown(self):
+        """Останавливает фоновый поток, не дожидаясь очереди"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _generate(self, image_path):
+        thumb_path = self.thumbnail_path(image_path)
+        try:
+            if not os.path.exists(thumb_path):
+                with Image.open(image_path) as img:
+                    # Для JPEG декодируем сразу в уменьшенном масштабе
+                    img.draft('RGB', (self.size[0] * 2, self.size[1] * 2))
+                    thumb = img.convert('RGB')
+                    thumb.thumbnail(self.size, Image.Resampling.LANCZOS)
+
+                os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+                temp_path = thumb_path + ".tmp"
+                thumb.save(temp_path, "JPEG", quality=85)
+                os.replace(temp_path, thumb_path)
+        except Exception as e:
+            print(f"Ошибка создания миниатюры {image_path}: {e}")
+
+        with self.lock:
+            callbacks = self.in_progress.pop(image_path, [])
+        if os.path.exists(thumb_path):
+            for callback in callbacks:
+                try:
+                    callback(image_path)
+                except Exception as e:
+                    print(f"Ошибка обработки готовой миниатюры: {e}")
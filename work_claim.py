@@ -0,0 +1,439 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import socket
+import threading
+import time
+import uuid
+
+LEASE_DIR_NAME = ".leases"
+LEASE_SUFFIX = ".lease"
+
+
+class LeaseClaimer:
+    def __init__(self, folder, node_id=None, lease_ttl=30.0):
+        """
+        Распределение файлов общей папки между станциями через файлы аренды
+
+        Файл аренды создается атомарно (O_CREAT | O_EXCL) в подпапке .leases,
+        поэтому один файл обрабатывает ровно одна станция. Держатель аренды
+        периодически обновляет ее время изменения; аренду, не обновлявшуюся
+        дольше lease_ttl, забирает другая станция (атомарным переименованием).
+
+        Гарантия - "хотя бы один раз": в редкой гонке (аренду продлили между
+        проверкой срока и переименованием, а пока она возвращается на место,
+        ее заняла третья станция) файл могут проверить две станции. Вердикт
+        модели для одного файла одинаков, а удаление и перенос в архив
+        второй станции просто не находят файла, поэтому повтор стоит только
+        лишнего инференса. Прежний владелец замечает потерю аренды при
+        следующем продлении и перестает ее удерживать.
+
+        Args:
+            folder (str): общая отслеживаемая папка
+            node_id (str): имя станции (по умолчанию - хост, pid и случайный суффикс)
+            lease_ttl (float): через сколько секунд без продления аренда считается брошенной
+        """
+        self.folder = os.path.abspath(folder)
+        self.lease_dir = os.path.join(self.folder, LEASE_DIR_NAME)
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+        self.lease_ttl = lease_ttl
+        self.held = {}  # путь файла -> путь аренды
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.heartbeat_thread = None
+        self.jobs = queue.Queue()
+        self.worker_thread = None
+        self.clock_path = os.path.join(self.lease_dir, f".clock-{self.node_id}")
+        self.takeovers = 0
+        self.lost = 0  # аренды, которые заняла другая станция, пока мы их держали
+        os.makedirs(self.lease_dir, exist_ok=True)
+
+    def lease_path(self, file_path):
+        return os.path.join(self.lease_dir, os.path.basename(file_path) + LEASE_SUFFIX)
+
+    def start(self):
+        """Запускает потоки продления аренд и работы с общей папкой"""
+        if self.heartbeat_thread and self.heartbeat_thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.heartbeat_thread = threading.Thread(target=self._heartbeat, daemon=True, name="lease-heartbeat")
+        self.heartbeat_thread.start()
+        self.worker_thread = threading.Thread(target=self._work, daemon=True, name="lease-worker")
+        self.worker_thread.start()
+
+    def stop(self):
+        """Останавливает продление и отпускает все аренды"""
+        self.stop_event.set()
+        if self.worker_thread:
+            # Начатую операцию дожидаемся, чтобы не оставить аренду, взятую уже после остановки
+            self.jobs.put(None)
+            self.worker_thread.join(10)
+            self.worker_thread = None
+        with self.lock:
+            held = list(self.held)
+        for file_path in held:
+            self.release(file_path)
+        try:
+            os.remove(self.clock_path)
+        except OSError:
+            pass
+
+    def submit(self, func, *args):
+        """
+        Выполняет func(*args) в потоке работы с общей папкой
+
+        Сетевая папка может отвечать секундами, поэтому аренды берутся и
+        отпускаются не в потоке интерфейса. После stop() задания не выполняются.
+        """
+        self.jobs.put((func, args))
+
+    def is_held(self, file_path):
+        with self.lock:
+            return file_path in self.held
+
+    def held_count(self):
+        with self.lock:
+            return len(self.held)
+
+    def try_claim(self, file_path):
+        """
+        Пытается взять файл в работу
+
+        Returns:
+            bool: True, если файл теперь принадлежит этой станции
+        """
+        if self.is_held(file_path):
+            return True
+
+        lease_path = self.lease_path(file_path)
+        if self._create_lease(file_path, lease_path):
+            return True
+
+        try:
+            observed = os.stat(lease_path)
+        except FileNotFoundError:
+            # Аренду только что отпустили - пробуем еще раз
+            return self._create_lease(file_path, lease_path)
+        except OSError:
+            return False
+
+        expired = self._shared_now() - observed.st_mtime > self.lease_ttl
+        if expired and self._take_over(lease_path, observed):
+            print(f"Аренда {os.path.basename(file_path)} просрочена, файл забран станцией {self.node_id}")
+            self.takeovers += 1
+            return self._create_lease(file_path, lease_path)
+        return False
+
+    def release(self, file_path):
+        """Отпускает аренду файла (после удаления или переименования)"""
+        with self.lock:
+            lease_path = self.held.pop(file_path, None)
+        if lease_path is None:
+            return
+
+        # Удаляем только свою аренду: ее могли забрать, если мы надолго зависли
+        if self._lease_owner(lease_path) == self.node_id:
+            try:
+                os.remove(lease_path)
+            except OSError:
+                pass
+
+    def find_unclaimed(self, file_paths, limit=None, expired_only=False):
+        """
+        Файлы без действующей аренды (новые или брошенные упавшей станцией)
+
+        Args:
+            file_paths (list): пути файлов папки
+            limit (int): сколько файлов вернуть не больше
+            expired_only (bool): только файлы с просроченной арендой
+
+        Returns:
+            list: пути, которые стоит попробовать взять в работу
+        """
+        now = self._shared_now()
+        found = []
+        for file_path in file_paths:
+            if self.is_held(file_path):
+                continue
+            lease_path = self.lease_path(file_path)
+            try:
+                age = now - os.stat(lease_path).st_mtime
+            except FileNotFoundError:
+                if expired_only:
+                    continue
+                age = None
+            except OSError:
+                continue
+            if age is None or age > self.lease_ttl:
+                found.append(file_path)
+                if limit and len(found) >= limit:
+                    break
+        return found
+
+    def sweep_orphan_leases(self):
+        """Удаляет просроченные аренды файлов, которых уже нет в папке"""
+        now = self._shared_now()
+        try:
+            names = os.listdir(self.lease_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(LEASE_SUFFIX):
+                continue
+            file_path = os.path.join(self.folder, name[:-len(LEASE_SUFFIX)])
+            lease_path = os.path.join(self.lease_dir, name)
+            try:
+                if not os.path.exists(file_path) and now - os.stat(lease_path).st_mtime > self.lease_ttl:
+                    os.remove(lease_path)
+            except OSError:
+                pass
+
+    def _create_lease(self, file_path, lease_path):
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        except OSError as e:
+            print(f"Ошибка создания аренды {lease_path}: {e}")
+            return False
+
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({'node': self.node_id, 'claimed_at': time.time()}, f)
+        with self.lock:
+            self.held[file_path] = lease_path
+        return True
+
+    def _lease_owner(self, lease_path):
+        try:
+            with open(lease_path, "r", encoding="utf-8") as f:
+                return json.load(f).get('node')
+        except (OSError, ValueError):
+            return None
+
+    def _take_over(self, lease_path, observed):
+        """
+        Атомарно убирает брошенную аренду; успешно переименовать ее может только одна станция
+
+        Между проверкой срока (observed - результат os.stat) и переименованием
+        аренду могли продлить или заменить свежей арендой другой станции.
+        Поэтому переименованный файл сверяется с проверенным, и чужая
+        действующая аренда возвращается на место.
+        """
+        tombstone = f"{lease_path}.stale-{self.node_id}-{uuid.uuid4().hex[:6]}"
+        try:
+            os.rename(lease_path, tombstone)
+        except FileNotFoundError:
+            return True
+        except OSError:
+            return False
+
+        try:
+            moved = os.stat(tombstone)
+            stale = (moved.st_ino, moved.st_mtime) == (observed.st_ino, observed.st_mtime)
+        except OSError:
+            stale = False
+        if not stale:
+            self._restore_lease(tombstone, lease_path)
+            return False
+
+        try:
+            os.remove(tombstone)
+        except OSError:
+            pass
+        return True
+
+    def _restore_lease(self, tombstone, lease_path):
+        """Возвращает на место аренду, переименованную по ошибке"""
+        try:
+            with open(tombstone, "rb") as f:
+                content = f.read()
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+        except FileExistsError:
+            print(f"⚠️ Аренду {os.path.basename(lease_path)} уже заняли заново, вернуть прежнюю нельзя")
+        except OSError as e:
+            print(f"❌ Не удалось вернуть аренду {lease_path}: {e}")
+        try:
+            os.remove(tombstone)
+        except OSError:
+            pass
+
+    def _shared_now(self):
+        """
+        Текущее время по часам файлового сервера
+
+        Время изменения аренд выставляет сервер общей папки, поэтому сравниваем
+        его не с локальными часами станции, а с только что обновленным файлом.
+        """
+        try:
+            with open(self.clock_path, "a"):
+                pass
+            os.utime(self.clock_path)
+            return os.stat(self.clock_path).st_mtime
+        except OSError:
+            return time.time()
+
+    def _work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None or self.stop_event.is_set():
+                return
+            func, args = job
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Ошибка работы с общей папкой: {e}")
+
+    def _heartbeat(self):
+        interval = max(0.5, self.lease_ttl / 3)
+        while not self.stop_event.wait(interval):
+            self._renew_leases()
+
+    def _renew_leases(self):
+        """Продлевает свои аренды и перестает держать те, что уже принадлежат другой станции"""
+        with self.lock:
+            held = list(self.held.items())
+        for file_path, lease_path in held:
+            owner = self._lease_owner(lease_path)
+            if owner is not None and owner != self.node_id:
+                with self.lock:
+                    if self.held.get(file_path) == lease_path:
+                        del self.held[file_path]
+                self.lost += 1
+                print(f"⚠️ Аренду {os.path.basename(file_path)} заняла станция {owner}")
+                continue
+            try:
+                os.utime(lease_path)
+            except OSError:
+                pass
+
+
+def _simulated_node(folder, node_index, processing_time, lease_ttl, log_path, idle_timeout, crash_after):
+    """Станция-имитатор: берет файлы в работу, 'обрабатывает' и удаляет их"""
+    claimer = LeaseClaimer(folder, node_id=f"node{node_index}", lease_ttl=lease_ttl)
+    claimer.start()
+    processed = 0
+    idle_since = time.monotonic()
+
+    with open(log_path, "w", encoding="utf-8") as log:
+        while time.monotonic() - idle_since < idle_timeout:
+            names = sorted(name for name in os.listdir(folder) if name.endswith(".jpg"))
+            candidates = claimer.find_unclaimed([os.path.join(folder, name) for name in names])
+            worked = False
+            for file_path in candidates:
+                if not claimer.try_claim(file_path):
+                    continue
+                if not os.path.exists(file_path):
+                    claimer.release(file_path)
+                    continue
+
+                worked = True
+                started = time.time()
+                time.sleep(processing_time)
+                processed += 1
+                if crash_after and processed >= crash_after:
+                    # Падение посреди обработки: аренда остается и должна быть забрана другими
+                    os._exit(1)
+
+                log.write(json.dumps({'file': os.path.basename(file_path), 'started': started,
+                                      'at': time.time()}) + "\n")
+                log.flush()
+
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+                claimer.release(file_path)
+
+            if worked:
+                idle_since = time.monotonic()
+            else:
+                time.sleep(0.05)
+
+    claimer.stop()
+
+
+def simulate(folder, nodes, files, processing_time, lease_ttl, crash_node):
+    """
+    Локальная проверка: несколько процессов делят одну папку
+
+    Returns:
+        dict: processed, duplicates, missed, throughput
+    """
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    for index in range(files):
+        with open(os.path.join(folder, f"frame_{index:06d}.jpg"), "wb") as f:
+            f.write(b"\xff\xd8simulated\xff\xd9")
+
+    log_dir = os.path.join(folder, ".simulation")
+    os.makedirs(log_dir)
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for node_index in range(nodes):
+        crash_after = max(1, files // (nodes * 4)) if node_index == crash_node else 0
+        process = context.Process(target=_simulated_node, args=(
+            folder, node_index, processing_time, lease_ttl,
+            os.path.join(log_dir, f"node{node_index}.jsonl"), lease_ttl * 3, crash_after
+        ))
+        process.start()
+        processes.append(process)
+    for process in processes:
+        process.join()
+
+    counts = {}
+    first_started = None
+    last_at = None
+    for name in os.listdir(log_dir):
+        with open(os.path.join(log_dir, name), "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                counts[record['file']] = counts.get(record['file'], 0) + 1
+                first_started = min(first_started or record['started'], record['started'])
+                last_at = max(last_at or record['at'], record['at'])
+
+    # Время запуска процессов не учитываем - считаем от первой взятой в работу задачи
+    duration = (last_at - first_started) if counts else 0.0
+    result = {
+        'nodes': nodes,
+        'processed': len(counts),
+        'duplicates': sum(1 for count in counts.values() if count > 1),
+        'missed': files - len(counts),
+        'throughput': len(counts) / duration if duration else 0.0,
+    }
+    print(f"Станций: {nodes}: обработано {result['processed']}/{files}, "
+          f"повторов {result['duplicates']}, пропущено {result['missed']}, "
+          f"{result['throughput']:.1f} файл/с")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка распределения файлов общей папки между станциями")
+    parser.add_argument("--folder", default="claim_simulation", help="временная папка для прогона")
+    parser.add_argument("--nodes", default="1,2,4", help="число станций (через запятую - несколько прогонов)")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--processing-time", type=float, default=0.05, help="время 'обработки' файла, сек")
+    parser.add_argument("--lease-ttl", type=float, default=2.0)
+    parser.add_argument("--crash-node", type=int, default=None,
+                        help="номер станции, которая 'упадет' посреди работы")
+    args = parser.parse_args()
+
+    results = []
+    for nodes in [int(value) for value in args.nodes.split(",")]:
+        results.append(simulate(args.folder, nodes, args.files, args.processing_time,
+                                args.lease_ttl, args.crash_node))
+
+    base = results[0]['throughput'] / results[0]['nodes'] if results and results[0]['throughput'] else 0
+    if base:
+        print("\nМасштабирование (относительно линейного):")
+        for result in results:
+            print(f"  {result['nodes']} станц.: {result['throughput'] / (base * result['nodes']):.0%}")
+    shutil.rmtree(args.folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()